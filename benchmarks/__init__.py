@@ -0,0 +1 @@
+"""Performance benchmarks for the doc2md pipeline."""
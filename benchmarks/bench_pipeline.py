@@ -0,0 +1,179 @@
+"""Time every pipeline stage on synthetic documents of growing size.
+
+Usage::
+
+    python -m benchmarks.bench_pipeline --sizes 10,100,1000,5000 --out bench.json
+
+Each stage runs ``--repeat`` times per size; the JSON output keeps every
+sample plus the minimum and median, so scaling curves can be plotted directly.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from doc2md import heading_numbering, navigation, preprocess, splitter, validators
+from doc2md.config import settings
+from doc2md.pipeline import PreprocessPipeline
+from doc2md.postprocess import PostProcessor
+
+from .synthetic import (
+    SyntheticOptions,
+    generate_docx,
+    generate_html,
+    generate_markdown,
+    heading_outline,
+)
+
+STYLE_MAP_PATH = Path(preprocess.__file__).parent / "mammoth_style_map.map"
+DEFAULT_SIZES = (10, 50, 100, 500, 1000, 5000)
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "samples": samples,
+    }
+
+
+def _write_chapters(directory: Path, chapters: List[str]) -> None:
+    for old in directory.glob("*.md"):
+        old.unlink()
+    for idx, markdown in enumerate(chapters, start=1):
+        (directory / f"{idx:04d}.chapter.md").write_text(markdown, encoding="utf-8")
+
+
+def bench_size(
+    headings: int, repeat: int, work_dir: Path, docx: bool
+) -> List[Dict[str, Any]]:
+    """Run all stages for one document size and return result rows."""
+    options = SyntheticOptions(headings=headings)
+    html = generate_html(options)
+    markdown_chapters = generate_markdown(options)
+    markdown = "\n\n".join(markdown_chapters)
+    structure = heading_outline(headings)
+
+    stages: Dict[str, Callable[[], Any]] = {}
+    if docx:
+        docx_path = work_dir / f"synthetic-{headings}.docx"
+        generate_docx(docx_path, options)
+
+        def convert_docx(cached: bool) -> str:
+            settings.mammoth_cache = cached
+            try:
+                return preprocess.convert_docx_to_html(
+                    str(docx_path), str(STYLE_MAP_PATH)
+                )
+            finally:
+                del settings.mammoth_cache
+
+        stages["convert_docx_to_html"] = lambda: convert_docx(False)
+        # Warm Mammoth cache: only hashing, cache read and heading numbering
+        convert_docx(True)
+        stages["convert_docx_to_html (cached)"] = lambda: convert_docx(True)
+
+    def add_numbering() -> str:
+        original = heading_numbering.extract_heading_structure_from_toc
+        heading_numbering.extract_heading_structure_from_toc = lambda _: structure
+        try:
+            return heading_numbering.add_numbering_to_html(html, "synthetic.docx")
+        finally:
+            heading_numbering.extract_heading_structure_from_toc = original
+
+    numbered_html = add_numbering()
+    stages["add_numbering_to_html"] = add_numbering
+    stages["remove_table_of_contents"] = lambda: preprocess.remove_table_of_contents(
+        numbered_html
+    )
+    stages["split_html_by_heading_level"] = (
+        lambda: splitter.split_html_by_heading_level(numbered_html, 1)
+    )
+    stages["preprocess_pipeline"] = lambda: PreprocessPipeline(
+        heading_structure=structure
+    ).run(html)
+    stages["PostProcessor.run"] = lambda: [
+        PostProcessor(md, idx, "synthetic").run()
+        for idx, md in enumerate(markdown_chapters, start=1)
+    ]
+    stages["run_all_validators"] = lambda: validators.run_all_validators(markdown)
+
+    nav_dir = work_dir / f"nav-{headings}"
+    nav_dir.mkdir(exist_ok=True)
+
+    def run_navigation() -> None:
+        _write_chapters(nav_dir, markdown_chapters)
+        navigation.inject_navigation_and_create_toc(str(nav_dir))
+        navigation.create_summary_from_chapters(str(nav_dir))
+
+    stages["navigation"] = run_navigation
+
+    rows = []
+    for stage, func in stages.items():
+        result = _measure(func, repeat)
+        rows.append(
+            {
+                "headings": headings,
+                "stage": stage,
+                "html_bytes": len(html.encode("utf-8")),
+                "chapters": len(markdown_chapters),
+                **result,
+            }
+        )
+        print(
+            f"{headings:>6} headings  {stage:<28} {result['median'] * 1000:10.2f} ms",
+            file=sys.stderr,
+        )
+    return rows
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="Comma-separated heading counts",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage")
+    parser.add_argument("--out", default="", help="Write JSON results to this file")
+    parser.add_argument(
+        "--no-docx",
+        action="store_true",
+        help="Skip DOCX generation and the Mammoth stage",
+    )
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    rows: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="doc2md-bench-") as tmp:
+        for headings in sizes:
+            rows.extend(bench_size(headings, args.repeat, Path(tmp), not args.no_docx))
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": rows,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Measure CLI startup: import time of ``doc2md.cli`` and ``--help`` wall time.
+
+Usage::
+
+    python -m benchmarks.bench_startup --repeat 10 --out startup.json
+
+Import times come from ``python -X importtime`` in a fresh interpreter per
+run, so the JSON output also lists the slowest modules behind the import.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+# Libraries that must stay out of a bare `import doc2md.cli`
+HEAVY_MODULES = (
+    "bs4",
+    "docx",
+    "dotenv",
+    "frontmatter",
+    "httpx",
+    "jsonschema",
+    "lxml",
+    "mammoth",
+    "rich",
+    "slugify",
+)
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (str(SRC_DIR), env.get("PYTHONPATH", "")) if p
+    )
+    return env
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Return cumulative import time in microseconds per module."""
+    cumulative: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:") :].split("|", 2)
+        cumulative[name.strip()] = int(cum)
+    return cumulative
+
+
+def measure_import(module: str = "doc2md.cli") -> Dict[str, int]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=_env(),
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure_help() -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "doc2md.cli", "--help"],
+        capture_output=True,
+        env=_env(),
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def heavy_imports(module: str = "doc2md.cli") -> List[str]:
+    """Return heavy libraries that importing ``module`` loads."""
+    code = (
+        f"import sys, {module}; "
+        "print(' '.join(m for m in sys.modules if '.' not in m))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=_env(),
+        check=True,
+    )
+    loaded = set(result.stdout.split())
+    return sorted(name for name in HEAVY_MODULES if name in loaded)
+
+
+def _summary(samples: List[float]) -> Dict[str, Any]:
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "samples": samples,
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--repeat", type=int, default=10, help="Fresh interpreters per measurement"
+    )
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to report")
+    parser.add_argument("--out", default="", help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    imports = [measure_import() for _ in range(args.repeat)]
+    totals = [sample.get("doc2md.cli", 0) / 1e6 for sample in imports]
+    help_times = [measure_help() for _ in range(args.repeat)]
+
+    slowest: Dict[str, List[int]] = {}
+    for sample in imports:
+        for name, micros in sample.items():
+            slowest.setdefault(name, []).append(micros)
+    top = sorted(
+        ((name, statistics.median(values) / 1e6) for name, values in slowest.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[: args.top]
+
+    report: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "import_doc2md_cli": _summary(totals),
+        "cli_help": _summary(help_times),
+        "slowest_modules": [
+            {"module": name, "cumulative": seconds} for name, seconds in top
+        ],
+        "heavy_imports": heavy_imports(),
+    }
+    print(
+        f"import doc2md.cli {report['import_doc2md_cli']['median'] * 1000:.1f} ms, "
+        f"--help {report['cli_help']['median'] * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Synthetic DOCX, HTML and Markdown documents of configurable size.
+
+The documents mimic what the real pipeline sees: a "СОДЕРЖАНИЕ" block of
+``__RefHeading`` links, numbered headings across four levels, body text,
+tables, code blocks and embedded images.
+"""
+
+from __future__ import annotations
+
+import base64
+import struct
+import zlib
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+
+# Heading level pattern repeated through the document
+_LEVEL_PATTERN = (1, 2, 2, 3, 3, 4, 2, 3)
+_WORDS = (
+    "Комплекс обеспечивает настройку сервера и мониторинг компонентов портала "
+    "разработчика с учетом требований безопасности"
+).split()
+
+
+class SyntheticOptions(NamedTuple):
+    """Size knobs of a synthetic document."""
+
+    headings: int = 100
+    paragraphs_per_heading: int = 2
+    table_every: int = 5  # 0 disables tables
+    code_every: int = 3  # 0 disables code blocks
+    image_every: int = 7  # 0 disables images
+
+
+def tiny_png(width: int = 8, height: int = 8) -> bytes:
+    """Return a valid solid-grey PNG without needing Pillow."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        crc = struct.pack(">I", zlib.crc32(body))
+        return struct.pack(">I", len(data)) + body + crc
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    rows = b"".join(b"\x00" + b"\x80" * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def heading_outline(count: int) -> List[Tuple[int, str, str]]:
+    """Return ``(level, number, title)`` for ``count`` headings."""
+    counters = [0, 0, 0, 0]
+    outline = []
+    for idx in range(count):
+        level = _LEVEL_PATTERN[idx % len(_LEVEL_PATTERN)]
+        counters[level - 1] += 1
+        for deeper in range(level, len(counters)):
+            counters[deeper] = 0
+        number = ".".join(str(c) for c in counters[:level])
+        title = f"Раздел {idx + 1} {_WORDS[idx % len(_WORDS)]}"
+        outline.append((level, number, title))
+    return outline
+
+
+def _sentence(seed: int, words: int = 24) -> str:
+    return " ".join(_WORDS[(seed + i) % len(_WORDS)] for i in range(words)) + "."
+
+
+def generate_html(options: SyntheticOptions = SyntheticOptions()) -> str:
+    """Build Mammoth-like HTML with a TOC, anchored headings and content blocks."""
+    outline = heading_outline(options.headings)
+    png = base64.b64encode(tiny_png()).decode("ascii")
+
+    parts = ["<p>СОДЕРЖАНИЕ</p>"]
+    for idx, (_, number, title) in enumerate(outline):
+        parts.append(
+            f'<p><a href="#__RefHeading___{idx}">{number} {title}\t{idx + 3}</a></p>'
+        )
+
+    for idx, (level, _, title) in enumerate(outline):
+        parts.append(f'<h{level}><a id="__RefHeading___{idx}"></a>{title}</h{level}>')
+        for p in range(options.paragraphs_per_heading):
+            parts.append(f"<p>{_sentence(idx + p)}</p>")
+        if options.table_every and idx % options.table_every == 0:
+            rows = "".join(
+                f"<tr><td>Параметр {r}</td><td>{_sentence(r, 6)}</td></tr>"
+                for r in range(4)
+            )
+            parts.append(f"<table>{rows}</table>")
+            parts.append(f"<p>Таблица {idx + 1} – Параметры раздела</p>")
+        if options.code_every and idx % options.code_every == 0:
+            parts.append(
+                '<pre><code class="language-bash">'
+                f"sudo systemctl restart service-{idx}\n"
+                f"journalctl -u service-{idx} --since today</code></pre>"
+            )
+        if options.image_every and idx % options.image_every == 0:
+            parts.append(f'<p><img src="data:image/png;base64,{png}" /></p>')
+    return "".join(parts)
+
+
+def _add_bookmark(paragraph, bookmark_id: int, name: str) -> None:
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+
+    start = OxmlElement("w:bookmarkStart")
+    start.set(qn("w:id"), str(bookmark_id))
+    start.set(qn("w:name"), name)
+    end = OxmlElement("w:bookmarkEnd")
+    end.set(qn("w:id"), str(bookmark_id))
+    paragraph._p.insert(0, start)
+    paragraph._p.append(end)
+
+
+def generate_docx(
+    path: str | Path, options: SyntheticOptions = SyntheticOptions()
+) -> None:
+    """Write a DOCX whose TOC paragraphs use ``toc N`` styles like Word does."""
+    import io
+
+    from docx import Document
+    from docx.enum.style import WD_STYLE_TYPE
+
+    doc = Document()
+    for level in range(1, 5):
+        name = f"toc {level}"
+        if name not in [s.name for s in doc.styles]:
+            doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+    if "ROSA_Bash" not in [s.name for s in doc.styles]:
+        doc.styles.add_style("ROSA_Bash", WD_STYLE_TYPE.PARAGRAPH)
+
+    outline = heading_outline(options.headings)
+    png = tiny_png()
+
+    doc.add_paragraph("СОДЕРЖАНИЕ")
+    for idx, (level, number, title) in enumerate(outline):
+        doc.add_paragraph(f"{number} {title}\t{idx + 3}", style=f"toc {level}")
+
+    for idx, (level, _, title) in enumerate(outline):
+        heading = doc.add_paragraph(title, style=f"Heading {level}")
+        _add_bookmark(heading, idx, f"__RefHeading___{idx}")
+        for p in range(options.paragraphs_per_heading):
+            doc.add_paragraph(_sentence(idx + p))
+        if options.table_every and idx % options.table_every == 0:
+            table = doc.add_table(rows=4, cols=2)
+            for r, row in enumerate(table.rows):
+                row.cells[0].text = f"Параметр {r}"
+                row.cells[1].text = _sentence(r, 6)
+            doc.add_paragraph(f"Таблица {idx + 1} – Параметры раздела")
+        if options.code_every and idx % options.code_every == 0:
+            doc.add_paragraph(
+                f"sudo systemctl restart service-{idx}", style="ROSA_Bash"
+            )
+        if options.image_every and idx % options.image_every == 0:
+            doc.add_picture(io.BytesIO(png))
+
+    doc.save(str(path))
+
+
+def generate_markdown(options: SyntheticOptions = SyntheticOptions()) -> List[str]:
+    """Build per-chapter Markdown similar to the LLM output, one item per h1."""
+    chapters: List[List[str]] = []
+    for idx, (level, _, title) in enumerate(heading_outline(options.headings)):
+        if level == 1:
+            chapters.append(["---", f"title: {title}", "---", "", f"# {title}", ""])
+            continue
+        if not chapters:
+            chapters.append(["# Введение", ""])
+        lines = chapters[-1]
+        lines.extend([f"{'#' * level} {title}", ""])
+        lines.extend(_sentence(idx + p) for p in range(options.paragraphs_per_heading))
+        if options.code_every and idx % options.code_every == 0:
+            lines.extend(["```bash", f"sudo systemctl restart service-{idx}", "```"])
+        if options.image_every and idx % options.image_every == 0:
+            lines.append(f"![Рисунок {idx}](image{idx}.png)")
+        lines.extend(
+            ["- первый компонент;", "- второй компонент;", "- последний компонент."]
+        )
+        if options.table_every and idx % options.table_every == 0:
+            lines.extend(
+                [
+                    "| Параметр | Значение |",
+                    "| --- | --- |",
+                    "| a | b |",
+                    f"> Таблица {idx + 1} – Параметры раздела",
+                ]
+            )
+        lines.extend(["::AppAnnotation", _sentence(idx), "::", ""])
+    return ["\n".join(lines) for lines in chapters]
+
+
+__all__ = [
+    "SyntheticOptions",
+    "generate_docx",
+    "generate_html",
+    "generate_markdown",
+    "heading_outline",
+    "tiny_png",
+]
@@ -0,0 +1,334 @@
+"""Parallel conversion of many HTML documents with resumable progress."""
+
+from __future__ import annotations
+
+import glob
+import json
+import multiprocessing
+import os
+import subprocess
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Tuple
+
+from slugify import slugify
+
+from .pandoc_convert import convert_html_with_pandoc
+from .tracing import get_tracer
+
+PROGRESS_FILENAME = "batch_progress.json"
+HTML_SUFFIXES = (".html", ".htm")
+MANIFEST_SUFFIXES = (".txt", ".lst", ".json")
+
+# Extra seconds the in-worker pandoc deadline gets before the worker is killed
+KILL_GRACE = 1.0
+
+
+class BatchJob(NamedTuple):
+    """A single document to convert and the directory it is written to."""
+
+    input_path: str
+    output_dir: str
+
+
+class JobResult(NamedTuple):
+    """Outcome of one document conversion."""
+
+    job: BatchJob
+    status: str  # "done", "failed", "timeout" or "skipped"
+    chapters: int = 0
+    seconds: float = 0.0
+    error: str = ""
+
+
+class BatchSummary:
+    """Aggregated throughput of a batch run."""
+
+    def __init__(self, results: List[JobResult], elapsed: float) -> None:
+        self.results = results
+        self.elapsed = elapsed
+
+    def _count(self, status: str) -> int:
+        return sum(1 for r in self.results if r.status == status)
+
+    @property
+    def converted(self) -> int:
+        return self._count("done")
+
+    @property
+    def skipped(self) -> int:
+        return self._count("skipped")
+
+    @property
+    def failed(self) -> int:
+        return self._count("failed") + self._count("timeout")
+
+    @property
+    def chapters(self) -> int:
+        return sum(r.chapters for r in self.results if r.status == "done")
+
+    @property
+    def docs_per_min(self) -> float:
+        return self.converted * 60 / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def chapters_per_min(self) -> float:
+        return self.chapters * 60 / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def discover_inputs(source: str) -> List[Path]:
+    """
+    Resolve a directory, glob pattern or manifest file into input paths.
+
+    A manifest is a ``.txt``/``.lst`` file with one path per line (``#`` starts
+    a comment) or a ``.json`` list of paths. Relative manifest entries are
+    resolved against the manifest's directory.
+    """
+    path = Path(source)
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if p.suffix.lower() in HTML_SUFFIXES)
+
+    if path.is_file() and path.suffix.lower() in MANIFEST_SUFFIXES:
+        text = path.read_text(encoding="utf-8")
+        if path.suffix.lower() == ".json":
+            entries = [str(entry) for entry in json.loads(text)]
+        else:
+            entries = [
+                line.strip()
+                for line in text.splitlines()
+                if line.strip() and not line.strip().startswith("#")
+            ]
+        return [p if p.is_absolute() else path.parent / p for p in map(Path, entries)]
+
+    if path.is_file():
+        return [path]
+
+    return sorted(Path(p) for p in glob.glob(source, recursive=True))
+
+
+def plan_jobs(inputs: List[Path], output_root: str) -> List[BatchJob]:
+    """Give every input its own output directory named after the file."""
+    jobs: List[BatchJob] = []
+    used: Dict[str, int] = {}
+    for input_path in inputs:
+        name = slugify(input_path.stem) or "document"
+        used[name] = used.get(name, 0) + 1
+        if used[name] > 1:
+            name = f"{name}-{used[name]}"
+        jobs.append(BatchJob(str(input_path), str(Path(output_root) / name)))
+    return jobs
+
+
+class BatchProgress:
+    """JSON journal of finished documents, used to resume interrupted runs."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def is_done(self, job: BatchJob) -> bool:
+        entry = self.entries.get(job.input_path)
+        return bool(entry) and entry.get("status") == "done"
+
+    def record(self, result: JobResult) -> None:
+        self.entries[result.job.input_path] = {
+            "status": result.status,
+            "output_dir": result.job.output_dir,
+            "chapters": result.chapters,
+            "seconds": round(result.seconds, 3),
+            "error": result.error,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(self.entries, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        os.replace(tmp_path, self.path)
+
+
+def _convert_job(
+    job: BatchJob, options: Dict[str, Any], timeout: float | None
+) -> Tuple[int, float]:
+    start = time.perf_counter()
+    chapters = convert_html_with_pandoc(
+        job.input_path, job.output_dir, timeout=timeout, **options
+    )
+    return chapters, time.perf_counter() - start
+
+
+def _worker(
+    conn: Any,
+    convert: Callable[..., Tuple[int, float]],
+    job: BatchJob,
+    options: Dict[str, Any],
+    timeout: float | None,
+) -> None:
+    """Convert one document in a worker process and send back the outcome."""
+    try:
+        outcome: Tuple[str, Any] = ("done", convert(job, options, timeout))
+    except subprocess.TimeoutExpired as exc:
+        outcome = ("timeout", str(exc))
+    except Exception as exc:  # noqa: BLE001 - reported per document
+        outcome = ("failed", str(exc) or type(exc).__name__)
+    conn.send(outcome)
+    conn.close()
+
+
+class _Running(NamedTuple):
+    """A worker process converting one document."""
+
+    job: BatchJob
+    process: Any
+    conn: Any
+    start: float
+
+
+def _start_worker(
+    context: Any,
+    convert: Callable[..., Tuple[int, float]],
+    job: BatchJob,
+    options: Dict[str, Any],
+    timeout: float | None,
+) -> _Running:
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_worker, args=(child_conn, convert, job, options, timeout), daemon=True
+    )
+    process.start()
+    # Only the child holds the sending end, so its exit is seen as EOF
+    child_conn.close()
+    return _Running(job, process, parent_conn, time.perf_counter())
+
+
+def _collect(worker: _Running, timeout: float | None) -> JobResult | None:
+    """Return the result of a finished or overdue worker, None while it runs."""
+    elapsed = time.perf_counter() - worker.start
+    if worker.conn.poll():
+        try:
+            status, value = worker.conn.recv()
+        except EOFError:  # the worker died without reporting
+            status, value = "failed", ""
+    elif not worker.process.is_alive():
+        status, value = "failed", ""
+    elif timeout is not None and elapsed > timeout + KILL_GRACE:
+        # Python stages are not bounded by the pandoc deadline; stop the worker
+        worker.process.kill()
+        status, value = "timeout", f"document took longer than {timeout:g} seconds"
+    else:
+        return None
+
+    worker.process.join()
+    worker.conn.close()
+    if status == "failed" and not value:
+        value = f"worker exited with code {worker.process.exitcode}"
+    if status == "done":
+        chapters, seconds = value
+        return JobResult(worker.job, status, chapters, seconds)
+    return JobResult(worker.job, status, seconds=elapsed, error=value)
+
+
+def run_batch(
+    jobs: List[BatchJob],
+    *,
+    workers: int | None = None,
+    timeout: float | None = None,
+    progress_path: str | Path | None = None,
+    resume: bool = True,
+    options: Dict[str, Any] | None = None,
+    convert: Callable[..., Tuple[int, float]] = _convert_job,
+    on_result: Callable[[JobResult], None] | None = None,
+) -> BatchSummary:
+    """
+    Convert documents, each in its own worker process.
+
+    A document that runs longer than ``timeout`` has its worker killed, so
+    slow Python stages cannot hang the batch; pandoc calls inside the worker
+    also stop at the deadline.
+
+    Args:
+        jobs: Documents to convert
+        workers: Maximum number of concurrent conversions (default: CPU count)
+        timeout: Time budget in seconds for each document
+        progress_path: Journal file; finished documents are skipped on resume
+        resume: Skip documents the journal already marks as done
+        options: Extra keyword arguments for :func:`convert_html_with_pandoc`
+        convert: Worker function, must be picklable
+        on_result: Called in the parent process as each document finishes
+
+    Returns:
+        Summary with per-document results and throughput
+    """
+    progress = BatchProgress(progress_path) if progress_path else None
+    options = options or {}
+    results: List[JobResult] = []
+
+    def finish(result: JobResult) -> None:
+        results.append(result)
+        if result.status != "skipped":
+            # Workers run in other processes; record each document as one span
+            get_tracer().add_complete(
+                "batch.document",
+                time.perf_counter() - result.seconds,
+                result.seconds,
+                input=result.job.input_path,
+                status=result.status,
+                chapters=result.chapters,
+            )
+        if progress is not None and result.status != "skipped":
+            progress.record(result)
+        if on_result is not None:
+            on_result(result)
+
+    pending: Deque[BatchJob] = deque()
+    for job in jobs:
+        if resume and progress is not None and progress.is_done(job):
+            finish(JobResult(job, "skipped"))
+        else:
+            pending.append(job)
+
+    start = time.perf_counter()
+    context = multiprocessing.get_context()
+    limit = max(workers or os.cpu_count() or 1, 1)
+    running: List[_Running] = []
+    try:
+        while pending or running:
+            while pending and len(running) < limit:
+                running.append(
+                    _start_worker(context, convert, pending.popleft(), options, timeout)
+                )
+            wait_for = None
+            if timeout is not None:
+                now = time.perf_counter()
+                wait_for = max(
+                    min(w.start for w in running) + timeout + KILL_GRACE - now, 0.0
+                )
+            wait(
+                [w.conn for w in running] + [w.process.sentinel for w in running],
+                wait_for,
+            )
+            for worker in list(running):
+                result = _collect(worker, timeout)
+                if result is not None:
+                    running.remove(worker)
+                    finish(result)
+    finally:
+        for worker in running:
+            worker.process.kill()
+            worker.process.join()
+
+    return BatchSummary(results, time.perf_counter() - start)
+
+
+__all__ = [
+    "BatchJob",
+    "BatchProgress",
+    "BatchSummary",
+    "JobResult",
+    "discover_inputs",
+    "plan_jobs",
+    "run_batch",
+]
@@ -0,0 +1,160 @@
+"""Per-chapter checkpoints of LLM conversion runs.
+
+Every validated ``(manifest, markdown)`` pair is written atomically as soon
+as the LLM returns it, together with a JSON journal of the run. An
+interrupted run can then be resumed without paying for finished chapters
+again: a chapter is reused only if its HTML hash matches the journal. The
+chapter HTML is stored next to its result so that an edited chapter can be
+re-formatted incrementally (see :mod:`doc2md.incremental`).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIRNAME = "_checkpoints"
+JOURNAL_FILENAME = "journal.json"
+
+
+def content_hash(text: str) -> str:
+    """Return the sha256 hex digest of ``text``."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _atomic_write(path: Path, data: Any) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ChapterCheckpoint(NamedTuple):
+    """A formatted chapter stored by a previous run."""
+
+    index: int
+    manifest: Dict[str, Any]
+    markdown: str
+    seconds: float
+    html: str = ""  # chapter HTML the result was produced from
+
+
+class RunJournal:
+    """Journal and chapter results of one conversion run.
+
+    Args:
+        directory: Where the journal and chapter files are kept
+        run_info: Settings that must match for results to be reused,
+            e.g. provider and model; chapters are checked by their HTML hash
+        resume: Load the existing journal instead of starting over
+    """
+
+    def __init__(
+        self, directory: str | Path, run_info: Dict[str, Any], *, resume: bool = False
+    ) -> None:
+        self.directory = Path(directory)
+        self.path = self.directory / JOURNAL_FILENAME
+        self.run_info = run_info
+        self.chapters: Dict[str, Dict[str, Any]] = {}
+        self.resumed = False
+
+        if resume and self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("run") == run_info:
+                self.chapters = data.get("chapters", {})
+                self.resumed = True
+            else:
+                logger.warning(
+                    "Checkpoint journal %s was written for other settings,"
+                    " starting over",
+                    self.path,
+                )
+
+    def _chapter_path(self, index: int) -> Path:
+        return self.directory / f"chapter_{index:03d}.json"
+
+    def get(self, index: int, chapter_html: str) -> ChapterCheckpoint | None:
+        """Return the stored result for ``index`` if its HTML is unchanged."""
+        entry = self.chapters.get(str(index))
+        if not entry or entry.get("html_hash") != content_hash(chapter_html):
+            return None
+        path = self._chapter_path(index)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return ChapterCheckpoint(
+            index,
+            data["manifest"],
+            data["markdown"],
+            entry.get("seconds", 0.0),
+            data.get("html", ""),
+        )
+
+    def previous(self, index: int) -> ChapterCheckpoint | None:
+        """Return the last stored result for ``index`` whatever its HTML.
+
+        Works for journals of other settings too, which is what an edited
+        document produces. Results saved without their HTML are skipped.
+        """
+        path = self._chapter_path(index)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if not data.get("html"):
+            return None
+        return ChapterCheckpoint(
+            index, data["manifest"], data["markdown"], 0.0, data["html"]
+        )
+
+    def record(
+        self,
+        index: int,
+        chapter_html: str,
+        result: Tuple[Dict[str, Any], str],
+        seconds: float,
+    ) -> None:
+        """Persist a chapter result, then mark it done in the journal."""
+        manifest, markdown = result
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _atomic_write(
+            self._chapter_path(index),
+            {"manifest": manifest, "markdown": markdown, "html": chapter_html},
+        )
+        self.chapters[str(index)] = {
+            "html_hash": content_hash(chapter_html),
+            "html_chars": len(chapter_html),
+            "markdown_chars": len(markdown),
+            "title": manifest.get("title", ""),
+            "seconds": round(seconds, 3),
+            "finished_at": time.time(),
+        }
+        self._save("running")
+
+    def finish(self) -> None:
+        """Mark the run as completed."""
+        self._save("completed")
+
+    def _save(self, status: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _atomic_write(
+            self.path,
+            {"run": self.run_info, "status": status, "chapters": self.chapters},
+        )
+
+
+__all__ = [
+    "CHECKPOINT_DIRNAME",
+    "ChapterCheckpoint",
+    "JOURNAL_FILENAME",
+    "RunJournal",
+    "content_hash",
+]
@@ -1,27 +1,159 @@
 import logging
+import time
 from pathlib import Path
+from typing import Any, Dict, List, Tuple
 
 import typer
-from rich.console import Console
-from rich.progress import Progress
-from slugify import slugify
 
-from . import navigation, postprocess, preprocess, prompt_builder, splitter, validators
-from .config import DEFAULT_MODEL, DEFAULT_PROVIDER, OPENROUTER_DEFAULT_MODEL, MISTRAL_DEFAULT_MODEL
-from .llm_client import ClientFactory
+from .config import settings
+
+# Processing modules (mammoth, bs4, httpx, ...) are imported inside the
+# commands that need them, so `--help` and pandoc-only runs start quickly.
 
 logging.basicConfig(level=logging.INFO)
 
+STYLE_MAP_PATH = Path(__file__).parent / "mammoth_style_map.map"
+
 app = typer.Typer(help="Convert DOCX documentation to Markdown.")
-console = Console()
+
+
+class _LazyConsole:
+    """Rich console created on first use; importing rich is slow."""
+
+    def __init__(self) -> None:
+        self._console = None
+
+    @property
+    def instance(self):
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console()
+        return self._console
+
+    def __getattr__(self, name: str):
+        return getattr(self.instance, name)
+
+
+console = _LazyConsole()
+
+
+def _progress():
+    """Create a rich progress bar bound to the shared console."""
+    from rich.progress import Progress
+
+    return Progress(console=console.instance)
 
 
 def get_default_model_for_provider(provider: str) -> str:
     """Get the default model for a given provider."""
     if provider.lower() == "mistral":
-        return MISTRAL_DEFAULT_MODEL
+        return settings.mistral_default_model
+    elif provider.lower() == "mock":
+        return settings.mock_default_model
     else:  # openrouter or default
-        return OPENROUTER_DEFAULT_MODEL
+        return settings.openrouter_default_model
+
+
+def _start_trace(path: str) -> None:
+    """Enable span tracing when ``--trace`` is given."""
+    if path:
+        from . import tracing
+
+        tracing.enable()
+
+
+def _save_trace(path: str) -> None:
+    """Write recorded spans to ``path`` if tracing was requested."""
+    if path:
+        from . import tracing
+
+        tracing.get_tracer().write(path)
+        console.print(f"[cyan]Трассировка сохранена:[/] {path}")
+
+
+def _ledger_path(option: str) -> str:
+    """Ledger given by ``--ledger``, else by DOC2MD_LEDGER; empty when off."""
+    return option or settings.ledger_path
+
+
+def _open_ledger(option: str):
+    """Record LLM calls in the ledger given by ``--ledger``."""
+    path = _ledger_path(option)
+    if not path:
+        return None
+    from .ledger import Ledger, set_ledger
+
+    try:
+        ledger = Ledger(path)
+    except Exception as exc:  # a broken ledger must not stop the conversion
+        console.print(f"[yellow]Журнал вызовов LLM недоступен ({path}): {exc}[/]")
+        return None
+    set_ledger(ledger)
+    return ledger
+
+
+def _close_ledger(ledger) -> None:
+    """Stop recording LLM calls and report where they were written."""
+    if ledger is None:
+        return
+    from .ledger import set_ledger
+
+    set_ledger(None)
+    ledger.close()
+    console.print(
+        f"[cyan]Журнал вызовов LLM:[/] {ledger.path} (запуск {ledger.run_id})"
+    )
+
+
+def _start_memory_profile(enabled: bool):
+    """Start per-stage memory profiling when ``--profile-memory`` is given."""
+    if not enabled:
+        return None
+    from .memory_profile import MemoryProfiler
+
+    return MemoryProfiler().start()
+
+
+def _finish_memory_profile(profiler) -> None:
+    """Stop the profiler and print the per-stage memory summary."""
+    if profiler is None:
+        return
+    profiler.stop()
+    console.print("[bold cyan]Профиль памяти по этапам:[/]")
+    console.print(profiler.format_report(), markup=False, highlight=False)
+
+
+def _docx_chapters(input_path: str, style_map: str) -> List[str]:
+    """Convert a DOCX and split it into chapter HTML with ``PreprocessPipeline``."""
+    from .pipeline import PreprocessPipeline
+
+    pipeline = PreprocessPipeline.for_docx(input_path)
+    return [content for _, content in pipeline.run_docx(input_path, style_map)]
+
+
+def _media_map(media: Dict[Any, Any], output_path: Path) -> Dict[str, str]:
+    """Image links relative to ``output_path`` -> their canonical store paths."""
+    import os
+
+    media_map = {}
+    for original, canonical in media.items():
+        link = Path(os.path.relpath(original, output_path)).as_posix()
+        media_map[link] = Path(os.path.relpath(canonical, output_path)).as_posix()
+    return media_map
+
+
+def _image_options(enabled: bool, max_width: int, variants: str, prefer: str):
+    """Build image optimization settings from CLI options, or None if disabled."""
+    if not enabled:
+        return None
+    from .image_optimize import ImageOptions
+
+    return ImageOptions(
+        max_width=max_width,
+        variants=tuple(v.strip() for v in variants.split(",") if v.strip()),
+        prefer=prefer,
+    )
 
 
 @app.callback()
@@ -30,6 +162,643 @@ def main() -> None:
     pass
 
 
+@app.command()
+def run(
+    input_path: str = typer.Argument(..., help="Путь к входному DOCX файлу."),
+    output_dir: str = typer.Option(
+        "output", "--out", "-o", help="Директория для сохранения Markdown файлов."
+    ),
+    provider: str = typer.Option(
+        "",
+        "--provider",
+        help="Провайдер LLM: openrouter, mistral или mock (по умолчанию "
+        "DOC2MD_PROVIDER или openrouter).",
+    ),
+    model: str = typer.Option(
+        "",
+        "--model",
+        help="Модель для форматирования (по умолчанию — модель провайдера).",
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", help="Выполнить только препроцессинг без обращения к LLM."
+    ),
+    style_map: str = typer.Option(
+        str(STYLE_MAP_PATH), "--style-map", help="Файл стилей Mammoth."
+    ),
+    rules_path: str = typer.Option(
+        "formatting_rules.md", "--rules-path", help="Файл правил форматирования."
+    ),
+    samples_dir: str = typer.Option(
+        "samples", "--samples-dir", help="Каталог с примерами форматирования."
+    ),
+    example_tokens: int = typer.Option(
+        0,
+        "--example-tokens",
+        help="Подбирать разделы примеров по теме главы в пределах N токенов (0 — два "
+        "случайных файла целиком).",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Продолжить прерванный запуск: готовые главы берутся из чекпоинтов.",
+    ),
+    parallel_preprocess: bool = typer.Option(
+        False,
+        "--parallel-preprocess",
+        help="Запускать Mammoth, разбор оглавления и извлечение изображений "
+        "параллельно.",
+    ),
+    hedge_provider: str = typer.Option(
+        "",
+        "--hedge-provider",
+        help="Второй провайдер: дублирует медленные запросы и принимает их при отказе "
+        "основного. Проигравший запрос не прерывается и расходует лимиты обоих "
+        "провайдеров.",
+    ),
+    hedge_model: str = typer.Option(
+        "",
+        "--hedge-model",
+        help="Модель второго провайдера (по умолчанию — модель провайдера).",
+    ),
+    routes: str = typer.Option(
+        "",
+        "--routes",
+        help="JSON с маршрутами: провайдер и модель выбираются для каждой главы по "
+        "размеру и сложности.",
+    ),
+    concurrency: int = typer.Option(
+        1,
+        "--concurrency",
+        help="Сколько глав форматировать одновременно (лимиты маршрутов действуют "
+        "отдельно).",
+    ),
+    pack_tokens: int = typer.Option(
+        0,
+        "--pack-tokens",
+        help="Объединять мелкие главы в один запрос до этого числа токенов (0 — не "
+        "объединять).",
+    ),
+    rule_based: bool = typer.Option(
+        False,
+        "--rule-based",
+        help="Форматировать главы правилами без LLM, если результат проходит "
+        "валидаторы; остальные уходят в LLM.",
+    ),
+    incremental: bool = typer.Option(
+        False,
+        "--incremental",
+        help="Для изменённых глав отправлять в LLM только изменённые блоки HTML (по "
+        "результатам прошлого запуска в _checkpoints).",
+    ),
+    batch: bool = typer.Option(
+        False,
+        "--batch",
+        help="Отправить все главы одним пакетным заданием (batch API провайдера); "
+        "сбойные главы форматируются обычными запросами.",
+    ),
+    batch_poll: float = typer.Option(
+        30.0, "--batch-poll", help="Интервал опроса пакетного задания, секунды."
+    ),
+    dedupe_media: bool = typer.Option(
+        False,
+        "--dedupe-media",
+        help="Хранить одинаковые изображения один раз в общем хранилище.",
+    ),
+    media_store: str = typer.Option(
+        "",
+        "--media-store",
+        help="Директория хранилища медиа (по умолчанию <out>/media/_store).",
+    ),
+    media_link: str = typer.Option(
+        "auto",
+        "--media-link",
+        help="Способ ссылки на хранилище: auto, reflink, hardlink, copy, rewrite.",
+    ),
+    trace: str = typer.Option(
+        "", "--trace", help="Записать трассировку этапов в JSON (формат Chrome trace)."
+    ),
+    profile_memory: bool = typer.Option(
+        False,
+        "--profile-memory",
+        help="Замерить пиковую память и места аллокаций на каждом этапе.",
+    ),
+    ledger_path: str = typer.Option(
+        "",
+        "--ledger",
+        help="Записывать вызовы LLM в SQLite журнал (по умолчанию DOC2MD_LEDGER; без "
+        "него журнал не ведётся).",
+    ),
+) -> None:
+    """Convert a DOCX document to Markdown chapters formatted by an LLM."""
+    if routes and hedge_provider:
+        console.print("[red]--routes и --hedge-provider нельзя использовать вместе[/]")
+        raise typer.Exit(2)
+    if batch and (routes or hedge_provider):
+        console.print(
+            "[red]--batch нельзя использовать с --routes или --hedge-provider[/]"
+        )
+        raise typer.Exit(2)
+    provider = provider or settings.default_provider
+    if dedupe_media and not media_store:
+        media_store = str(Path(output_dir) / "media" / "_store")
+    if batch:
+        from .llm_batch import BATCH_PROVIDERS
+
+        if provider.lower() not in BATCH_PROVIDERS:
+            raise typer.BadParameter(
+                f"у провайдера {provider} нет batch API"
+                f" (поддерживаются: {', '.join(BATCH_PROVIDERS)})",
+                param_hint="--batch",
+            )
+    _start_trace(trace)
+    profiler = _start_memory_profile(profile_memory)
+    ledger = None if dry_run else _open_ledger(ledger_path)
+    try:
+        _run_llm_pipeline(
+            input_path,
+            Path(output_dir),
+            provider=provider,
+            model=model or get_default_model_for_provider(provider),
+            dry_run=dry_run,
+            style_map=style_map,
+            rules_path=rules_path,
+            samples_dir=samples_dir,
+            example_tokens=example_tokens,
+            resume=resume,
+            parallel_preprocess=parallel_preprocess,
+            hedge_provider=hedge_provider,
+            hedge_model=hedge_model
+            or (
+                get_default_model_for_provider(hedge_provider) if hedge_provider else ""
+            ),
+            routes=routes,
+            concurrency=concurrency,
+            pack_tokens=pack_tokens,
+            rule_based=rule_based,
+            incremental=incremental,
+            batch=batch,
+            batch_poll=batch_poll,
+            media_store=media_store if dedupe_media else "",
+            media_link=media_link,
+        )
+    finally:
+        _close_ledger(ledger)
+        _finish_memory_profile(profiler)
+        _save_trace(trace)
+
+
+def _run_llm_pipeline(
+    input_path: str,
+    output_path: Path,
+    *,
+    provider: str,
+    model: str,
+    dry_run: bool,
+    style_map: str,
+    rules_path: str,
+    samples_dir: str,
+    resume: bool,
+    example_tokens: int = 0,
+    parallel_preprocess: bool = False,
+    hedge_provider: str = "",
+    hedge_model: str = "",
+    routes: str = "",
+    concurrency: int = 1,
+    pack_tokens: int = 0,
+    rule_based: bool = False,
+    incremental: bool = False,
+    batch: bool = False,
+    batch_poll: float = 30.0,
+    media_store: str = "",
+    media_link: str = "auto",
+) -> None:
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from contextlib import closing, nullcontext
+
+    from slugify import slugify
+
+    from . import navigation, postprocess, preprocess, prompt_builder, validators
+    from .checkpoint import CHECKPOINT_DIRNAME, RunJournal
+    from .llm_client import ClientFactory
+    from .packing import format_pack, pack_chapters
+
+    console.print(f"[bold green]Конвертация:[/] {input_path}")
+    html_dir = output_path / "html"
+    html_dir.mkdir(parents=True, exist_ok=True)
+
+    store = None
+    if media_store:
+        from .media_store import MediaStore
+
+        store = MediaStore(media_store)
+    media_dir = str(output_path / "media")
+    if parallel_preprocess:
+        from .orchestrator import preprocess_docx_chapters
+
+        pairs, media = preprocess_docx_chapters(
+            input_path, style_map, media_dir, store, media_link
+        )
+        chapters = [content for _, content in pairs]
+    else:
+        chapters = _docx_chapters(input_path, style_map)
+        media = preprocess.extract_images(input_path, media_dir, store, media_link)
+    # Without rewriting, the extracted paths are links to the store
+    media_map = _media_map(media, output_path) if media_link == "rewrite" else {}
+    html_content = "".join(chapters)
+    (html_dir / "full_document.html").write_text(html_content, encoding="utf-8")
+
+    if "<h1" not in html_content:
+        console.print(
+            "[yellow]No H1 tags found, the document is treated as one chapter[/]"
+        )
+    for idx, chapter_html in enumerate(chapters, start=1):
+        (html_dir / f"chapter_{idx:02d}.html").write_text(
+            chapter_html, encoding="utf-8"
+        )
+
+    if dry_run:
+        console.print(
+            f"[bold green]Dry run completed:[/] {len(chapters)} chapters"
+            f" saved to {html_dir}"
+        )
+        return
+
+    builder = prompt_builder.PromptBuilder(
+        rules_path, samples_dir, example_tokens=example_tokens
+    )
+    if routes:
+        from .routing import RoutingPolicy
+
+        client = ClientFactory.create_routed_client(RoutingPolicy.load(routes), builder)
+    elif hedge_provider:
+        from .hedging import create_hedged_client
+
+        client = create_hedged_client(
+            provider,
+            hedge_provider,
+            builder,
+            primary_model=model,
+            secondary_model=hedge_model,
+        )
+    else:
+        client = ClientFactory.create_client(provider, builder, model=model)
+    journal = RunJournal(
+        output_path / CHECKPOINT_DIRNAME,
+        # Chapters are matched by their own HTML hash, so an edited document
+        # keeps the results of its unchanged chapters
+        {
+            "provider": provider,
+            "model": model,
+            "chapters": len(chapters),
+        },
+        resume=resume,
+    )
+    doc_slug = slugify(Path(input_path).stem)
+    reused = 0
+
+    # The hedged client owns a thread pool and a second HTTP session; close
+    # them even when formatting fails
+    owned = closing(client) if hedge_provider else nullcontext()
+    with owned, _progress() as progress:
+        task = progress.add_task("Formatting chapters", total=len(chapters))
+
+        def save(idx: int, manifest: Dict[str, Any], markdown: str) -> None:
+            markdown = postprocess.PostProcessor(
+                markdown, idx, doc_slug, media_map=media_map
+            ).run()
+            filename = manifest.get("filename") or f"{idx:02d}.{manifest['slug']}.md"
+            (output_path / filename).write_text(markdown, encoding="utf-8")
+            for issue in validators.run_all_validators(markdown):
+                console.print(f"[yellow]{filename}: {issue}[/]")
+            progress.advance(task)
+
+        pending: List[Tuple[int, str]] = []
+        for idx, chapter_html in enumerate(chapters, start=1):
+            checkpoint = journal.get(idx, chapter_html)
+            if checkpoint is not None:
+                reused += 1
+                save(idx, checkpoint.manifest, checkpoint.markdown)
+            else:
+                pending.append((idx, chapter_html))
+
+        # Previous results are read before this run overwrites them
+        previous: Dict[int, Any] = {}
+        if incremental:
+            for idx, chapter_html in pending:
+                checkpoint = journal.previous(idx)
+                if checkpoint is None:
+                    continue
+                if checkpoint.html == chapter_html:
+                    reused += 1
+                    result = (checkpoint.manifest, checkpoint.markdown)
+                    journal.record(idx, chapter_html, result, 0.0)
+                    save(idx, checkpoint.manifest, checkpoint.markdown)
+                previous[idx] = checkpoint
+            pending = [item for item in pending if item[0] not in previous]
+
+        local = 0
+        if rule_based:
+            from . import rule_formatter
+
+            remaining = []
+            for idx, chapter_html in pending:
+                start = time.perf_counter()
+                outcome = rule_formatter.format_chapter(chapter_html, idx)
+                if outcome.result is None:
+                    remaining.append((idx, chapter_html))
+                    continue
+                local += 1
+                journal.record(
+                    idx, chapter_html, outcome.result, time.perf_counter() - start
+                )
+                save(idx, *outcome.result)
+            pending = remaining
+
+        if batch and pending:
+            from .llm_batch import BATCH_DIRNAME, run_batch
+
+            progress.update(task, description="Пакетное задание")
+            results = run_batch(
+                client,
+                [h for _, h in pending],
+                output_path / BATCH_DIRNAME,
+                poll_interval=batch_poll,
+                on_status=lambda job: progress.update(
+                    task, description=f"Пакетное задание: {job.get('status')}"
+                ),
+            )
+            failed = []
+            for (idx, chapter_html), result in zip(pending, results):
+                if isinstance(result, Exception):
+                    failed.append((idx, chapter_html))
+                    continue
+                journal.record(idx, chapter_html, result, 0.0)
+                save(idx, *result)
+            progress.update(task, description="Formatting chapters")
+            if failed:
+                console.print(
+                    f"[yellow]Пакетное задание: {len(failed)} глав не получены или не"
+                    " прошли проверку, они будут отформатированы обычными запросами[/]"
+                )
+            pending = failed
+
+        if pack_tokens:
+            groups = [
+                [pending[i] for i in pack]
+                for pack in pack_chapters([h for _, h in pending], pack_tokens)
+            ]
+        else:
+            groups = [[item] for item in pending]
+
+        incremental_results: List[Any] = []
+
+        def format_changed(idx: int, chapter_html: str) -> List[Any]:
+            from .incremental import reformat_chapter
+
+            start = time.perf_counter()
+            outcome = reformat_chapter(client, chapter_html, previous[idx])
+            incremental_results.append(outcome)
+            return [(outcome.result, time.perf_counter() - start)]
+
+        # Requests run in worker threads; journal and files are written here
+        pool = ThreadPoolExecutor(max_workers=max(concurrency, 1))
+        futures = {
+            pool.submit(
+                format_pack, client, [h for _, h in group], [i for i, _ in group]
+            ): group
+            for group in groups
+        }
+        for idx, chapter_html in enumerate(chapters, start=1):
+            if idx in previous and previous[idx].html != chapter_html:
+                futures[pool.submit(format_changed, idx, chapter_html)] = [
+                    (idx, chapter_html)
+                ]
+        try:
+            for future in as_completed(futures):
+                group = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    progress.stop()
+                    numbers = ", ".join(str(idx) for idx, _ in group)
+                    console.print(f"[red]Ошибка в главе {numbers}: {e}[/]")
+                    console.print(
+                        "[yellow]Готовые главы сохранены; продолжите с --resume[/]"
+                    )
+                    raise typer.Exit(1)
+                for (idx, chapter_html), ((manifest, markdown), seconds) in zip(
+                    group, results
+                ):
+                    journal.record(idx, chapter_html, (manifest, markdown), seconds)
+                    save(idx, manifest, markdown)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    journal.finish()
+    if rule_based:
+        console.print(f"[cyan]Без LLM (по правилам):[/] {local} глав")
+    if incremental_results:
+        patched = [r for r in incremental_results if r.patches]
+        console.print(
+            f"[cyan]Инкрементально:[/] {len(patched)} глав"
+            f" ({sum(r.patches for r in patched)} фрагментов),"
+            f" полностью: {len(incremental_results) - len(patched)}"
+        )
+    if routes:
+        console.print(
+            "[cyan]Маршруты:[/] "
+            + ", ".join(f"{name}: {count}" for name, count in client.chapters.items())
+        )
+    if hedge_provider:
+        stats = client.stats
+        console.print(
+            f"[cyan]Хеджирование:[/] {stats.hedged}/{stats.requests} запросов"
+            f" ({stats.hedge_rate:.0%}), второй провайдер быстрее"
+            f" в {stats.win_rate:.0%},"
+            f" переключений при отказе: {stats.failovers}"
+        )
+    navigation.inject_navigation_and_create_toc(str(output_path))
+    console.print(
+        f"[bold green]Конвертация завершена:[/] {len(chapters)} глав в {output_path}"
+        + (f" (из чекпоинтов: {reused})" if reused else "")
+    )
+
+
+@app.command()
+def plan(
+    input_path: str = typer.Argument(..., help="Путь к входному DOCX файлу."),
+    output_dir: str = typer.Option(
+        "output",
+        "--out",
+        "-o",
+        help="Директория прошлых запусков: из её журнала берутся задержки.",
+    ),
+    provider: str = typer.Option(
+        "",
+        "--provider",
+        help="Провайдер LLM (по умолчанию DOC2MD_PROVIDER или openrouter).",
+    ),
+    model: str = typer.Option(
+        "", "--model", help="Модель (по умолчанию — модель провайдера)."
+    ),
+    style_map: str = typer.Option(
+        str(STYLE_MAP_PATH), "--style-map", help="Файл стилей Mammoth."
+    ),
+    rules_path: str = typer.Option(
+        "formatting_rules.md", "--rules-path", help="Файл правил форматирования."
+    ),
+    samples_dir: str = typer.Option(
+        "samples", "--samples-dir", help="Каталог с примерами форматирования."
+    ),
+    example_tokens: int = typer.Option(
+        0, "--example-tokens", help="Бюджет примеров, как у run --example-tokens."
+    ),
+    concurrency: int = typer.Option(
+        1, "--concurrency", help="Сколько глав форматировать одновременно."
+    ),
+    rate_limit: float = typer.Option(
+        0.0,
+        "--rate-limit",
+        help="Лимит провайдера, запросов в минуту (0 — без лимита).",
+    ),
+    context_tokens: int = typer.Option(
+        0,
+        "--context-tokens",
+        help="Размер контекста модели в токенах (0 — известное значение для модели).",
+    ),
+    input_price: float = typer.Option(
+        0.0, "--input-price", help="Цена миллиона входных токенов."
+    ),
+    output_price: float = typer.Option(
+        0.0, "--output-price", help="Цена миллиона выходных токенов."
+    ),
+    json_path: str = typer.Option("", "--json", help="Сохранить план в JSON."),
+    ledger_path: str = typer.Option(
+        "",
+        "--ledger",
+        help="Журнал вызовов LLM, из которого берутся задержки (по умолчанию "
+        "DOC2MD_LEDGER).",
+    ),
+) -> None:
+    """Estimate tokens, time and cost of an LLM conversion without sending anything."""
+    import json
+
+    from . import planner, prompt_builder
+
+    provider = provider or settings.default_provider
+    model = model or get_default_model_for_provider(provider)
+    chapters = _docx_chapters(input_path, style_map)
+    builder = prompt_builder.PromptBuilder(
+        rules_path, samples_dir, example_tokens=example_tokens
+    )
+    samples = planner.ledger_samples(_ledger_path(ledger_path), provider.lower(), model)
+    source = "ledger"
+    if not samples:
+        samples, source = planner.journal_samples(output_dir), "journal"
+    latency = planner.LatencyModel.fit(samples, source) if samples else None
+    result = planner.plan_chapters(
+        chapters,
+        builder.build_for_chapter,
+        model=model,
+        latency=latency,
+        concurrency=concurrency,
+        rate_limit=rate_limit,
+        context_tokens=context_tokens,
+        input_price=input_price,
+        output_price=output_price,
+    )
+
+    for chapter in result.chapters:
+        flag = "  [red]превышает контекст[/]" if chapter.over_limit else ""
+        console.print(
+            f"{chapter.index:3d}. {chapter.title[:50]:50s}"
+            f" вход {chapter.input_tokens:>8,d}"
+            f"  выход ~{chapter.output_tokens:>7,d}  ~{chapter.seconds:6.1f}s{flag}"
+        )
+    over = [c for c in result.chapters if c.over_limit]
+    console.print(
+        f"[bold green]План:[/] {len(chapters)} запросов к {provider}/{model},"
+        f" вход {result.input_tokens:,d} и выход ~{result.output_tokens:,d} токенов"
+        f" (токенизатор: {result.tokenizer})"
+    )
+    console.print(
+        f"Время ~{result.wall_seconds / 60:.1f} мин при {concurrency} потоках"
+        + (f" и {rate_limit:g} запросах в минуту" if rate_limit else "")
+        + (
+            f" (задержки по {result.latency.samples} вызовам из журнала вызовов LLM)"
+            if result.latency.source == "ledger"
+            else (
+                f" (задержки по {result.latency.samples} главам из журнала)"
+                if result.latency.samples
+                else " (задержки по умолчанию: журнала прошлых запусков нет)"
+            )
+        )
+    )
+    if input_price or output_price:
+        console.print(f"Стоимость ~{result.cost:.2f}")
+    if over:
+        console.print(
+            f"[red]{len(over)} глав не помещаются в контекст"
+            f" {result.context_tokens:,d} токенов:[/] "
+            + ", ".join(str(c.index) for c in over)
+        )
+    if json_path:
+        Path(json_path).write_text(
+            json.dumps(result.as_dict(), ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+
+@app.command()
+def ledger_report(
+    ledger_path: str = typer.Option(
+        "", "--ledger", help="Журнал вызовов LLM (по умолчанию DOC2MD_LEDGER)."
+    ),
+    days: float = typer.Option(
+        0.0, "--days", help="Только вызовы за последние N дней (0 — все)."
+    ),
+    run_id: str = typer.Option("", "--run", help="Только вызовы одного запуска."),
+    json_path: str = typer.Option("", "--json", help="Сохранить отчёт в JSON."),
+) -> None:
+    """Report latency percentiles, retries and token usage of recorded LLM calls."""
+    import json
+
+    from .ledger import PERCENTILES, Ledger
+
+    path = _ledger_path(ledger_path)
+    if not path or not Path(path).exists():
+        hint = path or "задайте --ledger или DOC2MD_LEDGER"
+        console.print(f"[red]Журнал вызовов LLM не найден:[/] {hint}")
+        raise typer.Exit(1)
+    ledger = Ledger(path)
+    try:
+        report = ledger.report(time.time() - days * 86400 if days else 0.0, run_id)
+    finally:
+        ledger.close()
+    if not report:
+        console.print("[yellow]Вызовов не найдено[/]")
+        return
+
+    for group in report:
+        latency = ", ".join(f"p{q} {group.latency[q]:.1f}s" for q in PERCENTILES)
+        reasons = ", ".join(f"{r}: {n}" for r, n in sorted(group.reasons.items()))
+        console.print(
+            f"[bold]{group.provider}/{group.model}[/] {group.kind}:"
+            f" {group.calls} вызовов, {group.attempts} попыток"
+            f" ({group.error_rate:.0%} неудачных), отказов {group.failed}"
+        )
+        console.print(
+            f"  задержка {latency}; токены: вход {group.prompt_tokens:,d},"
+            f" выход {group.completion_tokens:,d}"
+            + (f"; повторы и ошибки: {reasons}" if reasons else ""),
+            markup=False,
+        )
+    if json_path:
+        Path(json_path).write_text(
+            json.dumps([g.as_dict() for g in report], ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+
+
 @app.command()
 def from_html_pandoc(
     html_path: str = typer.Argument(..., help="Путь к входному HTML файлу."),
@@ -37,7 +806,9 @@ def from_html_pandoc(
         "output", "--out", "-o", help="Директория для сохранения Markdown файлов."
     ),
     split_level: int = typer.Option(
-        1, "--split-level", help="Уровень заголовка для разделения на главы (1 для h1, 2 для h2, etc.)."
+        1,
+        "--split-level",
+        help="Уровень заголовка для разделения на главы (1 для h1, 2 для h2, etc.).",
     ),
     media_dir: str = typer.Option(
         "media", "--media-dir", help="Название директории для медиа файлов."
@@ -46,97 +817,380 @@ def from_html_pandoc(
         True, "--remove-toc/--keep-toc", help="Удалить оглавление из финального вывода."
     ),
     keep_temp: bool = typer.Option(
-        False, "--keep-temp", help="Сохранить временные файлы для отладки."
+        False,
+        "--keep-temp",
+        help="Сохранить промежуточный HTML в <out>/_chapters для отладки; без флага "
+        "pandoc работает через stdin/stdout.",
+    ),
+    dedupe_media: bool = typer.Option(
+        False,
+        "--dedupe-media",
+        help="Хранить одинаковые изображения один раз в общем хранилище.",
+    ),
+    media_store: str = typer.Option(
+        "",
+        "--media-store",
+        help="Директория хранилища медиа (по умолчанию <out>/<media-dir>/_store).",
+    ),
+    media_link: str = typer.Option(
+        "auto",
+        "--media-link",
+        help="Способ ссылки на хранилище: auto, reflink, hardlink, copy, rewrite.",
+    ),
+    optimize_images: bool = typer.Option(
+        False,
+        "--optimize-images",
+        help="Пережать и уменьшить изображения (требуется Pillow).",
+    ),
+    max_image_width: int = typer.Option(
+        1600,
+        "--max-image-width",
+        help="Максимальная ширина изображений в пикселях (0 — без ограничения).",
+    ),
+    image_variants: str = typer.Option(
+        "", "--image-variants", help="Дополнительные форматы через запятую: webp, avif."
+    ),
+    image_format: str = typer.Option(
+        "",
+        "--image-format",
+        help="Формат, на который ссылается Markdown (webp, avif); пусто — исходный.",
+    ),
+    image_cache: str = typer.Option(
+        "", "--image-cache", help="Директория кэша оптимизированных изображений."
+    ),
+    trace: str = typer.Option(
+        "", "--trace", help="Записать трассировку этапов в JSON (формат Chrome trace)."
+    ),
+    profile_memory: bool = typer.Option(
+        False,
+        "--profile-memory",
+        help="Замерить пиковую память и места аллокаций на каждом этапе.",
+    ),
+    fast_path: bool = typer.Option(
+        False,
+        "--fast-path",
+        help="Простые главы конвертировать без pandoc; сложные по-прежнему через "
+        "pandoc.",
+    ),
+    fallback_numbering: bool = typer.Option(
+        False,
+        "--fallback-numbering",
+        help="Нумеровать заголовки, которых нет в оглавлении, по счётчикам уровней.",
     ),
 ) -> None:
     """Run the pandoc-based HTML to Markdown conversion pipeline."""
     import subprocess
-    import tempfile
-    import shutil
-    from pathlib import Path as P
-    
+
+    from .pandoc_convert import convert_html_with_pandoc
+
     logging.getLogger(__name__).info("Running the pandoc pipeline")
     console.print(f"[bold green]Запуск конвертации для файла:[/] {html_path}")
-    
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
-    
-    # Step 1: Restore numbers in headings using pandoc + Lua filter
-    console.print("[yellow]Шаг 1: Восстановление номеров в заголовках[/]")
-    lua_filter_path = Path(__file__).parent / "restore_numbers.lua"
-    
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False) as temp_numbered:
-        numbered_html_path = temp_numbered.name
-    
+    if dedupe_media and not media_store:
+        media_store = str(Path(output_dir) / media_dir / "_store")
+    _start_trace(trace)
+    profiler = _start_memory_profile(profile_memory)
+
     try:
-        subprocess.run([
-            "pandoc", html_path,
-            "--from=html", "--to=html",
-            "--standalone",
-            f"--lua-filter={lua_filter_path}",
-            "-o", numbered_html_path
-        ], check=True)
-        
-        # Step 2: Split HTML into chapters
-        console.print("[yellow]Шаг 2: Разделение на главы[/]")
-        chapters_dir = output_path / "_chapters" 
-        chapters_dir.mkdir(exist_ok=True)
-        
-        # Read numbered HTML and split by heading level
-        with open(numbered_html_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
-        chapters = splitter.split_html_by_heading_level(html_content, split_level)
-        
-        # Step 3: Convert each chapter to markdown with pandoc
-        console.print(f"[yellow]Шаг 3: Конвертация {len(chapters)} глав в Markdown[/]")
-        
-        with Progress() as progress:
-            task = progress.add_task("Converting chapters", total=len(chapters))
-            
-            for idx, (title, chapter_html) in enumerate(chapters, start=1):
-                # Save chapter HTML
-                chapter_slug = slugify(title) if title else f"chapter_{idx:02d}"
-                chapter_filename = f"{idx:02d}.{chapter_slug}"
-                chapter_html_path = chapters_dir / f"{chapter_filename}.html"
-                
-                with open(chapter_html_path, 'w', encoding='utf-8') as f:
-                    f.write(f"<html><body>{chapter_html}</body></html>")
-                
-                # Create media directory for this chapter
-                chapter_media_dir = output_path / media_dir / f"ch{idx:02d}"
-                chapter_media_dir.mkdir(parents=True, exist_ok=True)
-                
-                # Convert to markdown with pandoc
-                chapter_md_path = output_path / f"{chapter_filename}.md"
-                
-                subprocess.run([
-                    "pandoc", str(chapter_html_path),
-                    "--from=html", "--to=gfm",
-                    f"--extract-media={chapter_media_dir}",
-                    "--wrap=none",
-                    "-o", str(chapter_md_path)
-                ], check=True)
-                
-                progress.advance(task)
-        
-        # Step 4: Generate navigation
-        console.print("[yellow]Шаг 4: Создание навигации[/]")
-        navigation.create_summary_from_chapters(str(output_path))
-        
-        # Cleanup temporary files if not keeping them
-        if not keep_temp:
-            shutil.rmtree(chapters_dir, ignore_errors=True)
-            Path(numbered_html_path).unlink(missing_ok=True)
-        
-        console.print(f"[bold green]Конвертация завершена. Результаты в:[/] {output_dir}")
-        
+        with _progress() as progress:
+            tasks = {}
+
+            def on_chapter(idx: int, total: int) -> None:
+                if "chapters" not in tasks:
+                    tasks["chapters"] = progress.add_task(
+                        "Converting chapters", total=total
+                    )
+                progress.advance(tasks["chapters"])
+
+            convert_html_with_pandoc(
+                html_path,
+                output_dir,
+                split_level=split_level,
+                media_dir=media_dir,
+                keep_temp=keep_temp,
+                media_store=media_store if dedupe_media else None,
+                media_link=media_link,
+                image_options=_image_options(
+                    optimize_images, max_image_width, image_variants, image_format
+                ),
+                image_cache=image_cache or None,
+                on_step=lambda message: console.print(f"[yellow]{message}[/]"),
+                on_chapter=on_chapter,
+                fast_path=fast_path,
+                fallback_numbering=fallback_numbering,
+                remove_toc=remove_toc,
+            )
+
+        console.print(
+            f"[bold green]Конвертация завершена. Результаты в:[/] {output_dir}"
+        )
+
     except subprocess.CalledProcessError as e:
         console.print(f"[red]Ошибка pandoc: {e}[/]")
         raise typer.Exit(1)
     except Exception as e:
         console.print(f"[red]Ошибка: {e}[/]")
         raise typer.Exit(1)
+    finally:
+        _finish_memory_profile(profiler)
+        _save_trace(trace)
+
+
+@app.command()
+def batch(
+    source: str = typer.Argument(
+        ..., help="Директория, glob-шаблон или файл-манифест со списком HTML файлов."
+    ),
+    output_dir: str = typer.Option(
+        "output",
+        "--out",
+        "-o",
+        help="Корневая директория; каждый документ получает свою поддиректорию.",
+    ),
+    jobs: int = typer.Option(
+        0,
+        "--jobs",
+        "-j",
+        help="Максимальное число одновременных конвертаций (0 — по числу CPU).",
+    ),
+    timeout: float = typer.Option(
+        0,
+        "--timeout",
+        help="Ограничение времени на один документ в секундах (0 — без ограничения).",
+    ),
+    split_level: int = typer.Option(
+        1,
+        "--split-level",
+        help="Уровень заголовка для разделения на главы (1 для h1, 2 для h2, etc.).",
+    ),
+    media_dir: str = typer.Option(
+        "media", "--media-dir", help="Название директории для медиа файлов."
+    ),
+    resume: bool = typer.Option(
+        True,
+        "--resume/--restart",
+        help="Пропустить документы, уже сконвертированные в прошлом запуске.",
+    ),
+    dedupe_media: bool = typer.Option(
+        False,
+        "--dedupe-media",
+        help="Хранить одинаковые изображения один раз в общем хранилище.",
+    ),
+    media_store: str = typer.Option(
+        "",
+        "--media-store",
+        help="Директория хранилища медиа (по умолчанию <out>/_media_store, общее для "
+        "всех документов).",
+    ),
+    media_link: str = typer.Option(
+        "auto",
+        "--media-link",
+        help="Способ ссылки на хранилище: auto, reflink, hardlink, copy, rewrite.",
+    ),
+    optimize_images: bool = typer.Option(
+        False,
+        "--optimize-images",
+        help="Пережать и уменьшить изображения (требуется Pillow).",
+    ),
+    max_image_width: int = typer.Option(
+        1600,
+        "--max-image-width",
+        help="Максимальная ширина изображений в пикселях (0 — без ограничения).",
+    ),
+    image_variants: str = typer.Option(
+        "", "--image-variants", help="Дополнительные форматы через запятую: webp, avif."
+    ),
+    image_format: str = typer.Option(
+        "",
+        "--image-format",
+        help="Формат, на который ссылается Markdown (webp, avif); пусто — исходный.",
+    ),
+    image_cache: str = typer.Option(
+        "", "--image-cache", help="Директория кэша оптимизированных изображений."
+    ),
+    trace: str = typer.Option(
+        "", "--trace", help="Записать трассировку этапов в JSON (формат Chrome trace)."
+    ),
+) -> None:
+    """Convert many HTML documents in parallel with the pandoc pipeline."""
+    from .batch import (
+        PROGRESS_FILENAME,
+        JobResult,
+        discover_inputs,
+        plan_jobs,
+        run_batch,
+    )
+
+    inputs = discover_inputs(source)
+    if not inputs:
+        console.print(f"[red]Не найдено входных файлов:[/] {source}")
+        raise typer.Exit(1)
+
+    options = {"split_level": split_level, "media_dir": media_dir}
+    if dedupe_media:
+        options["media_store"] = media_store or str(Path(output_dir) / "_media_store")
+        options["media_link"] = media_link
+    image_options = _image_options(
+        optimize_images, max_image_width, image_variants, image_format
+    )
+    if image_options is not None:
+        # Documents already run in parallel; avoid a pool per worker
+        options.update(
+            image_options=image_options,
+            image_cache=image_cache or None,
+            image_workers=1,
+        )
+
+    batch_jobs = plan_jobs(inputs, output_dir)
+    console.print(f"[bold green]Пакетная конвертация:[/] {len(batch_jobs)} документов")
+
+    def on_result(result: JobResult) -> None:
+        colors = {"done": "green", "skipped": "cyan"}
+        color = colors.get(result.status, "red")
+        details = (
+            f"{result.chapters} глав, {result.seconds:.1f}s"
+            if result.status == "done"
+            else result.error
+        )
+        console.print(f"[{color}]{result.status}[/] {result.job.input_path} {details}")
+
+    _start_trace(trace)
+    try:
+        summary = run_batch(
+            batch_jobs,
+            workers=jobs or None,
+            timeout=timeout or None,
+            progress_path=Path(output_dir) / PROGRESS_FILENAME,
+            resume=resume,
+            options=options,
+            on_result=on_result,
+        )
+    finally:
+        _save_trace(trace)
+
+    console.print(
+        f"[bold green]Готово:[/] {summary.converted} сконвертировано, "
+        f"{summary.skipped} пропущено, {summary.failed} с ошибками, "
+        f"{summary.chapters} глав за {summary.elapsed:.1f}s "
+        f"({summary.docs_per_min:.1f} docs/min,"
+        f" {summary.chapters_per_min:.1f} chapters/min)"
+    )
+    if summary.failed:
+        raise typer.Exit(1)
+
+
+@app.command()
+def loadtest(
+    chapters: int = typer.Option(
+        50, "--chapters", help="Число синтетических глав (если не задан --html)."
+    ),
+    html_path: str = typer.Option(
+        "", "--html", help="HTML документ, главы которого отправляются в LLM."
+    ),
+    concurrency: int = typer.Option(
+        4, "--concurrency", "-c", help="Число одновременных запросов."
+    ),
+    provider: str = typer.Option(
+        "mock", "--provider", help="Провайдер LLM: mock, openrouter или mistral."
+    ),
+    model: str = typer.Option(
+        "", "--model", help="Модель (по умолчанию — модель провайдера)."
+    ),
+    url: str = typer.Option(
+        "",
+        "--url",
+        help="URL chat completions; для mock без URL запускается локальный сервер.",
+    ),
+    max_retries: int = typer.Option(5, "--max-retries", help="Число попыток на главу."),
+    latency_ms: float = typer.Option(
+        200.0, "--latency-ms", help="Медианная задержка mock сервера."
+    ),
+    latency_sigma: float = typer.Option(
+        0.3, "--latency-sigma", help="Разброс задержки (логнормальное распределение)."
+    ),
+    rate_limit: float = typer.Option(0.0, "--rate-limit", help="Доля ответов 429."),
+    server_error: float = typer.Option(0.0, "--server-error", help="Доля ответов 5xx."),
+    retry_after: float = typer.Option(
+        0.1,
+        "--retry-after",
+        help="Значение Retry-After в секундах (0 — без заголовка).",
+    ),
+    canned: str = typer.Option(
+        "", "--canned", help="JSON файл с заготовленными ответами."
+    ),
+    rules_path: str = typer.Option(
+        "formatting_rules.md", "--rules-path", help="Файл правил форматирования."
+    ),
+    samples_dir: str = typer.Option(
+        "samples", "--samples-dir", help="Каталог с примерами."
+    ),
+) -> None:
+    """Measure LLM client throughput, latency and retries (default: local mock)."""
+    from contextlib import nullcontext
+
+    from . import prompt_builder, splitter
+    from .llm_client import ClientFactory
+    from .loadtest import run_load_test, synthetic_chapters
+    from .mock_llm import MockLLMServer, MockOptions
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if html_path:
+        with open(html_path, "r", encoding="utf-8") as f:
+            chapter_htmls = splitter.split_html_by_h1(f.read())
+    else:
+        chapter_htmls = synthetic_chapters(chapters)
+    if not chapter_htmls:
+        console.print("[red]Нет глав для отправки[/]")
+        raise typer.Exit(1)
+
+    builder = prompt_builder.PromptBuilder(rules_path, samples_dir)
+    server = None
+    if provider.lower() == "mock" and not url:
+        server = MockLLMServer(
+            MockOptions(
+                latency_ms=latency_ms,
+                latency_sigma=latency_sigma,
+                rate_limit=rate_limit,
+                server_error=server_error,
+                retry_after=retry_after,
+                canned_path=canned,
+            )
+        )
+        url = server.url
+
+    def make_client():
+        kwargs = {"max_retries": max_retries}
+        if url:
+            kwargs["api_url"] = url
+        return ClientFactory.create_client(
+            provider, builder, model=model or None, **kwargs
+        )
+
+    console.print(
+        f"[bold green]Нагрузочный тест:[/] {len(chapter_htmls)} глав, "
+        f"{concurrency} потоков, провайдер {provider}"
+    )
+    with server if server is not None else nullcontext():
+        with _progress() as progress:
+            task = progress.add_task("Chapters", total=len(chapter_htmls))
+            report = run_load_test(
+                chapter_htmls,
+                make_client,
+                concurrency=concurrency,
+                on_chapter=lambda idx, latency: progress.advance(task),
+            )
+
+    console.print(
+        f"[bold green]Готово:[/] {report.chapters} глав за {report.elapsed:.2f}s "
+        f"({report.chapters_per_sec:.2f} chapters/s), ошибок: {report.failed}"
+    )
+    console.print(
+        f"Задержка p50 {report.p50 * 1000:.0f} ms, p95 {report.p95 * 1000:.0f} ms, "
+        f"повторов: {report.retries}"
+    )
+    if server is not None:
+        console.print(f"Ответы mock сервера: {server.stats}")
+    if report.failed:
+        raise typer.Exit(1)
 
 
 if __name__ == "__main__":
@@ -1,50 +1,150 @@
-"""Configuration utilities for environment variables."""
+"""Configuration utilities for environment variables.
+
+Settings are resolved on first access through :data:`settings`, so importing
+this module neither reads ``.env`` nor imports ``python-dotenv``. The
+upper-case module constants of earlier versions (``OPENROUTER_API_KEY`` and
+so on) are still available and resolve through the same object.
+"""
 
 from __future__ import annotations
 
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Default provider
-DEFAULT_PROVIDER = os.getenv("DOC2MD_PROVIDER", "openrouter")
-
-# OpenRouter configuration
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
-_openrouter_base_url = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1")
-OPENROUTER_API_URL = f"{_openrouter_base_url}/chat/completions"
-OPENROUTER_DEFAULT_MODEL = os.getenv("OPENROUTER_MODEL", "qwen/qwen-2.5-coder-32b-instruct:free")
-OPENROUTER_HTTP_REFERER = os.getenv("OPENROUTER_HTTP_REFERER", "")
-OPENROUTER_APP_TITLE = os.getenv("OPENROUTER_APP_TITLE", "")
-
-# Mistral configuration
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "")
-_mistral_base_url = os.getenv("MISTRAL_API_URL", "https://api.mistral.ai/v1")
-MISTRAL_API_URL = f"{_mistral_base_url}/chat/completions"
-MISTRAL_DEFAULT_MODEL = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
-
-# Backward compatibility
-API_KEY = OPENROUTER_API_KEY
-API_URL = OPENROUTER_API_URL
-DEFAULT_MODEL = OPENROUTER_DEFAULT_MODEL
-HTTP_REFERER = OPENROUTER_HTTP_REFERER
-APP_TITLE = OPENROUTER_APP_TITLE
-
-__all__ = [
-    "DEFAULT_PROVIDER",
-    "OPENROUTER_API_KEY",
-    "OPENROUTER_API_URL", 
-    "OPENROUTER_DEFAULT_MODEL",
-    "OPENROUTER_HTTP_REFERER",
-    "OPENROUTER_APP_TITLE",
-    "MISTRAL_API_KEY",
-    "MISTRAL_API_URL",
-    "MISTRAL_DEFAULT_MODEL",
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict
+
+_dotenv_loaded = False
+
+
+def _env(name: str, default: str = "") -> str:
+    """Read an environment variable, loading ``.env`` on the first call."""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _dotenv_loaded = True
+    return os.getenv(name, default)
+
+
+class Settings:
+    """Lazily resolved configuration; each value is read once."""
+
+    # Default provider
+    @cached_property
+    def default_provider(self) -> str:
+        return _env("DOC2MD_PROVIDER", "openrouter")
+
+    # OpenRouter configuration
+    @cached_property
+    def openrouter_api_key(self) -> str:
+        return _env("OPENROUTER_API_KEY")
+
+    @cached_property
+    def openrouter_api_url(self) -> str:
+        base_url = _env("OPENROUTER_API_URL", "https://openrouter.ai/api/v1")
+        return f"{base_url}/chat/completions"
+
+    @cached_property
+    def openrouter_default_model(self) -> str:
+        return _env("OPENROUTER_MODEL", "qwen/qwen-2.5-coder-32b-instruct:free")
+
+    @cached_property
+    def openrouter_http_referer(self) -> str:
+        return _env("OPENROUTER_HTTP_REFERER")
+
+    @cached_property
+    def openrouter_app_title(self) -> str:
+        return _env("OPENROUTER_APP_TITLE")
+
+    # Mistral configuration
+    @cached_property
+    def mistral_api_key(self) -> str:
+        return _env("MISTRAL_API_KEY")
+
+    @cached_property
+    def mistral_api_url(self) -> str:
+        base_url = _env("MISTRAL_API_URL", "https://api.mistral.ai/v1")
+        return f"{base_url}/chat/completions"
+
+    @cached_property
+    def mistral_default_model(self) -> str:
+        return _env("MISTRAL_MODEL", "mistral-large-latest")
+
+    # Local mock server (python -m doc2md.mock_llm), used for load tests
+    @cached_property
+    def mock_llm_api_url(self) -> str:
+        base_url = _env("MOCK_LLM_API_URL", "http://127.0.0.1:8765/v1")
+        return f"{base_url}/chat/completions"
+
+    @cached_property
+    def mock_default_model(self) -> str:
+        return _env("MOCK_LLM_MODEL", "mock-echo")
+
+    # Local caches (optimized images, conversion results)
+    @cached_property
+    def cache_dir(self) -> str:
+        return _env("DOC2MD_CACHE_DIR", str(Path.home() / ".cache" / "doc2md"))
+
+    # Mammoth DOCX -> HTML cache, off unless DOC2MD_MAMMOTH_CACHE=1
+    @cached_property
+    def mammoth_cache(self) -> bool:
+        return _env("DOC2MD_MAMMOTH_CACHE").lower() in {"1", "true", "yes"}
+
+    @cached_property
+    def mammoth_cache_max_mb(self) -> int:
+        return int(_env("DOC2MD_MAMMOTH_CACHE_MAX_MB", "1024"))
+
+    @cached_property
+    def mammoth_cache_max_age_days(self) -> float:
+        return float(_env("DOC2MD_MAMMOTH_CACHE_MAX_AGE_DAYS", "30"))
+
+    # SQLite ledger of LLM calls, off unless DOC2MD_LEDGER is set;
+    # DOC2MD_LEDGER=1 keeps it in the cache directory
+    @cached_property
+    def ledger_path(self) -> str:
+        path = _env("DOC2MD_LEDGER")
+        if path.lower() in {"", "0", "false", "no"}:
+            return ""
+        if path.lower() in {"1", "true", "yes"}:
+            return str(Path(self.cache_dir) / "llm_ledger.sqlite")
+        return path
+
+    def reload(self) -> None:
+        """Forget resolved values so the environment is read again."""
+        for name in list(vars(self)):
+            del self.__dict__[name]
+
+
+settings = Settings()
+
+# Module constants kept for backward compatibility -> settings attribute
+_CONSTANTS: Dict[str, str] = {
+    "DEFAULT_PROVIDER": "default_provider",
+    "OPENROUTER_API_KEY": "openrouter_api_key",
+    "OPENROUTER_API_URL": "openrouter_api_url",
+    "OPENROUTER_DEFAULT_MODEL": "openrouter_default_model",
+    "OPENROUTER_HTTP_REFERER": "openrouter_http_referer",
+    "OPENROUTER_APP_TITLE": "openrouter_app_title",
+    "MISTRAL_API_KEY": "mistral_api_key",
+    "MISTRAL_API_URL": "mistral_api_url",
+    "MISTRAL_DEFAULT_MODEL": "mistral_default_model",
+    "MOCK_LLM_API_URL": "mock_llm_api_url",
+    "MOCK_DEFAULT_MODEL": "mock_default_model",
+    "CACHE_DIR": "cache_dir",
     # Backward compatibility
-    "API_KEY",
-    "API_URL", 
-    "DEFAULT_MODEL",
-    "HTTP_REFERER",
-    "APP_TITLE",
-]
+    "API_KEY": "openrouter_api_key",
+    "API_URL": "openrouter_api_url",
+    "DEFAULT_MODEL": "openrouter_default_model",
+    "HTTP_REFERER": "openrouter_http_referer",
+    "APP_TITLE": "openrouter_app_title",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _CONSTANTS:
+        return getattr(settings, _CONSTANTS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["Settings", "settings", *_CONSTANTS]
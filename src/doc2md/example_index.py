@@ -0,0 +1,257 @@
+"""Relevance-ranked formatting examples for prompts.
+
+Sample Markdown files are split into sections at ``##``/``###`` headings and
+indexed with TF-IDF. Besides words, every section gets feature terms for the
+constructs it demonstrates (tables, code blocks, annotations, images,
+lists), and a chapter gets the same terms for its HTML, so a chapter full of
+tables is shown table examples. The index is built once per set of sample
+files and cached as JSON under ``DOC2MD_CACHE_DIR/examples``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+from lxml import html
+
+from .routing import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the tokenizer or the stored format changes
+_INDEX_VERSION = 1
+
+_WORD_RE = re.compile(r"[^\W\d_]{3,}")
+_SECTION_RE = re.compile(r"^#{2,3} ")
+_FENCE_RE = re.compile(r"^\s*```")
+# Crude stemming: Russian inflections mostly change the word ending
+_STEM_LENGTH = 6
+
+# Feature terms: Markdown patterns of a sample section / HTML of a chapter
+_MARKDOWN_FEATURES = {
+    "__table": re.compile(r"^\|", re.MULTILINE),
+    "__code": re.compile(r"^```", re.MULTILINE),
+    "__annotation": re.compile(r"^::AppAnnotation", re.MULTILINE),
+    "__image": re.compile(r"^::sign-image", re.MULTILINE),
+    "__list": re.compile(r"^- ", re.MULTILINE),
+    "__note": re.compile(r"^> _Примечание_", re.MULTILINE),
+}
+_HTML_FEATURES = {
+    "__table": re.compile(r"<table\b"),
+    "__code": re.compile(r"<pre\b"),
+    "__annotation": re.compile(r"app-annotation"),
+    "__image": re.compile(r"<img\b"),
+    "__list": re.compile(r"<[ou]l\b"),
+    "__note": re.compile(r">\s*Примечани"),
+}
+
+
+class ExampleSection(NamedTuple):
+    """A section of a sample file."""
+
+    path: str  # relative to the samples directory
+    heading: str
+    text: str
+    tokens: int
+
+
+def _terms(text: str) -> List[str]:
+    return [word[:_STEM_LENGTH] for word in _WORD_RE.findall(text.lower())]
+
+
+def split_sections(markdown: str) -> List[str]:
+    """Split a sample into sections; frontmatter is dropped."""
+    lines = markdown.strip().split("\n")
+    if lines and lines[0].strip() == "---":
+        closing = next(
+            (i for i in range(1, len(lines)) if lines[i].strip() == "---"), None
+        )
+        if closing is not None:
+            lines = lines[closing + 1 :]
+    sections: List[List[str]] = [[]]
+    in_fence = False
+    for line in lines:
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        starts_section = not in_fence and _SECTION_RE.match(line)
+        if starts_section and any(text.strip() for text in sections[-1]):
+            sections.append([])
+        sections[-1].append(line)
+    joined = ["\n".join(section).strip() for section in sections]
+    return [text for text in joined if text]
+
+
+class ExampleIndex:
+    """TF-IDF index over sample sections.
+
+    Args:
+        sections: Indexed sections
+        idf: Inverse document frequency per term
+    """
+
+    def __init__(self, sections: List[ExampleSection], idf: Dict[str, float]) -> None:
+        self.sections = sections
+        self.idf = idf
+        self.vectors = [self._vector(self._section_terms(s.text)) for s in sections]
+
+    @staticmethod
+    def _section_terms(text: str) -> Counter:
+        counts = Counter(_terms(text))
+        for name, pattern in _MARKDOWN_FEATURES.items():
+            if pattern.search(text):
+                counts[name] += 3
+        return counts
+
+    @staticmethod
+    def _chapter_terms(chapter_html: str) -> Counter:
+        try:
+            text = html.fragment_fromstring(
+                chapter_html, create_parent="div"
+            ).text_content()
+        except Exception:
+            text = chapter_html
+        counts = Counter(_terms(text))
+        for name, pattern in _HTML_FEATURES.items():
+            if pattern.search(chapter_html):
+                counts[name] += 3
+        return counts
+
+    def _vector(self, counts: Counter) -> Dict[str, float]:
+        vector = {
+            term: (1 + math.log(count)) * self.idf[term]
+            for term, count in counts.items()
+            if term in self.idf
+        }
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {term: value / norm for term, value in vector.items()}
+
+    @classmethod
+    def build(cls, samples_dir: str | Path) -> "ExampleIndex":
+        root = Path(samples_dir)
+        sections = []
+        for path in sorted(root.rglob("*.md")):
+            for text in split_sections(path.read_text(encoding="utf-8")):
+                heading = text.split("\n", 1)[0].lstrip("# ").strip()
+                sections.append(
+                    ExampleSection(
+                        path.relative_to(root).as_posix(),
+                        heading,
+                        text,
+                        estimate_tokens(text),
+                    )
+                )
+        document_frequency: Counter = Counter()
+        for section in sections:
+            document_frequency.update(set(cls._section_terms(section.text)))
+        total = len(sections)
+        idf = {
+            term: math.log((1 + total) / (1 + df)) + 1
+            for term, df in document_frequency.items()
+        }
+        return cls(sections, idf)
+
+    def select(
+        self, chapter_html: str, token_budget: int, *, max_sections: int = 6
+    ) -> List[ExampleSection]:
+        """
+        Pick the sections most similar to a chapter within a token budget.
+
+        Args:
+            chapter_html: Chapter (or several chapters) the prompt is for
+            token_budget: Estimated tokens allowed for all examples
+            max_sections: Sections allowed regardless of the budget
+
+        Returns:
+            Sections in order of decreasing relevance
+        """
+        query = self._vector(self._chapter_terms(chapter_html))
+        scored = sorted(
+            (
+                (sum(query.get(term, 0.0) * value for term, value in vector.items()), i)
+                for i, vector in enumerate(self.vectors)
+            ),
+            key=lambda item: (-item[0], item[1]),
+        )
+        chosen: List[ExampleSection] = []
+        used = 0
+        for score, i in scored:
+            section = self.sections[i]
+            if score <= 0 or len(chosen) >= max_sections:
+                break
+            if used + section.tokens > token_budget:
+                continue
+            chosen.append(section)
+            used += section.tokens
+        return chosen
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": _INDEX_VERSION,
+            "sections": [s._asdict() for s in self.sections],
+            "idf": self.idf,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ExampleIndex":
+        return cls([ExampleSection(**s) for s in data["sections"]], data["idf"])
+
+
+def samples_fingerprint(samples_dir: str | Path) -> str:
+    """Hash of the sample files' names, sizes and modification times."""
+    digest = hashlib.sha256(f"v{_INDEX_VERSION}".encode())
+    root = Path(samples_dir)
+    for path in sorted(root.rglob("*.md")):
+        stat = path.stat()
+        digest.update(
+            f"{path.relative_to(root)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode()
+        )
+    return digest.hexdigest()
+
+
+def load_index(
+    samples_dir: str | Path, cache_dir: str | Path | None = None
+) -> ExampleIndex:
+    """Load the cached index of ``samples_dir``, building it when stale.
+
+    Args:
+        samples_dir: Directory with sample Markdown files
+        cache_dir: Where indexes are kept (default: ``DOC2MD_CACHE_DIR/examples``)
+    """
+    if cache_dir is None:
+        from .config import settings
+
+        cache_dir = Path(settings.cache_dir) / "examples"
+    path = Path(cache_dir) / f"{samples_fingerprint(samples_dir)}.json"
+    if path.exists():
+        try:
+            return ExampleIndex.from_dict(json.loads(path.read_text(encoding="utf-8")))
+        except (ValueError, KeyError, TypeError) as exc:
+            logger.warning("Example index %s is corrupt, rebuilding: %s", path, exc)
+
+    index = ExampleIndex.build(samples_dir)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(
+            json.dumps(index.to_dict(), ensure_ascii=False), encoding="utf-8"
+        )
+        tmp_path.replace(path)
+    except OSError as exc:
+        logger.warning("Could not cache example index in %s: %s", path.parent, exc)
+    return index
+
+
+__all__ = [
+    "ExampleIndex",
+    "ExampleSection",
+    "load_index",
+    "samples_fingerprint",
+    "split_sections",
+]
@@ -0,0 +1,315 @@
+"""In-process HTML to GitHub-flavored Markdown for simple chapters.
+
+Covers the subset our Mammoth style map and Google Docs exports produce:
+headings, paragraphs, inline formatting, links, lists, code blocks,
+blockquotes and simple tables. Anything else (images, merged or nested
+table cells, math, styled ``div`` blocks, ...) makes :func:`html_to_gfm`
+report the construct so the caller can fall back to pandoc for the chapter.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List, NamedTuple
+
+from lxml import etree, html
+
+# pandoc's GFM horizontal rule
+_HR = "-" * 72
+
+_BLOCK_TAGS = {
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "p",
+    "ul",
+    "ol",
+    "pre",
+    "blockquote",
+    "table",
+    "hr",
+    "div",
+    "section",
+    "article",
+    "header",
+    "footer",
+    "main",
+    "body",
+    "html",
+}
+_INLINE_WRAPPERS = {"span", "font", "u", "small", "big", "abbr", "cite", "mark"}
+_EMPHASIS = {"strong": "**", "b": "**", "em": "*", "i": "*", "del": "~~", "s": "~~"}
+
+_ESCAPE_RE = re.compile(r"([\\`*_\[\]<>|])")
+# Line starts that would read as a heading or list item; the punctuation
+# is escaped (a backslash before a digit would be literal)
+_LINE_START_RE = re.compile(r"^(\s*)(#{1,6}|[+\-]|\d+[.)])(?=\s|$)")
+_SPACE_RE = re.compile(r"[ \t\r\n]+")
+# Placeholder for <br> while whitespace is collapsed
+_BREAK = "\x00"
+
+
+class Unsupported(Exception):
+    """Raised for markup the fast path does not convert."""
+
+
+class FastResult(NamedTuple):
+    """Outcome of :func:`html_to_gfm`."""
+
+    markdown: str | None  # None when the chapter needs pandoc
+    reason: str = ""  # unsupported construct that triggered the fallback
+
+
+def _escape(text: str) -> str:
+    return _ESCAPE_RE.sub(r"\\\1", text)
+
+
+def _escape_line_start(match: re.Match) -> str:
+    marker = match.group(2)
+    return f"{match.group(1)}{marker[:-1]}\\{marker[-1]}"
+
+
+def _code_span(text: str) -> str:
+    longest = max((len(m) for m in re.findall(r"`+", text)), default=0)
+    fence = "`" * (longest + 1)
+    pad = " " if text.startswith("`") or text.endswith("`") else ""
+    return f"{fence}{pad}{text}{pad}{fence}"
+
+
+class MarkdownWriter:
+    """HTML to GFM writer for the supported subset.
+
+    Subclasses customize the output by overriding :meth:`block` (one block
+    element), :meth:`list`, :meth:`code_block` or :meth:`blocks` (all blocks
+    of a container) and calling the base implementation for everything else.
+    Every method raises :class:`Unsupported` for markup outside the subset.
+    """
+
+    def inline(self, element: html.HtmlElement) -> str:
+        """Render the children and text of ``element`` as inline Markdown."""
+        parts: List[str] = [_escape(element.text or "")]
+        for child in element:
+            parts.append(self.inline_element(child))
+            parts.append(_escape(child.tail or ""))
+        return "".join(parts)
+
+    def inline_element(self, element: html.HtmlElement) -> str:
+        tag = element.tag
+        if not isinstance(tag, str):  # comments, processing instructions
+            return ""
+        if tag in _EMPHASIS:
+            content = self.inline(element).strip()
+            if not content:
+                return ""
+            marker = _EMPHASIS[tag]
+            return f"{marker}{content}{marker}"
+        if tag == "code":
+            return _code_span(element.text_content())
+        if tag == "br":
+            return _BREAK
+        if tag == "a":
+            content = self.inline(element)
+            href = element.get("href")
+            if not href:
+                return content  # bare anchors such as __RefHeading targets
+            if not content.strip():
+                return ""
+            return f"[{content}]({href.replace(' ', '%20').replace(')', '%29')})"
+        if tag in _INLINE_WRAPPERS:
+            return self.inline(element)
+        if tag in _BLOCK_TAGS or tag in {"li", "tr", "td", "th"}:
+            raise Unsupported(f"block <{tag}> inside inline content")
+        raise Unsupported(f"<{tag}>")
+
+    def text(self, element: html.HtmlElement, breaks: bool = True) -> str:
+        """Inline Markdown of ``element`` with whitespace collapsed.
+
+        ``breaks=False`` writes ``<br>`` as a space, for headings that must
+        stay on one line.
+        """
+        text = self.inline(element)
+        if not breaks:
+            text = text.replace(_BREAK, " ")
+        text = _SPACE_RE.sub(" ", text).strip()
+        lines = [line.strip() for line in text.strip(_BREAK + " ").split(_BREAK)]
+        return "\\\n".join(
+            _LINE_START_RE.sub(_escape_line_start, line) for line in lines
+        )
+
+    def blocks(self, container: html.HtmlElement) -> List[str]:
+        """Render the block children of ``container``."""
+        out: List[str] = []
+        if container.text and container.text.strip():
+            raise Unsupported("text outside of paragraphs")
+        for child in container:
+            out.extend(self.block(child))
+            if child.tail and child.tail.strip():
+                raise Unsupported("text outside of paragraphs")
+        return out
+
+    def block(self, element: html.HtmlElement) -> List[str]:
+        tag = element.tag
+        if not isinstance(tag, str):
+            return []
+        if tag in {"h1", "h2", "h3", "h4", "h5", "h6"}:
+            text = self.text(element, breaks=False)
+            return [f"{'#' * int(tag[1])} {text}"] if text else []
+        if tag == "p":
+            text = self.text(element)
+            return [text] if text else []
+        if tag in {"ul", "ol"}:
+            return [self.list(element)]
+        if tag == "pre":
+            return [self.code_block(element)]
+        if tag == "blockquote":
+            inner = self.blocks(element) if len(element) else [self.text(element)]
+            quoted = "\n\n".join(b for b in inner if b)
+            return [
+                "\n".join(f"> {line}" if line else ">" for line in quoted.split("\n"))
+            ]
+        if tag == "table":
+            return [self.table(element)]
+        if tag == "hr":
+            return [_HR]
+        if tag in {"div", "section", "article", "header", "footer", "main", "body"}:
+            if element.get("class"):
+                # pandoc keeps classed divs (annotations, notes) as raw HTML
+                raise Unsupported(f"<{tag} class={element.get('class')!r}>")
+            return self.blocks(element)
+        if tag in {"a", "span"} and not self.text(element):
+            return []  # empty anchors between blocks
+        raise Unsupported(f"<{tag}>")
+
+    def list(self, element: html.HtmlElement) -> str:
+        ordered = element.tag == "ol"
+        try:
+            number = int(element.get("start") or 1)
+        except ValueError:  # start="a" and the like: browsers count from 1
+            number = 1
+        items: List[str] = []
+        for li in element:
+            if not isinstance(li.tag, str):
+                continue
+            if li.tag != "li":
+                raise Unsupported(f"<{li.tag}> inside list")
+            marker = f"{number}. " if ordered else "- "
+            number += 1
+            body = self.list_item(li)
+            indent = " " * len(marker)
+            lines = body.split("\n")
+            rendered = [marker + lines[0]] + [
+                indent + line if line else "" for line in lines[1:]
+            ]
+            items.append("\n".join(rendered))
+        return "\n".join(items)
+
+    def list_item(self, li: html.HtmlElement) -> str:
+        has_blocks = any(
+            isinstance(child.tag, str) and child.tag in {"p", "ul", "ol", "pre"}
+            for child in li
+        )
+        if not has_blocks:
+            return self.text(li)
+        # Leading inline content, then blocks (nested lists, paragraphs, code)
+        parts: List[str] = []
+        inline = html.Element("span")
+        inline.text = li.text
+        for child in li:
+            if isinstance(child.tag, str) and child.tag in {"p", "ul", "ol", "pre"}:
+                if self.text(inline):
+                    parts.append(self.text(inline))
+                inline = html.Element("span")
+                parts.extend(self.block(child))
+                inline.text = child.tail
+            else:
+                copy = html.fromstring(etree.tostring(child, encoding="unicode"))
+                copy.tail = child.tail
+                inline.append(copy)
+        if self.text(inline):
+            parts.append(self.text(inline))
+        separator = "\n\n" if sum(1 for c in li if c.tag == "p") > 1 else "\n"
+        return separator.join(parts)
+
+    def code_block(self, pre: html.HtmlElement) -> str:
+        code = pre.find("code")
+        if len(pre) > 1 or (len(pre) == 1 and code is None):
+            raise Unsupported("formatted <pre>")
+        if code is not None and len(code):
+            raise Unsupported("formatted code block")
+        source = pre.text_content().strip("\n")
+        language = ""
+        if code is not None:
+            match = re.search(r"language-(\S+)", code.get("class", ""))
+            language = match.group(1) if match else ""
+        longest = max((len(m) for m in re.findall(r"`{3,}", source)), default=2)
+        fence = "`" * (longest + 1)
+        return (
+            f"{fence} {language}\n{source}\n{fence}"
+            if language
+            else f"{fence}\n{source}\n{fence}"
+        )
+
+    def table(self, table: html.HtmlElement) -> str:
+        rows: List[List[str]] = []
+        header_rows = 0
+        for row in table.iter("tr"):
+            cells = []
+            for cell in row:
+                if not isinstance(cell.tag, str):
+                    continue
+                if cell.tag not in {"td", "th"}:
+                    raise Unsupported(f"<{cell.tag}> in table row")
+                if cell.get("colspan", "1") != "1" or cell.get("rowspan", "1") != "1":
+                    raise Unsupported("merged table cells")
+                if any(
+                    cell.find(f".//{tag}") is not None for tag in ("table", "ul", "ol")
+                ):
+                    raise Unsupported("nested block in table cell")
+                paragraphs = [c for c in cell if c.tag == "p"]
+                if len(paragraphs) > 1:
+                    raise Unsupported("multi-paragraph table cell")
+                text = self.text(paragraphs[0] if paragraphs else cell)
+                cells.append(text.replace("\\\n", "<br>"))
+            if row.getparent() is not None and row.getparent().tag == "thead":
+                header_rows += 1
+            rows.append(cells)
+        if not rows:
+            return ""
+        if header_rows > 1:
+            raise Unsupported("multi-row table header")
+        width = max(len(r) for r in rows)
+        if any(len(r) != width for r in rows):
+            raise Unsupported("ragged table")
+        header, body = rows[0], rows[1:]
+        lines = [
+            "| " + " | ".join(header) + " |",
+            "|" + "|".join("-" * (max(len(c), 1) + 2) for c in header) + "|",
+        ]
+        lines.extend("| " + " | ".join(r) + " |" for r in body)
+        return "\n".join(lines)
+
+
+def html_to_gfm(chapter_html: str) -> FastResult:
+    """
+    Convert a chapter fragment to GFM without pandoc.
+
+    Returns:
+        Markdown, or ``FastResult(None, reason)`` if the chapter contains
+        markup outside the supported subset
+    """
+    if not chapter_html.strip():
+        return FastResult("")
+    if "<math" in chapter_html or 'class="math' in chapter_html:
+        return FastResult(None, "math")
+    root = html.fragment_fromstring(chapter_html, create_parent="div")
+    try:
+        blocks = MarkdownWriter().blocks(root)
+    except Unsupported as exc:
+        return FastResult(None, str(exc))
+    return FastResult("\n\n".join(b for b in blocks if b) + "\n")
+
+
+__all__ = ["FastResult", "MarkdownWriter", "Unsupported", "html_to_gfm"]
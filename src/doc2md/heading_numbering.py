@@ -3,8 +3,17 @@
 from __future__ import annotations
 
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 from docx import Document
+from lxml import etree, html
+
+from .tracing import span
+
+_REF_ANCHORS_XPATH = etree.XPath(
+    '//a[starts-with(@id, "__RefHeading___")]', smart_strings=False
+)
+_INLINE_TAGS = {"a", "span", "strong", "b", "em", "i", "u", "sup", "sub", "font"}
+_PARAGRAPH_TAGS = {"p", "li", "h1", "h2", "h3", "h4", "h5", "h6"}
 
 
 def extract_heading_numbering_from_toc(docx_path: str) -> Dict[str, str]:
@@ -52,6 +61,13 @@ def extract_heading_structure_from_toc(docx_path: str) -> List[Tuple[int, str, s
         List of tuples (level, number, title) sorted by document order
         Example: [(1, "1", "Общие сведения"), (2, "1.1", "Назначение"), (4, "4.1.2.1", "Подготовка")]
     """
+    with span("heading_numbering.extract_heading_structure_from_toc") as sp:
+        headings = _read_toc_headings(docx_path)
+        sp.set(headings=len(headings))
+    return headings
+
+
+def _read_toc_headings(docx_path: str) -> List[Tuple[int, str, str]]:
     doc = Document(docx_path)
     headings = []
 
@@ -119,45 +135,158 @@ def get_heading_number_for_text(text: str, numbering_map: Dict[str, str]) -> str
     return best_match
 
 
-def add_numbering_to_html(html_content: str, docx_path: str) -> str:
+def add_numbering_to_html(
+    html_content: str,
+    docx_path: str,
+    *,
+    heading_structure: List[Tuple[int, str, str]] | None = None,
+) -> str:
     """
     Add heading numbering to HTML content based on DOCX TOC.
-    Uses regex to find and replace __RefHeading patterns with proper heading tags.
+    Parses the HTML and turns __RefHeading anchors into heading tags with
+    :func:`apply_numbering_to_tree`, the same pass
+    :class:`doc2md.pipeline.PreprocessPipeline` runs.
 
     Args:
         html_content: HTML content from Mammoth conversion
         docx_path: Path to original DOCX file
+        heading_structure: Result of :func:`extract_heading_structure_from_toc`
+            if already computed, e.g. concurrently with Mammoth
 
     Returns:
         HTML content with numbered headings
     """
-    import re
-
     # Extract heading structure from DOCX
-    heading_structure = extract_heading_structure_from_toc(docx_path)
+    if heading_structure is None:
+        heading_structure = extract_heading_structure_from_toc(docx_path)
 
-    if not heading_structure:
+    if not heading_structure or not html_content.strip():
         return html_content  # No headings found
 
-    result = html_content
+    with span(
+        "heading_numbering.add_numbering_to_html",
+        bytes_in=len(html_content),
+        headings=len(heading_structure),
+    ) as sp:
+        root = html.document_fromstring(html_content)
+        apply_numbering_to_tree(root, heading_structure)
+        result = _body_html(root)
+        sp.set(bytes_out=len(result))
+    return result
+
+
+def _body_html(root: html.HtmlElement) -> str:
+    """Serialize the contents of ``<body>`` without the wrapping tags."""
+    body = root.find("body")
+    if body is None:
+        body = root
+    return (body.text or "") + "".join(
+        html.tostring(child, encoding="unicode") for child in body
+    )
+
+
+def _text_slots(
+    element: html.HtmlElement, include_tail: bool = False
+) -> Iterator[Tuple[html.HtmlElement, str]]:
+    """Yield ``(element, "text" | "tail")`` slots in document order."""
+    yield element, "text"
+    for child in element:
+        yield from _text_slots(child, include_tail=True)
+    if include_tail:
+        yield element, "tail"
+
+
+def _strip_leading_chars(element: html.HtmlElement, count: int) -> None:
+    """Remove the first ``count`` characters of text inside ``element``."""
+    for node, slot in _text_slots(element):
+        if count <= 0:
+            return
+        value = getattr(node, slot) or ""
+        setattr(node, slot, value[count:] or None)
+        count -= len(value)
+
+
+def _anchor_heading_text(anchor: html.HtmlElement) -> Tuple[html.HtmlElement, str]:
+    """Return the element that carries the anchor's title and the text after it."""
+    container = anchor.getparent()
+    while container.tag in _INLINE_TAGS and container.getparent() is not None:
+        container = container.getparent()
+
+    if container.tag not in _PARAGRAPH_TAGS:
+        return anchor, anchor.tail or ""
+
+    before: List[str] = []
+    for node, slot in _text_slots(container):
+        if node is anchor:
+            break
+        before.append(getattr(node, slot) or "")
+    if "".join(before).strip():
+        return container, ""
+    return container, container.text_content()
+
+
+def apply_numbering_to_tree(
+    root: html.HtmlElement, heading_structure: List[Tuple[int, str, str]]
+) -> int:
+    """
+    Turn ``__RefHeading`` anchors into numbered headings in a parsed lxml tree.
 
-    # Replace each anchor + title pair with a proper heading tag
+    The anchor + title matching is done in place, so the document does not
+    have to be serialized and scanned once per TOC entry. A ``<p>`` or ``<hN>``
+    that holds only the title is replaced by the heading as a whole.
+
+    Args:
+        root: Parsed HTML document, modified in place
+        heading_structure: Result of :func:`extract_heading_structure_from_toc`
+
+    Returns:
+        Number of headings created
+    """
+    anchors = _REF_ANCHORS_XPATH(root)
+    if not heading_structure:
+        return 0
+
+    created = 0
     for level, number, title in heading_structure:
-        escaped_title = re.escape(title)
-        pattern = re.compile(
-            rf'<a id="__RefHeading___\d+"></a>\s*(?:<[^>]+>\s*)*{escaped_title}',
-            flags=re.IGNORECASE,
-        )
-        replacement = f"<h{level}>{number} {title}</h{level}>"
-        result, count = pattern.subn(replacement, result, count=1)
-
-        if count == 0:
+        wanted = title.lower()
+        match = None
+        for anchor in anchors:
+            container, following = _anchor_heading_text(anchor)
+            if following.lstrip().lower().startswith(wanted):
+                match = (anchor, container, following)
+                break
+
+        if match is None:
             # Remove unmatched anchor to avoid leaking into output
-            result = re.sub(r'<a id="__RefHeading___\d+"></a>', "", result, count=1)
+            if anchors:
+                anchors.pop(0).drop_tree()
+            continue
+
+        anchor, container, following = match
+        anchors.remove(anchor)
+        heading = html.Element(f"h{level}")
+        heading.text = f"{number} {title}"
+        consumed = len(following) - len(following.lstrip()) + len(title)
+
+        if container is anchor:
+            heading.tail = (anchor.tail or "")[consumed:] or None
+            anchor.tail = None
+            anchor.addprevious(heading)
+            anchor.drop_tree()
+        elif not following[consumed:].strip():
+            heading.tail = container.tail
+            container.addprevious(heading)
+            container.getparent().remove(container)
+        else:
+            container.addprevious(heading)
+            anchor.drop_tree()
+            _strip_leading_chars(container, consumed)
+        created += 1
 
     # Clean up any remaining reference anchors
-    result = re.sub(r'<a id="__RefHeading___\d+"></a>', "", result)
-    return result
+    for anchor in anchors:
+        anchor.drop_tree()
+    return created
 
 
 if __name__ == "__main__":
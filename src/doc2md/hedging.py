@@ -0,0 +1,308 @@
+"""Hedged chapter requests across two LLM providers.
+
+:class:`HedgedClient` sends a chapter to the primary client and, if no answer
+arrives within a percentile of the primary's recent latencies, sends a
+duplicate to the secondary. The first valid result wins and the other request
+is cancelled before its next attempt; an HTTP request already in flight runs
+to completion (a blocked synchronous httpx read cannot be interrupted), so
+every hedge costs a full request against the secondary's rate limit. A
+:class:`CircuitBreaker` per provider stops sending to a provider after
+repeated failures, so chapters fail over to the other one until the breaker
+lets a trial request through again.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, Tuple
+
+from .llm_client import BaseLLMClient, RequestCancelled
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit
+        reset_timeout: Seconds the circuit stays open before one trial
+            request is allowed (half-open)
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trips = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent now."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give back a trial request that ended without an outcome."""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    self.trips += 1
+                    logger.warning("Circuit opened after %d failures", self.failures)
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Sliding window of response times with percentile lookup."""
+
+    def __init__(self, window: int = 100) -> None:
+        self.samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class HedgeStats:
+    """Counters of a :class:`HedgedClient`."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.hedged = 0  # requests that also went to the secondary
+        self.hedge_wins = 0  # hedged requests answered first by the secondary
+        self.failovers = 0  # requests sent only to the secondary
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedged / self.requests if self.requests else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        return self.hedge_wins / self.hedged if self.hedged else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "hedge_rate": round(self.hedge_rate, 4),
+            "win_rate": round(self.win_rate, 4),
+        }
+
+
+class HedgedClient:
+    """Composite client hedging a primary provider with a secondary one.
+
+    Args:
+        primary: Client tried first for every chapter
+        secondary: Client used for hedges and failover
+        percentile: Primary latency percentile after which a hedge is sent
+        initial_delay: Hedge delay in seconds until ``min_samples`` primary
+            latencies are known
+        min_samples: Primary responses needed before the percentile is used
+        min_delay: Lower bound for the hedge delay in seconds
+        failure_threshold: Consecutive failures that open a provider's breaker
+        reset_timeout: Seconds before an open breaker allows a trial request
+        max_workers: Threads for concurrent primary and secondary requests
+    """
+
+    def __init__(
+        self,
+        primary: BaseLLMClient,
+        secondary: BaseLLMClient,
+        *,
+        percentile: float = 0.95,
+        initial_delay: float = 20.0,
+        min_samples: int = 5,
+        min_delay: float = 1.0,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        max_workers: int = 8,
+    ) -> None:
+        self.primary = primary
+        self.secondary = secondary
+        self.model = primary.model
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.breakers = {
+            "primary": CircuitBreaker(failure_threshold, reset_timeout),
+            "secondary": CircuitBreaker(failure_threshold, reset_timeout),
+        }
+        self.latency = LatencyTracker()
+        self.stats = HedgeStats()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @property
+    def retry_count(self) -> int:
+        return self.primary.retry_count + self.secondary.retry_count
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary before sending the hedge."""
+        if len(self.latency.samples) < self.min_samples:
+            return self.initial_delay
+        return max(self.latency.percentile(self.percentile) or 0.0, self.min_delay)
+
+    def _call(
+        self, role: str, chapter_html: str, cancel: threading.Event
+    ) -> Tuple[Dict[str, Any], str]:
+        client = self.primary if role == "primary" else self.secondary
+        start = time.perf_counter()
+        try:
+            result = client.format_chapter(chapter_html, cancel)
+        except RequestCancelled:
+            self.breakers[role].release()
+            raise
+        except Exception:
+            self.breakers[role].record_failure()
+            raise
+        self.breakers[role].record_success()
+        if role == "primary":
+            self.latency.record(time.perf_counter() - start)
+        return result
+
+    def format_chapter(self, chapter_html: str) -> Tuple[Dict[str, Any], str]:
+        """Format a chapter, hedging or failing over to the secondary as needed."""
+        self.stats.add(requests=1)
+        with span("hedge.format_chapter", bytes_in=len(chapter_html)) as sp:
+            if not self.breakers["primary"].allow():
+                if not self.breakers["secondary"].allow():
+                    raise RuntimeError(
+                        "Both providers are unavailable: circuit breakers are open"
+                    )
+                self.stats.add(failovers=1)
+                sp.set(winner="secondary", failover=True)
+                return self._call("secondary", chapter_html, threading.Event())
+
+            cancels = {"primary": threading.Event(), "secondary": threading.Event()}
+            futures: Dict[Future, str] = {}
+
+            def submit(role: str) -> None:
+                future = self._executor.submit(
+                    self._call, role, chapter_html, cancels[role]
+                )
+                futures[future] = role
+
+            submit("primary")
+            done, _ = wait(futures, timeout=self.hedge_delay())
+            hedged = not done and self.breakers["secondary"].allow()
+            if hedged:
+                self.stats.add(hedged=1)
+                submit("secondary")
+
+            error: BaseException | None = None
+            while True:
+                wait(futures, return_when=FIRST_COMPLETED)
+                for future, role in list(futures.items()):
+                    if not future.done():
+                        continue
+                    del futures[future]
+                    error = future.exception()
+                    if error is None:
+                        # Cancel the loser's retries; its request in flight
+                        # still completes and is discarded
+                        for other in futures.values():
+                            cancels[other].set()
+                        if hedged and role == "secondary":
+                            self.stats.add(hedge_wins=1)
+                        sp.set(winner=role, hedged=hedged)
+                        return future.result()
+                    if (
+                        role == "primary"
+                        and not hedged
+                        and self.breakers["secondary"].allow()
+                    ):
+                        # The primary failed before the hedge was due
+                        self.stats.add(failovers=1)
+                        sp.set(failover=True)
+                        submit("secondary")
+                if not futures:
+                    assert error is not None
+                    raise error
+
+    def close(self) -> None:
+        """Stop the worker threads and close both clients' HTTP sessions."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.primary.close()
+        self.secondary.close()
+
+
+def create_hedged_client(
+    primary_provider: str,
+    secondary_provider: str,
+    prompt_builder: Any,
+    *,
+    primary_model: str | None = None,
+    secondary_model: str | None = None,
+    **options: Any,
+) -> HedgedClient:
+    """Create a :class:`HedgedClient` from two provider names."""
+    from .llm_client import ClientFactory
+
+    return HedgedClient(
+        ClientFactory.create_client(
+            primary_provider, prompt_builder, model=primary_model
+        ),
+        ClientFactory.create_client(
+            secondary_provider, prompt_builder, model=secondary_model
+        ),
+        **options,
+    )
+
+
+__all__ = [
+    "CircuitBreaker",
+    "HedgeStats",
+    "HedgedClient",
+    "LatencyTracker",
+    "create_hedged_client",
+]
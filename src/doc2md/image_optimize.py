@@ -0,0 +1,267 @@
+"""Optional recompression, downscaling and format conversion of media files."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+from .media_store import file_digest
+
+# GIFs are left alone: re-saving would drop animation frames
+RASTER_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"}
+VECTOR_SUFFIXES = {".emf", ".wmf"}
+VARIANT_FORMATS = {"webp": "WEBP", "avif": "AVIF"}
+
+# Bumped whenever the processing below changes, to invalidate cached results
+_CACHE_VERSION = 2
+
+
+class ImageOptions(NamedTuple):
+    """Settings of the optimization stage."""
+
+    max_width: int = 1600  # 0 disables downscaling
+    variants: Tuple[str, ...] = ()  # extra formats written next to each image
+    prefer: str = ""  # variant that Markdown links should point at
+
+    def cache_key(self, digest: str, pillow_version: str, converter: str = "") -> str:
+        """Key of a file's results; ``converter`` renders vector images."""
+        payload = json.dumps(
+            [_CACHE_VERSION, digest, pillow_version, converter, list(self)],
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class OptimizeReport(NamedTuple):
+    """Result of optimizing a media tree."""
+
+    mapping: Dict[Path, Path]  # original file -> file Markdown should link to
+    processed: int
+    cached: int
+    bytes_in: int
+    bytes_out: int
+
+
+def _load_pillow():
+    try:
+        import PIL
+        from PIL import Image
+    except ImportError as exc:
+        raise RuntimeError(
+            "Image optimization requires Pillow. Install it with `pip install pillow`."
+        ) from exc
+    return Image, PIL.__version__
+
+
+def _vector_converter() -> str:
+    """Installed EMF/WMF renderer: ``inkscape``, ``soffice`` or empty."""
+    return next((tool for tool in ("inkscape", "soffice") if shutil.which(tool)), "")
+
+
+def _convert_vector(src: Path, out_dir: Path) -> Path | None:
+    """Render EMF/WMF to PNG with Inkscape or LibreOffice, if one is installed."""
+    target = out_dir / f"{src.stem}.png"
+    converter = _vector_converter()
+    if converter == "inkscape":
+        command = [
+            "inkscape",
+            str(src),
+            "--export-type=png",
+            f"--export-filename={target}",
+        ]
+    elif converter == "soffice":
+        command = [
+            "soffice",
+            "--headless",
+            "--convert-to",
+            "png",
+            "--outdir",
+            str(out_dir),
+            str(src),
+        ]
+    else:
+        return None
+    result = subprocess.run(command, capture_output=True)
+    return target if result.returncode == 0 and target.exists() else None
+
+
+def _render(src: Path, work_dir: Path, options: ImageOptions) -> Dict[str, str]:
+    """Write optimized outputs for ``src`` into ``work_dir``.
+
+    Returns:
+        Mapping of output role (``"main"`` or a variant format) to file name
+    """
+    Image, _ = _load_pillow()
+    resampling = getattr(Image, "Resampling", Image)
+    outputs: Dict[str, str] = {}
+
+    source = src
+    if src.suffix.lower() in VECTOR_SUFFIXES:
+        converted = _convert_vector(src, work_dir)
+        if converted is None:
+            return outputs
+        source = converted
+
+    with Image.open(source) as image:
+        image.load()
+        if options.max_width and image.width > options.max_width:
+            height = round(image.height * options.max_width / image.width)
+            image = image.resize((options.max_width, height), resampling.LANCZOS)
+            resized = True
+        else:
+            resized = False
+
+        main_suffix = source.suffix.lower()
+        main_path = work_dir / f"main{main_suffix}"
+        if main_suffix == ".png":
+            image.save(main_path, format="PNG", optimize=True)
+        elif main_suffix in {".jpg", ".jpeg"}:
+            image.convert("RGB").save(
+                main_path, format="JPEG", quality=85, optimize=True, progressive=True
+            )
+        else:
+            image.save(main_path)
+
+        if (
+            source == src
+            and not resized
+            and main_path.stat().st_size >= src.stat().st_size
+        ):
+            shutil.copyfile(src, main_path)
+        outputs["main"] = main_path.name
+
+        for variant in options.variants:
+            variant_path = work_dir / f"variant.{variant}"
+            try:
+                image.save(variant_path, format=VARIANT_FORMATS[variant], quality=80)
+            except (KeyError, OSError):
+                # Format not supported by this Pillow build
+                variant_path.unlink(missing_ok=True)
+                continue
+            outputs[variant] = variant_path.name
+    return outputs
+
+
+def _replace_with_copy(src: Path, dst: Path) -> None:
+    """Copy ``src`` over ``dst`` without writing through existing hard links."""
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def _optimize_one(
+    path: str, cache_dir: str, options: ImageOptions
+) -> Tuple[str, str | None, bool, int, int]:
+    """Optimize one file in place, reusing cached results.
+
+    Returns:
+        ``(path, link_target, cache_hit, bytes_in, bytes_out)``
+    """
+    src = Path(path)
+    bytes_in = src.stat().st_size
+    _, pillow_version = _load_pillow()
+    # A vector image left alone for lack of a converter is retried once one
+    # is installed
+    converter = _vector_converter() if src.suffix.lower() in VECTOR_SUFFIXES else ""
+    key = options.cache_key(file_digest(src), pillow_version, converter)
+    entry = Path(cache_dir) / key[:2] / key
+    meta_path = entry / "meta.json"
+
+    cache_hit = meta_path.exists()
+    if not cache_hit:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tempfile.mkdtemp(dir=entry.parent, prefix=".tmp-"))
+        try:
+            outputs = _render(src, work_dir, options)
+            (work_dir / "meta.json").write_text(json.dumps(outputs), encoding="utf-8")
+            try:
+                os.replace(work_dir, entry)
+            except OSError:
+                # Another worker cached the same image first
+                shutil.rmtree(work_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+    outputs = json.loads(meta_path.read_text(encoding="utf-8"))
+    if "main" not in outputs:
+        return path, None, cache_hit, bytes_in, bytes_in
+
+    main_name = outputs["main"]
+    main_target = src.with_suffix(Path(main_name).suffix)
+    _replace_with_copy(entry / main_name, main_target)
+    if main_target != src:
+        src.unlink()
+    bytes_out = main_target.stat().st_size
+
+    link_target = main_target
+    for variant in options.variants:
+        if variant in outputs:
+            variant_target = src.with_suffix(f".{variant}")
+            _replace_with_copy(entry / outputs[variant], variant_target)
+            if variant == options.prefer:
+                link_target = variant_target
+
+    new_target = str(link_target) if link_target != src else None
+    return path, new_target, cache_hit, bytes_in, bytes_out
+
+
+def optimize_media(
+    media_root: str | Path,
+    cache_dir: str | Path,
+    options: ImageOptions = ImageOptions(),
+    *,
+    workers: int | None = None,
+) -> OptimizeReport:
+    """
+    Recompress and downscale every image under ``media_root`` in a process pool.
+
+    Results are cached by content hash and options in ``cache_dir``, so rerunning
+    on unchanged media only copies files out of the cache.
+    """
+    _load_pillow()
+    for variant in (*options.variants, options.prefer):
+        if variant and variant not in VARIANT_FORMATS:
+            raise ValueError(
+                f"Unknown image format: {variant}."
+                f" Supported: {', '.join(VARIANT_FORMATS)}"
+            )
+    if options.prefer and options.prefer not in options.variants:
+        options = options._replace(variants=(*options.variants, options.prefer))
+
+    media_root = Path(media_root)
+    paths: List[str] = [
+        str(p)
+        for p in sorted(media_root.rglob("*"))
+        if p.is_file() and p.suffix.lower() in RASTER_SUFFIXES | VECTOR_SUFFIXES
+        # Skip media stores and temporary files
+        and not any(part[0] in "_." for part in p.relative_to(media_root).parts)
+    ]
+    mapping: Dict[Path, Path] = {}
+    cached = bytes_in = bytes_out = 0
+    if paths:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _optimize_one,
+                paths,
+                [str(cache_dir)] * len(paths),
+                [options] * len(paths),
+            )
+            for path, new_target, cache_hit, size_in, size_out in results:
+                if new_target is not None:
+                    mapping[Path(path)] = Path(new_target)
+                cached += cache_hit
+                bytes_in += size_in
+                bytes_out += size_out
+
+    return OptimizeReport(mapping, len(paths), cached, bytes_in, bytes_out)
+
+
+__all__ = ["ImageOptions", "OptimizeReport", "optimize_media"]
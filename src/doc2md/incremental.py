@@ -0,0 +1,307 @@
+"""Re-format only the edited blocks of a chapter.
+
+The new chapter HTML is diffed against the HTML of the previous run at the
+level of top-level blocks (paragraphs, tables, lists, headings). Every
+changed region is sent to the LLM together with a few blocks of context and
+the Markdown the previous run produced for that region, and the returned
+fragment replaces that Markdown in the stored output.
+
+Markdown regions are found by anchoring each HTML block to the Markdown
+block that starts with the same words. Regions are widened to the nearest
+anchored blocks. A full re-format is used instead when the first block (the
+chapter heading) changed, when too much of the chapter changed, when anchors
+are missing, or when the spliced chapter fails the completeness check.
+"""
+
+from __future__ import annotations
+
+import difflib
+import logging
+import re
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from lxml import html
+
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_SPACE_RE = re.compile(r"\s+")
+
+# Words that identify the start of a block
+ANCHOR_WORDS = 5
+# Position within a Markdown block where an anchor may start (heading numbers,
+# list markers rendered as words)
+ANCHOR_SLACK = 3
+
+
+class Patch(NamedTuple):
+    """A changed region: Markdown blocks ``[md_start, md_end)`` are replaced."""
+
+    md_start: int
+    md_end: int
+    changed_html: str  # new blocks of the region; empty for a deletion
+    previous_markdown: str
+    before_html: str
+    after_html: str
+
+
+class DiffPlan(NamedTuple):
+    """Patches for a chapter, or the reason a full re-format is needed."""
+
+    patches: List[Patch] | None
+    markdown_blocks: List[str]
+    changed_ratio: float
+    reason: str = ""
+
+
+class IncrementalResult(NamedTuple):
+    result: Tuple[Dict[str, Any], str]
+    patches: int  # 0 when the chapter was unchanged or re-formatted in full
+    reason: str  # why a full re-format was used
+
+
+def html_blocks(chapter_html: str) -> List[str]:
+    """Serialize the top-level elements of a chapter, one string per block."""
+    if not chapter_html.strip():
+        return []
+    blocks = []
+    for item in html.fragments_fromstring(chapter_html):
+        if isinstance(item, str):
+            if item.strip():
+                blocks.append(item.strip())
+            continue
+        item.tail = None
+        blocks.append(html.tostring(item, encoding="unicode").strip())
+    return blocks
+
+
+def markdown_blocks(markdown: str) -> List[str]:
+    """Split Markdown on blank lines, keeping fenced code and frontmatter whole."""
+    blocks: List[str] = []
+    current: List[str] = []
+    in_fence = False
+    lines = markdown.split("\n")
+    start = 0
+    if lines and lines[0].strip() == "---":
+        for end in range(1, len(lines)):
+            if lines[end].strip() == "---":
+                blocks.append("\n".join(lines[: end + 1]))
+                start = end + 1
+                break
+    for line in lines[start:]:
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        if not line.strip() and not in_fence:
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _block_text(block_html: str) -> str:
+    try:
+        element = html.fragment_fromstring(block_html, create_parent="div")
+        return " ".join(element.itertext())
+    except Exception:
+        return block_html
+
+
+def anchor_blocks(blocks: List[str], md_blocks: List[str]) -> List[int | None]:
+    """Return the Markdown block where each HTML block starts, if found.
+
+    Anchors are searched in document order, so they are increasing.
+    """
+    md_words = [_words(block) for block in md_blocks]
+    anchors: List[int | None] = []
+    position = 0
+    for block in blocks:
+        key = _words(_block_text(block))[:ANCHOR_WORDS]
+        found = None
+        if key:
+            for j in range(position, len(md_words)):
+                head = md_words[j][: ANCHOR_SLACK + len(key)]
+                if any(head[k : k + len(key)] == key for k in range(ANCHOR_SLACK + 1)):
+                    found = j
+                    break
+        anchors.append(found)
+        if found is not None:
+            position = found + 1
+    return anchors
+
+
+def _normalize(block: str) -> str:
+    return _SPACE_RE.sub(" ", block)
+
+
+def plan_update(
+    old_html: str,
+    new_html: str,
+    old_markdown: str,
+    *,
+    context: int = 2,
+    max_changed_ratio: float = 0.5,
+    max_patches: int = 10,
+) -> DiffPlan:
+    """
+    Diff two versions of a chapter and map the changes onto the old Markdown.
+
+    Args:
+        old_html: Chapter HTML the previous Markdown was produced from
+        new_html: Current chapter HTML
+        old_markdown: Markdown of the previous run
+        context: Unchanged blocks sent on each side of a change
+        max_changed_ratio: Share of the new HTML that may be re-sent before
+            a full re-format is cheaper
+        max_patches: Changed regions allowed before a full re-format is used
+
+    Returns:
+        Plan whose ``patches`` is None (with ``reason``) when the chapter
+        must be re-formatted in full
+    """
+    old_blocks = html_blocks(old_html)
+    new_blocks = html_blocks(new_html)
+    md_blocks = markdown_blocks(old_markdown)
+    if not old_blocks or not new_blocks or not md_blocks:
+        return DiffPlan(None, md_blocks, 1.0, "empty chapter")
+
+    matcher = difflib.SequenceMatcher(
+        None,
+        [_normalize(b) for b in old_blocks],
+        [_normalize(b) for b in new_blocks],
+        autojunk=False,
+    )
+    hunks = [op[1:] for op in matcher.get_opcodes() if op[0] != "equal"]
+    if not hunks:
+        return DiffPlan([], md_blocks, 0.0)
+    if hunks[0][0] == 0 or hunks[0][2] == 0:
+        return DiffPlan(None, md_blocks, 1.0, "chapter heading changed")
+
+    anchors = anchor_blocks(old_blocks, md_blocks)
+    anchored = [i for i, a in enumerate(anchors) if a is not None] + [len(old_blocks)]
+
+    # Widen every hunk to anchored boundaries; equal blocks shift both sides alike
+    regions: List[List[int]] = []
+    for i1, i2, j1, j2 in hunks:
+        start = max((i for i in anchored if i <= i1), default=None)
+        end = min(i for i in anchored if i >= i2)
+        if start is None or start == 0:
+            return DiffPlan(None, md_blocks, 1.0, "no anchor before a change")
+        j1 -= i1 - start
+        j2 += end - i2
+        if regions and start <= regions[-1][1]:
+            regions[-1][1], regions[-1][3] = end, j2
+        else:
+            regions.append([start, end, j1, j2])
+
+    changed_chars = sum(len(b) for i1, i2, j1, j2 in regions for b in new_blocks[j1:j2])
+    ratio = changed_chars / max(sum(len(b) for b in new_blocks), 1)
+    if ratio > max_changed_ratio:
+        return DiffPlan(None, md_blocks, ratio, f"{ratio:.0%} of the chapter changed")
+    if len(regions) > max_patches:
+        return DiffPlan(None, md_blocks, ratio, f"{len(regions)} changed regions")
+
+    patches = []
+    for i1, i2, j1, j2 in regions:
+        md_start = anchors[i1]
+        md_end = anchors[i2] if i2 < len(old_blocks) else len(md_blocks)
+        patches.append(
+            Patch(
+                md_start=md_start,
+                md_end=md_end,
+                changed_html="\n".join(new_blocks[j1:j2]),
+                previous_markdown="\n\n".join(md_blocks[md_start:md_end]),
+                before_html="\n".join(new_blocks[max(j1 - context, 0) : j1]),
+                after_html="\n".join(new_blocks[j2 : j2 + context]),
+            )
+        )
+    return DiffPlan(patches, md_blocks, ratio)
+
+
+def apply_patches(
+    md_blocks: List[str], patches: List[Patch], fragments: List[str]
+) -> str:
+    """Replace the Markdown of every patch with its new fragment."""
+    blocks = list(md_blocks)
+    for patch, fragment in sorted(
+        zip(patches, fragments), key=lambda item: item[0].md_start, reverse=True
+    ):
+        replacement = [fragment.strip()] if fragment.strip() else []
+        blocks[patch.md_start : patch.md_end] = replacement
+    return "\n\n".join(blocks) + "\n"
+
+
+def reformat_chapter(
+    client: Any, chapter_html: str, previous: Any, **options: Any
+) -> IncrementalResult:
+    """
+    Re-format an edited chapter, sending only its changed blocks if possible.
+
+    Args:
+        client: LLM client; clients without ``format_fragment`` always
+            re-format in full
+        chapter_html: Current chapter HTML
+        previous: Stored result with ``html``, ``manifest`` and ``markdown``
+            (a :class:`doc2md.checkpoint.ChapterCheckpoint`)
+        **options: Passed to :func:`plan_update`
+    """
+    with span("incremental.reformat_chapter", bytes_in=len(chapter_html)) as sp:
+        plan = plan_update(previous.html, chapter_html, previous.markdown, **options)
+        reason = plan.reason
+        if plan.patches == []:
+            sp.set(patches=0)
+            return IncrementalResult((previous.manifest, previous.markdown), 0, "")
+        if plan.patches is not None and not hasattr(client, "format_fragment"):
+            reason = "client cannot format fragments"
+        if plan.patches is not None and not reason:
+            fragments = [
+                (
+                    client.format_fragment(
+                        patch.changed_html,
+                        patch.previous_markdown,
+                        patch.before_html,
+                        patch.after_html,
+                    )
+                    if patch.changed_html
+                    else ""
+                )
+                for patch in plan.patches
+            ]
+            markdown = apply_patches(plan.markdown_blocks, plan.patches, fragments)
+            check = getattr(client, "_validate_content_completeness", None)
+            if check is None or check(chapter_html, markdown):
+                sp.set(
+                    patches=len(plan.patches),
+                    changed_ratio=round(plan.changed_ratio, 3),
+                )
+                return IncrementalResult(
+                    (previous.manifest, markdown), len(plan.patches), ""
+                )
+            reason = "spliced chapter failed the completeness check"
+
+        logger.info("Full re-format of the chapter: %s", reason)
+        sp.set(patches=0, reason=reason)
+        return IncrementalResult(client.format_chapter(chapter_html), 0, reason)
+
+
+__all__ = [
+    "DiffPlan",
+    "IncrementalResult",
+    "Patch",
+    "anchor_blocks",
+    "apply_patches",
+    "html_blocks",
+    "markdown_blocks",
+    "plan_update",
+    "reformat_chapter",
+]
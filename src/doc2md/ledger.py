@@ -0,0 +1,245 @@
+"""Persistent ledger of LLM calls for capacity planning.
+
+Every HTTP attempt made by :class:`doc2md.llm_client.BaseLLMClient` is
+recorded in a local SQLite database while a ledger is active (see
+:func:`set_ledger`): provider, model, request kind, prompt and response
+sizes, the ``usage`` token counts of the response, latency, whether the
+attempt succeeded and why it was retried. :meth:`Ledger.report` aggregates
+the calls into latency percentiles per provider, model and kind, and
+:meth:`Ledger.latency_samples` feeds the latency model of
+:mod:`doc2md.planner`.
+"""
+
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+LEDGER_FILENAME = "llm_ledger.sqlite"
+
+# Attempt outcomes
+STATUS_OK = "ok"
+STATUS_RETRY = "retry"  # retried; ``reason`` says why (http_429, incomplete, ...)
+STATUS_FAILED = "failed"  # the call gave up with this attempt
+STATUS_CANCELLED = "cancelled"
+
+PERCENTILES = (50, 90, 95, 99)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    run_id TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    http_status INTEGER,
+    html_chars INTEGER NOT NULL,
+    prompt_chars INTEGER NOT NULL,
+    response_chars INTEGER NOT NULL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER,
+    latency REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_ts ON calls (ts);
+"""
+
+
+class CallRecord(NamedTuple):
+    """One HTTP attempt of an LLM call."""
+
+    provider: str
+    model: str
+    kind: str  # chapter, chapters (packed request) or fragment
+    attempt: int  # 1-based
+    status: str
+    reason: str = ""  # why the attempt was retried or failed
+    http_status: int | None = None
+    html_chars: int = 0  # chapter HTML sent in the prompt
+    prompt_chars: int = 0  # all message contents
+    response_chars: int = 0
+    prompt_tokens: int | None = None  # ``usage`` of the response, if reported
+    completion_tokens: int | None = None
+    total_tokens: int | None = None
+    latency: float = 0.0  # seconds of the HTTP request
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the ``q`` percentile (0-100) of ``values``."""
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return cuts[min(max(int(q) - 1, 0), 98)]
+
+
+class LedgerGroup(NamedTuple):
+    """Calls of one provider, model and kind."""
+
+    provider: str
+    model: str
+    kind: str
+    calls: int  # logical calls, retries not counted
+    attempts: int
+    failed: int
+    reasons: Dict[str, int]  # retries and failures by reason
+    latency: Dict[int, float]  # percentile -> seconds of successful attempts
+    prompt_tokens: int
+    completion_tokens: int
+
+    @property
+    def error_rate(self) -> float:
+        """Share of attempts that were not accepted."""
+        ok = self.calls - self.failed
+        return (self.attempts - ok) / self.attempts if self.attempts else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = self._asdict()
+        data["latency"] = {f"p{q}": round(s, 3) for q, s in self.latency.items()}
+        data["error_rate"] = round(self.error_rate, 4)
+        return data
+
+
+class Ledger:
+    """SQLite ledger shared by all client threads.
+
+    Args:
+        path: Database file, created with its directory if missing
+        run_id: Identifier stored with every call (default: random)
+    """
+
+    def __init__(self, path: str | Path, run_id: str | None = None) -> None:
+        import sqlite3
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def record(self, call: CallRecord) -> None:
+        row = (time.time(), self.run_id, *call)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO calls (ts, run_id, {', '.join(CallRecord._fields)})"
+                f" VALUES ({', '.join('?' * len(row))})",
+                row,
+            )
+            self._conn.commit()
+
+    def calls(self, since: float = 0.0, run_id: str = "") -> List[Dict[str, Any]]:
+        """Recorded attempts, oldest first.
+
+        Args:
+            since: Unix time of the earliest call to include
+            run_id: Only calls of this run
+        """
+        query = "SELECT * FROM calls WHERE ts >= ?"
+        params: List[Any] = [since]
+        if run_id:
+            query += " AND run_id = ?"
+            params.append(run_id)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def report(self, since: float = 0.0, run_id: str = "") -> List[LedgerGroup]:
+        """Aggregate calls per provider, model and kind."""
+        groups: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        for row in self.calls(since, run_id):
+            groups.setdefault((row["provider"], row["model"], row["kind"]), []).append(
+                row
+            )
+        report = []
+        for (provider, model, kind), rows in sorted(groups.items()):
+            ok = [r for r in rows if r["status"] == STATUS_OK]
+            failed = [
+                r for r in rows if r["status"] in {STATUS_FAILED, STATUS_CANCELLED}
+            ]
+            latencies = [r["latency"] for r in ok]
+            report.append(
+                LedgerGroup(
+                    provider,
+                    model,
+                    kind,
+                    len(ok) + len(failed),
+                    len(rows),
+                    len(failed),
+                    dict(Counter(r["reason"] for r in rows if r["reason"])),
+                    {q: percentile(latencies, q) for q in PERCENTILES},
+                    sum(r["prompt_tokens"] or 0 for r in rows),
+                    sum(r["completion_tokens"] or 0 for r in rows),
+                )
+            )
+        return report
+
+    def latency_samples(
+        self, provider: str = "", model: str = ""
+    ) -> List[Tuple[int, int, float]]:
+        """``(html_chars, response_chars, seconds)`` of successful chapter calls."""
+        query = (
+            "SELECT html_chars, response_chars, latency FROM calls"
+            " WHERE kind = 'chapter' AND status = ?"
+        )
+        params: List[Any] = [STATUS_OK]
+        if provider:
+            query += " AND provider = ?"
+            params.append(provider)
+        if model:
+            query += " AND model = ?"
+            params.append(model)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [(r[0], r[1], r[2]) for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_ledger: Ledger | None = None
+
+
+def get_ledger() -> Ledger | None:
+    """Return the process-wide ledger, or None when calls are not recorded."""
+    return _ledger
+
+
+def set_ledger(ledger: Ledger | None) -> Ledger | None:
+    """Make ``ledger`` record all LLM calls of the process; returns the previous one."""
+    global _ledger
+    previous, _ledger = _ledger, ledger
+    return previous
+
+
+def default_path() -> str:
+    """Ledger location from ``DOC2MD_LEDGER``; empty when disabled."""
+    from .config import settings
+
+    return settings.ledger_path
+
+
+__all__ = [
+    "CallRecord",
+    "LEDGER_FILENAME",
+    "Ledger",
+    "LedgerGroup",
+    "default_path",
+    "get_ledger",
+    "percentile",
+    "set_ledger",
+]
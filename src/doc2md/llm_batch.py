@@ -0,0 +1,268 @@
+"""Offline chapter formatting through provider batch APIs.
+
+All chapter requests are written to one JSONL file (one
+``{"custom_id", "body"}`` object per line), uploaded to the provider's files
+endpoint and submitted as a batch job against ``/v1/chat/completions``. The
+job is polled until it finishes, the output file is downloaded and every
+response goes through the same JSON, schema and completeness checks as
+interactive requests. Chapters whose response is missing or invalid are
+returned as exceptions so the caller can format them interactively.
+
+The wire format follows the Mistral batch API; the local mock server in
+:mod:`doc2md.mock_llm` implements the same endpoints.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+BATCH_DIRNAME = "_batch"
+REQUESTS_FILENAME = "requests.jsonl"
+RESULTS_FILENAME = "results.jsonl"
+CHAT_ENDPOINT = "/v1/chat/completions"
+
+# Providers whose API has batch endpoints
+BATCH_PROVIDERS = ("mistral", "mock")
+# Job states after which polling stops
+DONE_STATES = {"SUCCESS", "FAILED", "TIMEOUT_EXCEEDED", "CANCELLED"}
+
+_CUSTOM_ID_RE = re.compile(r'"custom_id"\s*:\s*"(\d+)"')
+
+
+def batch_base_url(llm_client: Any) -> str:
+    """Return the API base URL (``.../v1``) next to the client's completions URL."""
+    from .llm_client import MistralClient, MockClient
+
+    if not isinstance(llm_client, (MistralClient, MockClient)):
+        raise RuntimeError(
+            f"{llm_client.__class__.__name__} has no batch API."
+            f" Supported providers: {', '.join(BATCH_PROVIDERS)}"
+        )
+    return llm_client.api_url.rsplit("/chat/completions", 1)[0]
+
+
+def build_batch_lines(
+    llm_client: Any, chapter_htmls: List[str]
+) -> List[Dict[str, Any]]:
+    """Build one batch line per chapter with the client's prompt and payload."""
+    lines = []
+    for index, chapter_html in enumerate(chapter_htmls):
+        messages = llm_client.prompt_builder.build_for_chapter(chapter_html)
+        body = llm_client._build_payload(messages)
+        # The model is set on the job
+        body.pop("model", None)
+        lines.append({"custom_id": str(index), "body": body})
+    return lines
+
+
+class BatchAPI:
+    """Files and batch jobs endpoints of a provider.
+
+    Args:
+        base_url: API base, e.g. ``https://api.mistral.ai/v1``
+        api_key: Bearer token
+        client: HTTP client to use (a new one by default)
+    """
+
+    def __init__(
+        self, base_url: str, api_key: str, client: httpx.Client | None = None
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Accept": "application/json",
+        }
+        self._client = client or httpx.Client(timeout=120.0)
+
+    def upload(self, path: Path) -> str:
+        with open(path, "rb") as f:
+            response = self._client.post(
+                f"{self.base_url}/files",
+                headers=self.headers,
+                data={"purpose": "batch"},
+                files={"file": (path.name, f, "application/jsonl")},
+            )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def create_job(self, file_id: str, model: str, metadata: Dict[str, str]) -> str:
+        response = self._client.post(
+            f"{self.base_url}/batch/jobs",
+            headers=self.headers,
+            json={
+                "input_files": [file_id],
+                "endpoint": CHAT_ENDPOINT,
+                "model": model,
+                "metadata": metadata,
+            },
+        )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        response = self._client.get(
+            f"{self.base_url}/batch/jobs/{job_id}", headers=self.headers
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def download(self, file_id: str) -> str:
+        response = self._client.get(
+            f"{self.base_url}/files/{file_id}/content", headers=self.headers
+        )
+        response.raise_for_status()
+        return response.text
+
+    def wait(
+        self,
+        job_id: str,
+        *,
+        poll_interval: float = 30.0,
+        timeout: float | None = None,
+        on_status: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> Dict[str, Any]:
+        """Poll a job until it reaches one of :data:`DONE_STATES`.
+
+        Raises:
+            TimeoutError: If ``timeout`` seconds pass first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get_job(job_id)
+            if on_status is not None:
+                on_status(job)
+            if job.get("status") in DONE_STATES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Batch job {job_id} still {job.get('status')}")
+            time.sleep(poll_interval)
+
+
+def parse_batch_output(
+    llm_client: Any, chapter_htmls: List[str], output: str
+) -> List[Tuple[Dict[str, Any], str] | Exception]:
+    """Validate batch output lines like interactive responses."""
+    results: List[Tuple[Dict[str, Any], str] | Exception] = [
+        ValueError("No response in batch output") for _ in chapter_htmls
+    ]
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as exc:
+            # A truncated line fails its chapter, not the whole collection
+            logger.warning("Unreadable batch output line: %s", exc)
+            match = _CUSTOM_ID_RE.search(line)
+            if match and int(match.group(1)) < len(results):
+                results[int(match.group(1))] = ValueError(
+                    f"Unreadable batch output line: {exc}"
+                )
+            continue
+        index = int(item["custom_id"])
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code", 200) != 200:
+            results[index] = ValueError(
+                "Batch request failed:"
+                f" {item.get('error') or response.get('status_code')}"
+            )
+            continue
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+            parsed = llm_client._parse_chapter(chapter_htmls[index], content, False)
+        except Exception as exc:  # invalid JSON, schema violations
+            results[index] = exc
+            continue
+        if not isinstance(parsed, tuple):
+            results[index] = ValueError("Incomplete content in batch response")
+        else:
+            results[index] = parsed
+    return results
+
+
+def run_batch(
+    llm_client: Any,
+    chapter_htmls: List[str],
+    work_dir: str | Path,
+    *,
+    api: BatchAPI | None = None,
+    poll_interval: float = 30.0,
+    timeout: float | None = None,
+    on_status: Callable[[Dict[str, Any]], None] | None = None,
+) -> List[Tuple[Dict[str, Any], str] | Exception]:
+    """
+    Format chapters with one batch job.
+
+    Args:
+        llm_client: Interactive client whose prompt, payload and validation
+            are reused (its ``model`` and ``api_key`` are used for the job)
+        chapter_htmls: Chapters to format
+        work_dir: Directory for the request and result JSONL files
+        api: Batch endpoints (default: next to the client's API URL)
+        poll_interval: Seconds between job status requests
+        timeout: Seconds to wait for the job
+        on_status: Called with the job object after every poll
+
+    Returns:
+        ``(manifest, markdown)`` or the exception explaining the failure,
+        per chapter; a job that ends without output (failed, expired,
+        cancelled) fails every chapter, so they can be sent interactively
+    """
+    work_path = Path(work_dir)
+    work_path.mkdir(parents=True, exist_ok=True)
+    api = api or BatchAPI(batch_base_url(llm_client), llm_client.api_key)
+
+    with span("llm_batch.run", chapters=len(chapter_htmls)) as sp:
+        requests_path = work_path / REQUESTS_FILENAME
+        with open(requests_path, "w", encoding="utf-8") as f:
+            for line in build_batch_lines(llm_client, chapter_htmls):
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+        file_id = api.upload(requests_path)
+        job_id = api.create_job(
+            file_id,
+            llm_client.model,
+            {"job_type": "doc2md", "chapters": str(len(chapter_htmls))},
+        )
+        logger.info(
+            "Submitted batch job %s with %d chapters", job_id, len(chapter_htmls)
+        )
+        job = api.wait(
+            job_id, poll_interval=poll_interval, timeout=timeout, on_status=on_status
+        )
+        sp.set(job=job_id, status=job.get("status"))
+        if not job.get("output_file"):
+            error = RuntimeError(
+                f"Batch job {job_id} finished with status {job.get('status')}"
+            )
+            logger.warning("%s, no output to parse", error)
+            sp.set(failed=len(chapter_htmls))
+            return [error for _ in chapter_htmls]
+
+        output = api.download(job["output_file"])
+        (work_path / RESULTS_FILENAME).write_text(output, encoding="utf-8")
+        results = parse_batch_output(llm_client, chapter_htmls, output)
+        sp.set(failed=sum(isinstance(r, Exception) for r in results))
+    return results
+
+
+__all__ = [
+    "BATCH_DIRNAME",
+    "BATCH_PROVIDERS",
+    "BatchAPI",
+    "build_batch_lines",
+    "batch_base_url",
+    "parse_batch_output",
+    "run_batch",
+]
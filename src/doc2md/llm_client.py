@@ -3,13 +3,14 @@
 from __future__ import annotations
 
 import json
+import logging
 import re
+import threading
 import time
-from typing import Any, Dict, List, Protocol, Tuple, cast
-from bs4 import BeautifulSoup
+from typing import Any, Callable, Dict, List, Protocol, Tuple, cast
 
 import httpx
-from jsonschema import validate
+from jsonschema import ValidationError, validate
 
 from .config import (
     # OpenRouter config
@@ -22,11 +23,52 @@ from .config import (
     MISTRAL_API_KEY,
     MISTRAL_API_URL,
     MISTRAL_DEFAULT_MODEL,
+    # Local mock server
+    MOCK_LLM_API_URL,
+    MOCK_DEFAULT_MODEL,
     # Backward compatibility (used in tests / monkeypatching)
     HTTP_REFERER,  # noqa: F401
     APP_TITLE,  # noqa: F401
 )
+from .ledger import (
+    STATUS_CANCELLED,
+    STATUS_FAILED,
+    STATUS_OK,
+    STATUS_RETRY,
+    CallRecord,
+    get_ledger,
+)
 from .schema import CHAPTER_MANIFEST_SCHEMA
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    """Return the ``Retry-After`` delay in seconds, if the server sent one."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        # HTTP-date form is not used by the providers we talk to
+        return None
+
+
+# Returned by a response parser to request another attempt
+_RETRY = object()
+
+
+class RequestCancelled(Exception):
+    """Raised when a chapter request is cancelled through its cancel event."""
+
+
+def _sleep(seconds: float, cancel: threading.Event | None) -> None:
+    if cancel is None:
+        time.sleep(seconds)
+    elif cancel.wait(seconds):
+        raise RequestCancelled()
 
 
 class PromptBuilderProtocol(Protocol):
@@ -55,12 +97,24 @@ class BaseLLMClient:
         self.model = model
         self.api_url = api_url
         self.max_retries = max_retries
+        self.retry_count = 0  # retries made by this client across all chapters
         self._client = client or httpx.Client(timeout=30.0)
 
+    def close(self) -> None:
+        """Close the HTTP session."""
+        self._client.close()
+
+    @property
+    def provider_name(self) -> str:
+        """Provider as named on the command line (``MistralClient`` -> ``mistral``)."""
+        return self.__class__.__name__.removesuffix("Client").lower()
+
     def _validate_content_completeness(
         self, html_input: str, markdown_output: str
     ) -> bool:
         """Проверяет, что весь важный контент из HTML попал в Markdown"""
+        from bs4 import BeautifulSoup
+
         try:
             soup = BeautifulSoup(html_input, "html.parser")
 
@@ -88,89 +142,332 @@ class BaseLLMClient:
 
             # Считаем контент неполным, если пропущено более 20% заголовков или кода
             if header_loss_ratio > 0.2 or code_loss_ratio > 0.3:
-                print("Warning: Content completeness check failed:")
-                print(
-                    f"  Missing headers: {len(missing_headers)}/{len(html_headers)} ({header_loss_ratio:.1%})"
-                )
-                print(
-                    f"  Missing code blocks: {len(missing_code)}/{len(html_code_blocks)} ({code_loss_ratio:.1%})"
+                logger.warning(
+                    "Content completeness check failed: missing headers %d/%d (%.1f%%),"
+                    " missing code blocks %d/%d (%.1f%%)",
+                    len(missing_headers),
+                    len(html_headers),
+                    header_loss_ratio * 100,
+                    len(missing_code),
+                    len(html_code_blocks),
+                    code_loss_ratio * 100,
                 )
                 return False
 
             return True
         except Exception as e:
-            print(f"Warning: Content validation failed: {e}")
+            logger.warning("Content validation failed: %s", e)
             return True  # При ошибке валидации не блокируем процесс
 
-    def format_chapter(self, chapter_html: str) -> Tuple[Dict[str, Any], str]:
-        """Format a chapter of HTML via the LLM API."""
+    def format_chapter(
+        self, chapter_html: str, cancel: threading.Event | None = None
+    ) -> Tuple[Dict[str, Any], str]:
+        """Format a chapter of HTML via the LLM API.
+
+        Setting ``cancel`` stops the call before its next attempt or during a
+        backoff wait with :class:`RequestCancelled`; a request already in
+        flight is allowed to finish and its result is discarded.
+        """
+        with span(
+            "llm.format_chapter",
+            provider=self.__class__.__name__,
+            model=self.model,
+            bytes_in=len(chapter_html),
+        ) as sp:
+            manifest, markdown = self._format_chapter(chapter_html, sp, cancel)
+            sp.set(chapter=manifest.get("chapter_number"), bytes_out=len(markdown))
+        return manifest, markdown
+
+    def _post(self, payload: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+        with span("llm.request", category="http") as sp:
+            response = self._client.post(
+                cast(str, self.api_url), json=payload, headers=headers
+            )
+            sp.set(status=response.status_code, bytes_out=len(response.content))
+        return response
+
+    def _format_chapter(
+        self, chapter_html: str, sp: Any, cancel: threading.Event | None = None
+    ) -> Tuple[Dict[str, Any], str]:
         messages = self.prompt_builder.build_for_chapter(chapter_html)
+        return self._request(
+            messages,
+            lambda content, last: self._parse_chapter(chapter_html, content, last),
+            sp,
+            cancel,
+            kind="chapter",
+            html_chars=len(chapter_html),
+        )
+
+    def format_chapters(
+        self,
+        chapter_htmls: List[str],
+        numbers: List[int] | None = None,
+        cancel: threading.Event | None = None,
+    ) -> List[Tuple[Dict[str, Any], str] | Exception]:
+        """Format several chapters with one request.
+
+        ``numbers`` are the chapters' numbers in the document. The prompt
+        comes from ``prompt_builder.build_for_chapters`` and the
+        response must hold a ``chapters`` array in the same order. Items are
+        validated one by one: an invalid item is returned as the exception
+        describing the problem, so the caller can retry just that chapter.
+
+        Raises:
+            ValueError: If the response is not a ``chapters`` array of the
+                expected length
+        """
+        builder = cast(Any, self.prompt_builder)
+        with span(
+            "llm.format_chapters",
+            provider=self.__class__.__name__,
+            model=self.model,
+            chapters=len(chapter_htmls),
+            bytes_in=sum(len(h) for h in chapter_htmls),
+        ) as sp:
+            results = self._request(
+                builder.build_for_chapters(chapter_htmls, numbers),
+                lambda content, last: self._parse_chapters(chapter_htmls, content),
+                sp,
+                cancel,
+                kind="chapters",
+                html_chars=sum(len(h) for h in chapter_htmls),
+            )
+            sp.set(failed=sum(isinstance(r, Exception) for r in results))
+        return results
+
+    def format_fragment(
+        self,
+        changed_html: str,
+        previous_markdown: str,
+        before_html: str = "",
+        after_html: str = "",
+        cancel: threading.Event | None = None,
+    ) -> str:
+        """Format the changed blocks of a chapter and return their Markdown.
+
+        The prompt comes from ``prompt_builder.build_for_fragment``; the
+        response must be a JSON object with a ``markdown`` field and pass the
+        completeness check against ``changed_html``.
+        """
+        builder = cast(Any, self.prompt_builder)
+        with span(
+            "llm.format_fragment",
+            provider=self.__class__.__name__,
+            model=self.model,
+            bytes_in=len(changed_html),
+        ) as sp:
+            markdown = self._request(
+                builder.build_for_fragment(
+                    changed_html, previous_markdown, before_html, after_html
+                ),
+                lambda content, last: self._parse_fragment(changed_html, content, last),
+                sp,
+                cancel,
+                kind="fragment",
+                html_chars=len(changed_html),
+            )
+            sp.set(bytes_out=len(markdown))
+        return markdown
+
+    def _request(
+        self,
+        messages: List[Dict[str, str]],
+        parse: Callable[[str, bool], Any],
+        sp: Any,
+        cancel: threading.Event | None,
+        *,
+        kind: str = "chapter",
+        html_chars: int = 0,
+    ) -> Any:
+        """Send ``messages`` with retries and return ``parse(content, last_attempt)``.
+
+        ``parse`` returns :data:`_RETRY` to ask for another attempt. Every
+        attempt is recorded in the process-wide ledger, if one is set.
+        """
         payload = self._build_payload(messages)
         headers = self._get_headers()
+        ledger = get_ledger()
+        first_call = CallRecord(
+            self.provider_name,
+            self.model or "",
+            kind,
+            0,
+            "",
+            html_chars=html_chars,
+            prompt_chars=sum(len(m["content"]) for m in messages),
+        )
 
         delay = 1
+        retries: List[str] = []
         for attempt in range(self.max_retries):
-            response = self._client.post(
-                cast(str, self.api_url), json=payload, headers=headers
+            sp.set(attempts=attempt + 1, retries=len(retries), retry_reasons=retries)
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled()
+            call = first_call._replace(attempt=attempt + 1)
+            started = time.perf_counter()
+            try:
+                response = self._post(payload, headers)
+            except Exception as exc:
+                if ledger is not None:
+                    ledger.record(
+                        call._replace(
+                            status=STATUS_FAILED,
+                            reason=type(exc).__name__,
+                            latency=time.perf_counter() - started,
+                        )
+                    )
+                raise
+            call = call._replace(
+                http_status=response.status_code, latency=time.perf_counter() - started
             )
+            if cancel is not None and cancel.is_set():
+                if ledger is not None:
+                    ledger.record(call._replace(status=STATUS_CANCELLED))
+                raise RequestCancelled()
             if response.status_code in {429} or 500 <= response.status_code < 600:
-                if attempt == self.max_retries - 1:
+                last = attempt == self.max_retries - 1
+                if ledger is not None:
+                    ledger.record(
+                        call._replace(
+                            status=STATUS_FAILED if last else STATUS_RETRY,
+                            reason=f"http_{response.status_code}",
+                        )
+                    )
+                if last:
                     response.raise_for_status()
-                time.sleep(delay)
+                retries.append(f"http_{response.status_code}")
+                self.retry_count += 1
+                _sleep(_retry_after(response) or delay, cancel)
                 delay *= 2
                 continue
-            response.raise_for_status()
-            try:
-                data = response.json()
-            except json.JSONDecodeError as exc:
-                content_type = response.headers.get("Content-Type", "")
-                snippet = response.text[:200]
-                raise ValueError(
-                    f"Unexpected response from {self.__class__.__name__}:"
-                    f" content-type={content_type!r}, body={snippet!r}"
-                ) from exc
-            content = data["choices"][0]["message"]["content"]
             try:
-                response_json = json.loads(content)
-                manifest = response_json.get("manifest", {})
-                markdown = response_json.get("markdown", "")
-
-                if not manifest or not markdown:
+                response.raise_for_status()
+                try:
+                    data = response.json()
+                except json.JSONDecodeError as exc:
+                    content_type = response.headers.get("Content-Type", "")
+                    snippet = response.text[:200]
                     raise ValueError(
-                        "JSON response missing 'manifest' or 'markdown' fields"
+                        f"Unexpected response from {self.__class__.__name__}:"
+                        f" content-type={content_type!r}, body={snippet!r}"
+                    ) from exc
+                content = data["choices"][0]["message"]["content"]
+                usage = data.get("usage") or {}
+                call = call._replace(
+                    response_chars=len(content),
+                    prompt_tokens=usage.get("prompt_tokens"),
+                    completion_tokens=usage.get("completion_tokens"),
+                    total_tokens=usage.get("total_tokens"),
+                )
+                result = parse(content, attempt == self.max_retries - 1)
+            except Exception as exc:
+                if ledger is not None:
+                    reason = (
+                        f"http_{response.status_code}"
+                        if isinstance(exc, httpx.HTTPStatusError)
+                        else type(exc).__name__
                     )
-
-                validate(instance=manifest, schema=CHAPTER_MANIFEST_SCHEMA)
-
-                # Валидация полноты контента
-                if not self._validate_content_completeness(chapter_html, markdown):
-                    if attempt < self.max_retries - 1:
-                        print(
-                            f"Retrying due to incomplete content (attempt {attempt + 1}/{self.max_retries})"
-                        )
-                        time.sleep(delay)
-                        delay *= 2
-                        continue
-                    else:
-                        print(
-                            "Warning: Content may be incomplete, but proceeding anyway"
-                        )
-
-            except (json.JSONDecodeError, KeyError) as e:
-                # Fallback to old format for backwards compatibility
-                json_match = re.search(r"```json\n(.*?)\n```", content, re.DOTALL)
-                md_match = re.search(r"```markdown\n(.*?)\n```", content, re.DOTALL)
-                if not json_match or not md_match:
-                    raise ValueError(f"LLM response not in expected JSON format: {e}")
-                manifest = json.loads(json_match.group(1))
-                validate(instance=manifest, schema=CHAPTER_MANIFEST_SCHEMA)
-                markdown = md_match.group(1)
-            return manifest, markdown
+                    ledger.record(call._replace(status=STATUS_FAILED, reason=reason))
+                raise
+            if result is _RETRY:
+                if ledger is not None:
+                    last = attempt == self.max_retries - 1
+                    status = STATUS_FAILED if last else STATUS_RETRY
+                    ledger.record(call._replace(status=status, reason="incomplete"))
+                logger.warning(
+                    "Retrying due to incomplete content (attempt %d/%d)",
+                    attempt + 1,
+                    self.max_retries,
+                )
+                retries.append("incomplete")
+                self.retry_count += 1
+                _sleep(delay, cancel)
+                delay *= 2
+                continue
+            if ledger is not None:
+                ledger.record(call._replace(status=STATUS_OK))
+            return result
 
         raise RuntimeError(
             f"Failed to obtain response from {self.__class__.__name__} after retries"
         )
 
+    def _parse_chapter(
+        self, chapter_html: str, content: str, last_attempt: bool
+    ) -> Any:
+        try:
+            response_json = json.loads(content)
+            manifest = response_json.get("manifest", {})
+            markdown = response_json.get("markdown", "")
+
+            if not manifest or not markdown:
+                raise ValueError(
+                    "JSON response missing 'manifest' or 'markdown' fields"
+                )
+
+            validate(instance=manifest, schema=CHAPTER_MANIFEST_SCHEMA)
+
+            # Валидация полноты контента
+            if not self._validate_content_completeness(chapter_html, markdown):
+                if not last_attempt:
+                    return _RETRY
+                logger.warning("Content may be incomplete, but proceeding anyway")
+
+        except (json.JSONDecodeError, KeyError) as e:
+            # Fallback to old format for backwards compatibility
+            json_match = re.search(r"```json\n(.*?)\n```", content, re.DOTALL)
+            md_match = re.search(r"```markdown\n(.*?)\n```", content, re.DOTALL)
+            if not json_match or not md_match:
+                raise ValueError(f"LLM response not in expected JSON format: {e}")
+            manifest = json.loads(json_match.group(1))
+            validate(instance=manifest, schema=CHAPTER_MANIFEST_SCHEMA)
+            markdown = md_match.group(1)
+        return manifest, markdown
+
+    def _parse_chapters(
+        self, chapter_htmls: List[str], content: str
+    ) -> List[Tuple[Dict[str, Any], str] | Exception]:
+        try:
+            items = json.loads(content)["chapters"]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            raise ValueError(f"Packed response has no 'chapters' array: {e}")
+        if not isinstance(items, list) or len(items) != len(chapter_htmls):
+            raise ValueError(
+                f"Packed response has {len(items) if isinstance(items, list) else 0}"
+                f" chapters, expected {len(chapter_htmls)}"
+            )
+
+        results: List[Tuple[Dict[str, Any], str] | Exception] = []
+        for chapter_html, item in zip(chapter_htmls, items):
+            try:
+                manifest = item.get("manifest") if isinstance(item, dict) else None
+                markdown = item.get("markdown") if isinstance(item, dict) else None
+                if not manifest or not markdown:
+                    raise ValueError("Item missing 'manifest' or 'markdown' fields")
+                validate(instance=manifest, schema=CHAPTER_MANIFEST_SCHEMA)
+                if not self._validate_content_completeness(chapter_html, markdown):
+                    raise ValueError("Item content is incomplete")
+                results.append((manifest, markdown))
+            except (ValueError, ValidationError) as e:
+                results.append(e)
+        return results
+
+    def _parse_fragment(
+        self, changed_html: str, content: str, last_attempt: bool
+    ) -> Any:
+        try:
+            markdown = json.loads(content)["markdown"]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            raise ValueError(f"Fragment response has no 'markdown' field: {e}")
+        if not isinstance(markdown, str) or not markdown.strip():
+            raise ValueError("Fragment response has empty 'markdown'")
+        if not self._validate_content_completeness(changed_html, markdown):
+            if not last_attempt:
+                return _RETRY
+            logger.warning("Fragment content may be incomplete, but proceeding anyway")
+        return markdown
+
     def _get_headers(self) -> Dict[str, str]:
         """Get headers for the API request. Override in subclasses."""
         return {
@@ -268,6 +565,29 @@ class MistralClient(BaseLLMClient):
         return payload
 
 
+class MockClient(BaseLLMClient):
+    """Client for the local mock server from :mod:`doc2md.mock_llm`."""
+
+    def __init__(
+        self,
+        prompt_builder: PromptBuilderProtocol,
+        api_key: str | None = None,
+        *,
+        model: str | None = None,
+        api_url: str | None = None,
+        max_retries: int = 5,
+        client: httpx.Client | None = None,
+    ) -> None:
+        super().__init__(
+            prompt_builder=prompt_builder,
+            api_key=api_key or "mock",
+            model=model or MOCK_DEFAULT_MODEL,
+            api_url=api_url or MOCK_LLM_API_URL,
+            max_retries=max_retries,
+            client=client,
+        )
+
+
 class ClientFactory:
     """Factory for creating LLM clients based on provider."""
 
@@ -283,7 +603,22 @@ class ClientFactory:
             return MistralClient(prompt_builder, model=model, **kwargs)
         elif provider.lower() == "openrouter":
             return OpenRouterClient(prompt_builder, model=model, **kwargs)
+        elif provider.lower() == "mock":
+            return MockClient(prompt_builder, model=model, **kwargs)
         else:
             raise ValueError(
-                f"Unknown provider: {provider}. Supported: 'mistral', 'openrouter'"
+                f"Unknown provider: {provider}."
+                " Supported: 'mistral', 'openrouter', 'mock'"
             )
+
+    @staticmethod
+    def create_routed_client(
+        policy: Any, prompt_builder: PromptBuilderProtocol, **kwargs
+    ) -> Any:
+        """Create a client choosing provider and model per chapter.
+
+        ``policy`` is a :class:`doc2md.routing.RoutingPolicy`.
+        """
+        from .routing import RoutedClient
+
+        return RoutedClient(policy, prompt_builder, **kwargs)
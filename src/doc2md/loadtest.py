@@ -0,0 +1,127 @@
+"""Throughput and latency measurement of LLM clients."""
+
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, NamedTuple
+
+from .llm_client import BaseLLMClient
+
+
+class LoadTestReport(NamedTuple):
+    """Outcome of a load test run."""
+
+    chapters: int
+    failed: int
+    elapsed: float
+    latencies: List[float]  # seconds per successful chapter, retries included
+    retries: int
+
+    @property
+    def chapters_per_sec(self) -> float:
+        return self.chapters / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Return the ``q`` percentile (0-100) of chapter latency in seconds."""
+        if not self.latencies:
+            return 0.0
+        if len(self.latencies) == 1:
+            return self.latencies[0]
+        cuts = statistics.quantiles(self.latencies, n=100, method="inclusive")
+        return cuts[min(max(int(q) - 1, 0), 98)]
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(50)
+
+    @property
+    def p95(self) -> float:
+        return self.percentile(95)
+
+
+def synthetic_chapters(count: int, paragraphs: int = 5) -> List[str]:
+    """Return ``count`` small chapters with headings, text and a code block."""
+    chapters = []
+    for idx in range(1, count + 1):
+        body = "".join(
+            f"<p>Параграф {p} главы {idx}: настройка и проверка компонентов.</p>"
+            for p in range(1, paragraphs + 1)
+        )
+        chapters.append(
+            f"<h1>{idx} Глава {idx}</h1>{body}"
+            f"<h2>{idx}.1 Проверка</h2>"
+            '<pre><code class="language-bash">'
+            f"systemctl status service-{idx}</code></pre>"
+        )
+    return chapters
+
+
+def run_load_test(
+    chapters: List[str],
+    make_client: Callable[[], BaseLLMClient],
+    *,
+    concurrency: int = 4,
+    on_chapter: Callable[[int, float | None], None] | None = None,
+) -> LoadTestReport:
+    """
+    Format ``chapters`` concurrently and collect latency and retry statistics.
+
+    Args:
+        chapters: Chapter HTML fragments to send
+        make_client: Creates a client; each worker thread gets its own
+        concurrency: Number of worker threads
+        on_chapter: Called with chapter index and latency (None on failure)
+
+    Returns:
+        Aggregated report
+    """
+    local = threading.local()
+    clients: List[BaseLLMClient] = []
+    clients_lock = threading.Lock()
+
+    def worker_client() -> BaseLLMClient:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = make_client()
+            with clients_lock:
+                clients.append(client)
+        return client
+
+    def format_one(chapter_html: str) -> float:
+        start = time.perf_counter()
+        worker_client().format_chapter(chapter_html)
+        return time.perf_counter() - start
+
+    latencies: List[float] = []
+    failed = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(format_one, chapter): idx
+            for idx, chapter in enumerate(chapters, start=1)
+        }
+        for future in as_completed(futures):
+            try:
+                latency: float | None = future.result()
+            except Exception:
+                latency = None
+                failed += 1
+            else:
+                latencies.append(latency)
+            if on_chapter is not None:
+                on_chapter(futures[future], latency)
+    elapsed = time.perf_counter() - start
+
+    return LoadTestReport(
+        chapters=len(latencies),
+        failed=failed,
+        elapsed=elapsed,
+        latencies=sorted(latencies),
+        retries=sum(client.retry_count for client in clients),
+    )
+
+
+__all__ = ["LoadTestReport", "run_load_test", "synthetic_chapters"]
@@ -0,0 +1,176 @@
+"""Persistent cache of Mammoth DOCX to HTML conversions.
+
+Entries are keyed by the hashes of the DOCX bytes and the style map plus the
+Mammoth version, and hold the HTML together with the conversion messages.
+Old entries are evicted by age, then least recently used ones by total size.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the stored format changes
+_CACHE_VERSION = 1
+
+
+def mammoth_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("mammoth")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class CachedConversion(NamedTuple):
+    """Mammoth output restored from the cache."""
+
+    html: str
+    messages: List[Dict[str, str]]  # {"type": ..., "message": ...}
+
+
+class MammothCache:
+    """Directory of cached conversions.
+
+    Args:
+        root: Cache directory
+        max_bytes: Total size kept after eviction (0 disables the limit)
+        max_age: Seconds since last use after which entries are dropped
+            (0 disables the limit)
+    """
+
+    def __init__(
+        self, root: str | Path, *, max_bytes: int = 0, max_age: float = 0
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    @staticmethod
+    def key(docx_bytes: bytes, style_map: str) -> str:
+        payload = json.dumps(
+            [
+                _CACHE_VERSION,
+                hashlib.sha256(docx_bytes).hexdigest(),
+                hashlib.sha256(style_map.encode("utf-8")).hexdigest(),
+                mammoth_version(),
+            ]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> CachedConversion | None:
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning("Dropping unreadable Mammoth cache entry %s", path)
+            path.unlink(missing_ok=True)
+            return None
+        # Record the use for LRU eviction
+        os.utime(path)
+        return CachedConversion(data["html"], data["messages"])
+
+    def put(self, key: str, html: str, messages: List[Dict[str, str]]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(
+            json.dumps({"html": html, "messages": messages}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used over the size limit."""
+        if not self.max_age and not self.max_bytes:
+            return 0
+        removed = 0
+        entries = self._entries()
+        if self.max_age:
+            cutoff = time.time() - self.max_age
+            while entries and entries[0][0] < cutoff:
+                entries.pop(0)[2].unlink(missing_ok=True)
+                removed += 1
+        if self.max_bytes:
+            total = sum(size for _, size, _ in entries)
+            # Always keep the newest entry, even if it alone exceeds the limit
+            while total > self.max_bytes and len(entries) > 1:
+                _, size, path = entries.pop(0)
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        return removed
+
+
+def default_cache() -> MammothCache | None:
+    """Return the cache configured in :mod:`doc2md.config`, or None if disabled."""
+    from .config import settings
+
+    if not settings.mammoth_cache:
+        return None
+    return MammothCache(
+        Path(settings.cache_dir) / "mammoth",
+        max_bytes=settings.mammoth_cache_max_mb * 1024 * 1024,
+        max_age=settings.mammoth_cache_max_age_days * 86400,
+    )
+
+
+def convert_with_cache(
+    docx_bytes: bytes, style_map: str, cache: MammothCache | None
+) -> Tuple[CachedConversion, bool]:
+    """Run Mammoth on ``docx_bytes`` unless ``cache`` already has the result.
+
+    Returns:
+        Conversion result and whether it came from the cache
+    """
+    key = MammothCache.key(docx_bytes, style_map) if cache is not None else ""
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, True
+
+    import io
+
+    import mammoth
+
+    result = mammoth.convert_to_html(io.BytesIO(docx_bytes), style_map=style_map)
+    messages = [{"type": m.type, "message": m.message} for m in result.messages]
+    if cache is not None:
+        try:
+            cache.put(key, result.value, messages)
+        except OSError as exc:
+            logger.warning("Could not write Mammoth cache: %s", exc)
+    return CachedConversion(result.value, messages), False
+
+
+__all__ = [
+    "CachedConversion",
+    "MammothCache",
+    "convert_with_cache",
+    "default_cache",
+    "mammoth_version",
+]
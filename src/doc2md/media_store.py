@@ -0,0 +1,133 @@
+"""Content-addressed storage for extracted media files."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict
+
+LINK_MODES = ("auto", "reflink", "hardlink", "copy", "rewrite")
+
+# ioctl request number of FICLONE on Linux (btrfs, xfs, overlayfs on top of them)
+_FICLONE = 0x40049409
+
+
+def file_digest(path: str | Path) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    import fcntl
+
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+        except OSError:
+            dst_file.close()
+            dst.unlink(missing_ok=True)
+            raise
+
+
+def _place(src: Path, dst: Path, mode: str) -> None:
+    """Create ``dst`` from ``src`` atomically using the requested link mode."""
+    tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}.tmp")
+    attempts = {
+        "auto": ("reflink", "hardlink", "copy"),
+        "reflink": ("reflink",),
+        "hardlink": ("hardlink",),
+        "copy": ("copy",),
+    }[mode]
+    error: OSError | None = None
+    for attempt in attempts:
+        try:
+            if attempt == "reflink":
+                _reflink(src, tmp)
+            elif attempt == "hardlink":
+                os.link(src, tmp)
+            else:
+                shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+            return
+        except (OSError, ImportError) as exc:
+            tmp.unlink(missing_ok=True)
+            error = exc if isinstance(exc, OSError) else OSError(str(exc))
+    raise error or OSError(f"Cannot place {src} at {dst}")
+
+
+class MediaStore:
+    """Store every distinct media file once, addressed by its content hash.
+
+    Files are kept at ``root/<aa>/<sha256><suffix>``. Several processes may
+    share one store: entries are written to a temporary name and moved into
+    place, so concurrent writers of identical content do not conflict.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def path_for(self, digest: str, suffix: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{suffix.lower()}"
+
+    def add(self, path: str | Path) -> Path:
+        """Add a file to the store and return its canonical location."""
+        path = Path(path)
+        canonical = self.path_for(file_digest(path), path.suffix)
+        if not canonical.exists():
+            canonical.parent.mkdir(parents=True, exist_ok=True)
+            _place(path, canonical, "auto")
+        return canonical
+
+    def link(self, canonical: Path, dest: str | Path, mode: str = "auto") -> None:
+        """Replace ``dest`` with a reflink, hard link or copy of ``canonical``."""
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists() and os.path.samefile(canonical, dest):
+            return
+        _place(canonical, dest, mode)
+
+
+def dedupe_media(
+    media_root: str | Path, store: MediaStore, mode: str = "auto"
+) -> Dict[Path, Path]:
+    """
+    Move every file under ``media_root`` into ``store``.
+
+    In ``rewrite`` mode the per-chapter copies are deleted and callers are
+    expected to point Markdown links at the canonical paths; in the other
+    modes each copy is replaced by a link to its canonical file so existing
+    links keep working.
+
+    Returns:
+        Mapping of original file path to canonical store path
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(
+            f"Unknown link mode: {mode}. Supported: {', '.join(LINK_MODES)}"
+        )
+
+    media_root = Path(media_root)
+    store_root = store.root.resolve()
+    mapping: Dict[Path, Path] = {}
+    for path in sorted(media_root.rglob("*")):
+        if not path.is_file() or path.name.startswith("."):
+            continue
+        if store_root in path.resolve().parents:
+            continue
+        canonical = store.add(path)
+        mapping[path] = canonical
+        if mode == "rewrite":
+            path.unlink()
+        else:
+            store.link(canonical, path, mode)
+    return mapping
+
+
+__all__ = ["LINK_MODES", "MediaStore", "dedupe_media", "file_digest"]
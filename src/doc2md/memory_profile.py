@@ -0,0 +1,229 @@
+"""Per-stage memory profiling on top of the tracing spans.
+
+:class:`MemoryProfiler` listens to the spans emitted by the pipeline stages.
+At every stage boundary it reads the tracemalloc peak and the process peak
+RSS, and snapshots the Python heap so that the allocation sites retained by
+a stage can be listed. Nested and concurrent stages are handled by folding
+each observed peak into every stage that is open at that moment.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import tracemalloc
+from typing import Dict, List, NamedTuple, Tuple
+
+from .tracing import Span, Tracer, get_tracer
+
+MB = 1024 * 1024
+
+
+def peak_rss(children: bool = False) -> int:
+    """Return the peak resident set size in bytes.
+
+    Args:
+        children: Report the largest finished child process (e.g. pandoc)
+            instead of this process
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    usage = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+class AllocationSite(NamedTuple):
+    """Source line that allocated memory during a stage."""
+
+    location: str
+    size: int  # bytes still allocated at the end of the stage
+    count: int
+
+
+class StageMemory(NamedTuple):
+    """Memory usage of one stage, aggregated over all its calls."""
+
+    name: str
+    calls: int
+    peak: int  # highest traced Python heap while the stage ran
+    retained: int  # heap growth between stage start and end
+    rss_peak: int  # process peak RSS at the end of the stage
+    top_sites: Tuple[AllocationSite, ...]
+
+
+class _OpenStage:
+    __slots__ = ("peak", "start_current", "snapshot")
+
+    def __init__(self, current: int, snapshot) -> None:
+        self.peak = current
+        self.start_current = current
+        self.snapshot = snapshot
+
+
+class MemoryProfiler:
+    """Collect peak memory and top allocation sites for every traced stage.
+
+    Args:
+        top: Number of allocation sites kept per stage
+        frames: Traceback depth recorded by tracemalloc
+        categories: Span categories that get heap snapshots; other spans
+            only record peaks, because snapshots are expensive
+    """
+
+    def __init__(
+        self,
+        *,
+        top: int = 5,
+        frames: int = 1,
+        categories: Tuple[str, ...] = ("stage",),
+    ) -> None:
+        self.top = top
+        self.frames = frames
+        self.categories = categories
+        self.stages: Dict[str, StageMemory] = {}
+        self.overall_peak = 0
+        self._open: Dict[int, _OpenStage] = {}
+        self._lock = threading.Lock()
+        self._tracer: Tracer | None = None
+        self._started_tracemalloc = False
+
+    def start(self, tracer: Tracer | None = None) -> "MemoryProfiler":
+        """Begin tracing allocations and listening to ``tracer`` spans."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._tracer = tracer or get_tracer()
+        self._tracer.add_listener(self)
+        return self
+
+    def stop(self) -> None:
+        """Stop listening; tracemalloc is stopped only if we started it."""
+        if self._tracer is not None:
+            self._tracer.remove_listener(self)
+            self._tracer = None
+        with self._lock:
+            self._fold_peak()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def __enter__(self) -> "MemoryProfiler":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _fold_peak(self) -> int:
+        """Credit the peak since the last boundary to all open stages."""
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for stage in self._open.values():
+            stage.peak = max(stage.peak, peak)
+        self.overall_peak = max(self.overall_peak, peak)
+        return current
+
+    def span_started(self, span: Span) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        with self._lock:
+            self._fold_peak()
+            snapshot = None
+            if span.category in self.categories:
+                snapshot = tracemalloc.take_snapshot()
+                # Do not charge the snapshot itself to the new stage
+                tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            self._open[id(span)] = _OpenStage(current, snapshot)
+
+    def span_finished(self, span: Span) -> None:
+        with self._lock:
+            if id(span) not in self._open or not tracemalloc.is_tracing():
+                return
+            current = self._fold_peak()
+            stage = self._open.pop(id(span))
+            peak = max(stage.peak, current)
+            sites: Tuple[AllocationSite, ...] = ()
+            if stage.snapshot is not None:
+                sites = self._top_sites(tracemalloc.take_snapshot(), stage.snapshot)
+                tracemalloc.reset_peak()
+        rss = peak_rss()
+
+        retained = current - stage.start_current
+        span.set(
+            mem_peak_mb=round(peak / MB, 3),
+            mem_retained_mb=round(retained / MB, 3),
+            rss_peak_mb=round(rss / MB, 3),
+        )
+        with self._lock:
+            previous = self.stages.get(span.name)
+            if previous is None:
+                self.stages[span.name] = StageMemory(
+                    span.name, 1, peak, retained, rss, sites
+                )
+            else:
+                heavier = peak >= previous.peak
+                self.stages[span.name] = StageMemory(
+                    span.name,
+                    previous.calls + 1,
+                    max(previous.peak, peak),
+                    max(previous.retained, retained),
+                    max(previous.rss_peak, rss),
+                    sites if heavier and sites else previous.top_sites,
+                )
+
+    def _top_sites(self, snapshot, baseline) -> Tuple[AllocationSite, ...]:
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+        snapshot = snapshot.filter_traces(filters)
+        baseline = baseline.filter_traces(filters)
+        diffs = snapshot.compare_to(baseline, "lineno")
+        grown = [d for d in diffs if d.size_diff > 0][: self.top]
+        return tuple(
+            AllocationSite(
+                f"{d.traceback[0].filename}:{d.traceback[0].lineno}",
+                d.size_diff,
+                d.count_diff,
+            )
+            for d in grown
+        )
+
+    def report(self) -> List[StageMemory]:
+        """Return stages ordered by peak memory, highest first."""
+        with self._lock:
+            return sorted(self.stages.values(), key=lambda s: s.peak, reverse=True)
+
+    def format_report(self) -> str:
+        """Render the per-stage table and top allocation sites as text."""
+        lines = [
+            f"Peak traced memory: {self.overall_peak / MB:.1f} MB, "
+            f"peak RSS: {peak_rss() / MB:.1f} MB, "
+            f"largest subprocess RSS: {peak_rss(children=True) / MB:.1f} MB",
+            f"{'stage':<44} {'calls':>5} {'peak MB':>9}"
+            f" {'retained MB':>12} {'RSS MB':>9}",
+        ]
+        stages = self.report()
+        for stage in stages:
+            lines.append(
+                f"{stage.name:<44} {stage.calls:>5} {stage.peak / MB:>9.1f} "
+                f"{stage.retained / MB:>12.1f} {stage.rss_peak / MB:>9.1f}"
+            )
+        for stage in stages:
+            if not stage.top_sites:
+                continue
+            lines.append(f"Top allocations retained by {stage.name}:")
+            for site in stage.top_sites:
+                lines.append(
+                    f"  {site.size / 1024:>10.1f} KiB {site.count:>7} blocks"
+                    f"  {site.location}"
+                )
+        return "\n".join(lines)
+
+
+__all__ = ["AllocationSite", "MemoryProfiler", "StageMemory", "peak_rss"]
@@ -0,0 +1,506 @@
+"""Local stand-in for an OpenAI-compatible chat completions API.
+
+The server answers ``POST /v1/chat/completions`` with JSON that follows the
+format requested by :class:`~doc2md.prompt_builder.PromptBuilder`: either an
+echo of the chapter HTML rendered as simple Markdown, or canned responses
+loaded from a file. Latency and failures are injected according to
+:class:`MockOptions`, which makes it possible to measure client throughput
+and retry behaviour without spending API quota.
+
+The batch endpoints used by :mod:`doc2md.llm_batch` are emulated in memory:
+``POST /v1/files``, ``POST /v1/batch/jobs``, ``GET /v1/batch/jobs/{id}`` and
+``GET /v1/files/{id}/content``. A job is ``RUNNING`` on its first poll and
+finished on the next one; failures are injected per line.
+
+Run standalone with::
+
+    python -m doc2md.mock_llm --port 8765 --latency-ms 300 --rate-limit 0.1
+"""
+
+from __future__ import annotations
+
+import argparse
+import email.parser
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from jsonschema import validate
+from lxml import html
+
+from .schema import CHAPTER_MANIFEST_SCHEMA
+
+COMPLETIONS_PATH = "/v1/chat/completions"
+FILES_PATH = "/v1/files"
+BATCH_JOBS_PATH = "/v1/batch/jobs"
+
+_CHAPTER_HTML_RE = re.compile(r"```html\n(.*)\n```", re.DOTALL)
+# Chapters of a packed request, see PromptBuilder.build_for_chapters
+_PACKED_CHAPTER_RE = re.compile(
+    r"^=== CHAPTER (\d+) ===\n```html\n(.*?)\n```$", re.DOTALL | re.MULTILINE
+)
+# Changed blocks of a fragment request, see PromptBuilder.build_for_fragment
+_FRAGMENT_HTML_RE = re.compile(r"CHANGED HTML:\n```html\n(.*)\n```", re.DOTALL)
+_SLUG_RE = re.compile(r"[^\w]+")
+
+
+class MockOptions(NamedTuple):
+    """Behaviour of the mock server."""
+
+    latency_ms: float = 200.0  # median response time
+    latency_sigma: float = 0.0  # log-normal spread; 0 gives a fixed latency
+    rate_limit: float = 0.0  # share of requests answered with 429
+    server_error: float = 0.0  # share of requests answered with 500/502/503
+    retry_after: float = 0.0  # Retry-After seconds on failures; 0 omits the header
+    canned_path: str = ""  # JSON file with responses instead of echo
+    seed: int | None = None
+
+
+def chapter_html_from_messages(messages: List[Dict[str, Any]]) -> str:
+    """Return the chapter HTML embedded in the last user message."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = str(message.get("content", ""))
+            match = _CHAPTER_HTML_RE.search(content)
+            return match.group(1) if match else content
+    return ""
+
+
+def packed_chapters_from_messages(
+    messages: List[Dict[str, Any]]
+) -> List[Tuple[int, str]]:
+    """Return ``(number, html)`` of each chapter in a packed request, if any."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return [
+                (int(number), chapter_html)
+                for number, chapter_html in _PACKED_CHAPTER_RE.findall(
+                    str(message.get("content", ""))
+                )
+            ]
+    return []
+
+
+def _text(element: html.HtmlElement) -> str:
+    return " ".join(element.text_content().split())
+
+
+def echo_markdown(chapter_html: str) -> str:
+    """Render headings, code, lists and paragraphs of ``chapter_html`` as Markdown."""
+    if not chapter_html.strip():
+        return ""
+    root = html.fragment_fromstring(chapter_html, create_parent="div")
+    blocks: List[str] = []
+    for element in root.iter("h1", "h2", "h3", "h4", "h5", "h6", "pre", "p", "li"):
+        if element.tag == "pre":
+            language = ""
+            code = element.find(".//code")
+            if code is not None:
+                match = re.search(r"language-(\S+)", code.get("class", ""))
+                language = match.group(1) if match else ""
+            blocks.append(f"```{language}\n{element.text_content().strip()}\n```")
+        elif element.tag == "li":
+            blocks.append(f"- {_text(element)}")
+        elif element.tag == "p":
+            if element.getparent() is not None and element.getparent().tag == "li":
+                continue
+            text = _text(element)
+            if text:
+                blocks.append(text)
+        else:
+            blocks.append(f"{'#' * int(element.tag[1])} {_text(element)}")
+    return "\n\n".join(blocks)
+
+
+def echo_response(chapter_html: str, chapter_number: int) -> Dict[str, Any]:
+    """Build a manifest and Markdown for ``chapter_html``."""
+    root = html.fragment_fromstring(chapter_html or "<p></p>", create_parent="div")
+    heading = root.find(".//h1")
+    if heading is None:
+        heading = next(root.iter("h2", "h3", "h4", "h5", "h6"), None)
+    title = (
+        _text(heading) if heading is not None else ""
+    ) or f"Chapter {chapter_number}"
+    slug = _SLUG_RE.sub("-", title.lower()).strip("-") or f"chapter-{chapter_number}"
+    markdown = f"---\ntitle: {json.dumps(title, ensure_ascii=False)}\n---\n\n"
+    markdown += echo_markdown(chapter_html)
+    return {
+        "manifest": {
+            "chapter_number": chapter_number,
+            "title": title,
+            "filename": f"{chapter_number}.{slug}.md",
+            "slug": slug,
+        },
+        "markdown": markdown,
+    }
+
+
+def load_canned(path: str | Path) -> List[Dict[str, Any]]:
+    """Load canned ``{"manifest", "markdown"}`` responses and validate manifests."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    responses = data if isinstance(data, list) else [data]
+    for response in responses:
+        validate(instance=response["manifest"], schema=CHAPTER_MANIFEST_SCHEMA)
+        if not response.get("markdown"):
+            raise ValueError(f"Canned response without markdown in {path}")
+    return responses
+
+
+class MockLLMServer:
+    """Threaded HTTP server emulating a chat completions endpoint.
+
+    Usable as a context manager; :attr:`url` is the full completions URL.
+    Counters in :attr:`stats` show how many requests were served or failed.
+    """
+
+    def __init__(
+        self,
+        options: MockOptions = MockOptions(),
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.options = options
+        self.canned = load_canned(options.canned_path) if options.canned_path else []
+        self.stats: Dict[str, int] = {"requests": 0, "ok": 0, "429": 0, "5xx": 0}
+        self._random = random.Random(options.seed)
+        self._lock = threading.Lock()
+        self._files: Dict[str, bytes] = {}
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._processing: set = set()
+        self._ids = itertools.count(1)
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{COMPLETIONS_PATH}"
+
+    @property
+    def base_url(self) -> str:
+        """API base (``.../v1``) for the batch endpoints."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve in the calling thread until interrupted."""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _draw(self) -> Tuple[int, float, int]:
+        """Pick the status code, latency and sequence number of the next request."""
+        options = self.options
+        with self._lock:
+            self.stats["requests"] += 1
+            number = self.stats["requests"]
+            roll = self._random.random()
+            noise = self._random.gauss(0.0, 1.0)
+            if roll < options.rate_limit:
+                status = 429
+            elif roll < options.rate_limit + options.server_error:
+                status = self._random.choice((500, 502, 503))
+            else:
+                status = 200
+            self.stats[
+                "ok" if status == 200 else "429" if status == 429 else "5xx"
+            ] += 1
+        latency = options.latency_ms / 1000 * math.exp(options.latency_sigma * noise)
+        return status, latency, number
+
+    def _completion(self, payload: Dict[str, Any], number: int) -> Dict[str, Any]:
+        if self.canned:
+            body = self.canned[(number - 1) % len(self.canned)]
+        else:
+            messages = payload.get("messages", [])
+            packed = packed_chapters_from_messages(messages)
+            fragment = (
+                _FRAGMENT_HTML_RE.search(str(messages[-1].get("content", "")))
+                if messages
+                else None
+            )
+            if fragment:
+                body = {"markdown": echo_markdown(fragment.group(1))}
+            elif packed:
+                body = {
+                    "chapters": [
+                        echo_response(chapter_html, chapter_number)
+                        for chapter_number, chapter_html in packed
+                    ]
+                }
+            else:
+                body = echo_response(chapter_html_from_messages(messages), number)
+        content = json.dumps(body, ensure_ascii=False)
+        return {
+            "id": f"mock-{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model") or "mock",
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": len(json.dumps(payload)) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(json.dumps(payload)) + len(content)) // 4,
+            },
+        }
+
+    def _store_file(self, content: bytes) -> Dict[str, Any]:
+        with self._lock:
+            file_id = f"file-{next(self._ids)}"
+            self._files[file_id] = content
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "purpose": "batch",
+        }
+
+    def _create_job(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            job = {
+                "id": f"batch-{next(self._ids)}",
+                "object": "batch",
+                "status": "QUEUED",
+                "input_files": list(payload.get("input_files", [])),
+                "model": payload.get("model") or "mock",
+                "endpoint": payload.get("endpoint", COMPLETIONS_PATH),
+                "metadata": payload.get("metadata") or {},
+                "output_file": None,
+                "total_requests": 0,
+                "succeeded_requests": 0,
+                "failed_requests": 0,
+            }
+            self._jobs[job["id"]] = job
+        return dict(job)
+
+    def _poll_job(self, job_id: str) -> Dict[str, Any] | None:
+        """Advance a job: QUEUED -> RUNNING -> SUCCESS (or FAILED)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == "QUEUED":
+                job["status"] = "RUNNING"
+                return dict(job)
+            if job["status"] != "RUNNING" or job_id in self._processing:
+                return dict(job)
+            self._processing.add(job_id)
+            inputs = [self._files.get(file_id) for file_id in job["input_files"]]
+        if any(content is None for content in inputs):
+            job["status"] = "FAILED"
+            return dict(job)
+
+        output = []
+        for content in inputs:
+            for line in content.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                body = dict(item.get("body") or {}, model=job["model"])
+                status, _, number = self._draw()
+                result: Dict[str, Any] = {
+                    "id": f"mock-line-{number}",
+                    "custom_id": item["custom_id"],
+                }
+                if status == 200:
+                    result["response"] = {
+                        "status_code": 200,
+                        "body": self._completion(body, number),
+                    }
+                    result["error"] = None
+                    job["succeeded_requests"] += 1
+                else:
+                    result["response"] = {"status_code": status, "body": {}}
+                    result["error"] = {"message": f"injected {status}"}
+                    job["failed_requests"] += 1
+                job["total_requests"] += 1
+                output.append(json.dumps(result, ensure_ascii=False))
+        stored = self._store_file(("\n".join(output) + "\n").encode("utf-8"))
+        with self._lock:
+            job["output_file"] = stored["id"]
+            job["status"] = "SUCCESS"
+            return dict(job)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _send(
+                self, status: int, body: Dict[str, Any], headers: Dict[str, str]
+            ) -> None:
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _not_found(self) -> None:
+                self._send(404, {"error": {"message": "not found"}}, {})
+
+            def _upload(self, raw: bytes) -> None:
+                header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n"
+                message = email.parser.BytesParser().parsebytes(
+                    header.encode("latin-1") + raw
+                )
+                for part in message.walk():
+                    if part.get_param("name", header="content-disposition") == "file":
+                        self._send(
+                            200, server._store_file(part.get_payload(decode=True)), {}
+                        )
+                        return
+                self._send(400, {"error": {"message": "file part is missing"}}, {})
+
+            def do_GET(self) -> None:
+                path = self.path.rstrip("/")
+                if path.startswith(BATCH_JOBS_PATH + "/"):
+                    job = server._poll_job(path[len(BATCH_JOBS_PATH) + 1 :])
+                    if job is None:
+                        self._not_found()
+                    else:
+                        self._send(200, job, {})
+                    return
+                if path.startswith(FILES_PATH + "/") and path.endswith("/content"):
+                    content = server._files.get(
+                        path[len(FILES_PATH) + 1 : -len("/content")]
+                    )
+                    if content is None:
+                        self._not_found()
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/jsonl")
+                    self.send_header("Content-Length", str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                    return
+                self._not_found()
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                path = self.path.rstrip("/")
+                if path == FILES_PATH:
+                    self._upload(raw)
+                    return
+                if path == BATCH_JOBS_PATH:
+                    try:
+                        self._send(
+                            200, server._create_job(json.loads(raw or b"{}")), {}
+                        )
+                    except json.JSONDecodeError:
+                        self._send(400, {"error": {"message": "invalid JSON"}}, {})
+                    return
+                if path != COMPLETIONS_PATH:
+                    self._not_found()
+                    return
+                try:
+                    payload = json.loads(raw or b"{}")
+                except json.JSONDecodeError:
+                    self._send(400, {"error": {"message": "invalid JSON"}}, {})
+                    return
+
+                status, latency, number = server._draw()
+                time.sleep(latency)
+                if status != 200:
+                    headers = {}
+                    if server.options.retry_after:
+                        headers["Retry-After"] = f"{server.options.retry_after:g}"
+                    self._send(
+                        status, {"error": {"message": f"injected {status}"}}, headers
+                    )
+                    return
+                self._send(200, server._completion(payload, number), {})
+
+        return Handler
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Mock chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.0)
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="Share of 429 responses"
+    )
+    parser.add_argument(
+        "--server-error", type=float, default=0.0, help="Share of 5xx responses"
+    )
+    parser.add_argument("--retry-after", type=float, default=0.0)
+    parser.add_argument("--canned", default="", help="JSON file with canned responses")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    options = MockOptions(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        rate_limit=args.rate_limit,
+        server_error=args.server_error,
+        retry_after=args.retry_after,
+        canned_path=args.canned,
+        seed=args.seed,
+    )
+    server = MockLLMServer(options, args.host, args.port)
+    print(f"Mock LLM listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+__all__ = [
+    "BATCH_JOBS_PATH",
+    "COMPLETIONS_PATH",
+    "FILES_PATH",
+    "MockLLMServer",
+    "MockOptions",
+    "chapter_html_from_messages",
+    "packed_chapters_from_messages",
+    "echo_markdown",
+    "echo_response",
+    "load_canned",
+]
+
+
+if __name__ == "__main__":
+    main()
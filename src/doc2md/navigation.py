@@ -10,9 +10,16 @@ from pathlib import Path
 
 import frontmatter
 
+from .tracing import span
+
 
 def inject_navigation_and_create_toc(output_dir: str) -> None:
     """Inject readPrev/readNext into Markdown files and create toc.json."""
+    with span("navigation.inject_navigation_and_create_toc"):
+        _inject_navigation(output_dir)
+
+
+def _inject_navigation(output_dir: str) -> None:
     files = sorted(f for f in os.listdir(output_dir) if f.endswith(".md"))
     titles: Dict[str, str] = {}
     for name in files:
@@ -48,6 +55,11 @@ def inject_navigation_and_create_toc(output_dir: str) -> None:
 
 def create_summary_from_chapters(output_dir: str) -> None:
     """Create SUMMARY.md from generated markdown chapters."""
+    with span("navigation.create_summary_from_chapters"):
+        _create_summary(output_dir)
+
+
+def _create_summary(output_dir: str) -> None:
     output_path = Path(output_dir)
     
     # Find all markdown files (excluding SUMMARY.md itself)
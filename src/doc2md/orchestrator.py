@@ -0,0 +1,293 @@
+"""Dependency-graph runner for preprocessing stages.
+
+Stages declare the stages they depend on and where they run: ``process``
+for CPU-bound pure Python work (Mammoth, python-docx), ``thread`` for work
+that waits on subprocesses or I/O (pandoc), ``inline`` for cheap steps.
+A stage starts as soon as all its dependencies are done, so independent
+stages overlap. New stages can be added to the graph returned by
+:func:`docx_preprocess_graph` without changing the runner.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+from .tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+EXECUTORS = ("process", "thread", "inline")
+
+
+class Task(NamedTuple):
+    """A stage of the graph.
+
+    ``func`` is called with ``args`` followed by the results of ``deps`` in
+    order. Process tasks need a picklable, module-level ``func``.
+    """
+
+    name: str
+    func: Callable[..., Any]
+    args: Tuple[Any, ...]
+    deps: Tuple[str, ...]
+    executor: str
+
+
+class TaskGraph:
+    """Stages with dependencies, executed concurrently by :meth:`run`."""
+
+    def __init__(self) -> None:
+        self.tasks: Dict[str, Task] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        *args: Any,
+        deps: Tuple[str, ...] = (),
+        executor: str = "thread",
+    ) -> None:
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        if executor not in EXECUTORS:
+            raise ValueError(
+                f"Unknown executor: {executor}. Supported: {', '.join(EXECUTORS)}"
+            )
+        self.tasks[name] = Task(name, func, args, tuple(deps), executor)
+
+    def order(self) -> List[str]:
+        """Return task names in a valid execution order, checking the graph."""
+        ordered: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str, path: Tuple[str, ...]) -> None:
+            if name not in self.tasks:
+                raise ValueError(f"Task {path[-1]} depends on unknown task {name}")
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + (name,))}")
+            state[name] = "visiting"
+            for dep in self.tasks[name].deps:
+                visit(dep, path + (name,))
+            state[name] = "done"
+            ordered.append(name)
+
+        for name in self.tasks:
+            visit(name, ())
+        return ordered
+
+    def run(self, *, max_workers: int | None = None) -> Dict[str, Any]:
+        """
+        Execute all tasks, each as soon as its dependencies have finished.
+
+        Args:
+            max_workers: Size of the process and thread pools
+
+        Returns:
+            Mapping of task name to its result
+
+        Raises:
+            Exception: The first task failure; tasks not yet started are cancelled
+        """
+        order = self.order()
+        results: Dict[str, Any] = {}
+        running: Dict[Future, Tuple[str, float]] = {}
+        pending = list(order)
+        pools: Dict[str, Any] = {}
+        tracer = get_tracer()
+
+        def pool(kind: str):
+            if kind not in pools:
+                factory = (
+                    ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+                )
+                pools[kind] = factory(max_workers=max_workers)
+            return pools[kind]
+
+        def finished(name: str, start: float, result: Any) -> None:
+            elapsed = time.perf_counter() - start
+            results[name] = result
+            self.timings[name] = elapsed
+            tracer.add_complete(
+                f"task.{name}",
+                start,
+                elapsed,
+                category="task",
+                executor=self.tasks[name].executor,
+            )
+            logger.info("%s: %.3fs", name, elapsed)
+
+        try:
+            while pending or running:
+                ready = [
+                    n for n in pending if all(d in results for d in self.tasks[n].deps)
+                ]
+                for name in ready:
+                    pending.remove(name)
+                    task = self.tasks[name]
+                    args = task.args + tuple(results[d] for d in task.deps)
+                    start = time.perf_counter()
+                    if task.executor == "inline":
+                        finished(name, start, task.func(*args))
+                    else:
+                        future = pool(task.executor).submit(task.func, *args)
+                        running[future] = (name, start)
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, start = running.pop(future)
+                    finished(name, start, future.result())
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+        finally:
+            for executor in pools.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+        return results
+
+
+def _number_headings(
+    docx_path: str, html_content: str, heading_structure: List[Tuple[int, str, str]]
+) -> str:
+    from .heading_numbering import add_numbering_to_html
+
+    return add_numbering_to_html(
+        html_content, docx_path, heading_structure=heading_structure
+    )
+
+
+def _split_chapters(
+    options: Dict[str, Any],
+    html_content: str,
+    heading_structure: List[Tuple[int, str, str]],
+) -> List[Tuple[str, str]]:
+    from .pipeline import PreprocessPipeline
+
+    return PreprocessPipeline(heading_structure=heading_structure, **options).run(
+        html_content
+    )
+
+
+def docx_preprocess_graph(
+    docx_path: str,
+    style_map_path: str,
+    media_dir: str | None = None,
+    store: Any = None,
+    media_link: str = "auto",
+) -> TaskGraph:
+    """
+    Build the DOCX preprocessing graph.
+
+    ``mammoth`` and ``toc`` parse the DOCX in worker processes and ``images``
+    copies media out of the archive in a thread. Callers add the stage that
+    joins the first two, see :func:`preprocess_docx` and
+    :func:`preprocess_docx_chapters`.
+    """
+    from . import heading_numbering, preprocess
+
+    graph = TaskGraph()
+    graph.add(
+        "mammoth",
+        preprocess.convert_docx_to_raw_html,
+        docx_path,
+        style_map_path,
+        executor="process",
+    )
+    graph.add(
+        "toc",
+        heading_numbering.extract_heading_structure_from_toc,
+        docx_path,
+        executor="process",
+    )
+    if media_dir is not None:
+        graph.add(
+            "images",
+            preprocess.extract_images,
+            docx_path,
+            media_dir,
+            store,
+            media_link,
+            executor="thread",
+        )
+    return graph
+
+
+def preprocess_docx(
+    docx_path: str,
+    style_map_path: str,
+    media_dir: str | None = None,
+    store: Any = None,
+    *,
+    max_workers: int | None = None,
+) -> str:
+    """Concurrent equivalent of ``convert_docx_to_html`` plus ``extract_images``."""
+    graph = docx_preprocess_graph(docx_path, style_map_path, media_dir, store)
+    graph.add(
+        "numbering",
+        _number_headings,
+        docx_path,
+        deps=("mammoth", "toc"),
+        executor="inline",
+    )
+    return graph.run(max_workers=max_workers)["numbering"]
+
+
+def preprocess_docx_chapters(
+    docx_path: str,
+    style_map_path: str,
+    media_dir: str | None = None,
+    store: Any = None,
+    media_link: str = "auto",
+    *,
+    max_workers: int | None = None,
+    **options: Any,
+) -> Tuple[List[Tuple[str, str]], Dict[Any, Any]]:
+    """
+    Concurrent equivalent of ``PreprocessPipeline.run_docx`` plus ``extract_images``.
+
+    Mammoth, the TOC structure and the images run in parallel; the
+    :class:`doc2md.pipeline.PreprocessPipeline` passes then split the result.
+
+    Args:
+        options: Keyword arguments of ``PreprocessPipeline`` (``remove_toc``,
+            ``split_level``)
+
+    Returns:
+        ``(heading_title, chapter_content)`` pairs and the media mapping
+        returned by ``extract_images``
+    """
+    graph = docx_preprocess_graph(
+        docx_path, style_map_path, media_dir, store, media_link
+    )
+    graph.add(
+        "chapters",
+        _split_chapters,
+        options,
+        deps=("mammoth", "toc"),
+        executor="inline",
+    )
+    results = graph.run(max_workers=max_workers)
+    return results["chapters"], results.get("images") or {}
+
+
+__all__ = [
+    "Task",
+    "TaskGraph",
+    "docx_preprocess_graph",
+    "preprocess_docx",
+    "preprocess_docx_chapters",
+]
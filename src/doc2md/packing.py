@@ -0,0 +1,109 @@
+"""Group small chapters into shared LLM requests.
+
+With fine split levels many chapters are a few lines long, yet each request
+carries the full rules and examples prompt. :func:`pack_chapters` groups
+consecutive small chapters up to a token budget and :func:`format_pack`
+sends each group as one request, retrying only the items that failed
+validation as single-chapter requests.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Dict, List, Tuple
+
+from .routing import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PACK_TOKENS = 6000
+
+
+def pack_chapters(
+    chapter_htmls: List[str],
+    token_budget: int = DEFAULT_PACK_TOKENS,
+    *,
+    max_chapter_tokens: int | None = None,
+    max_items: int = 20,
+) -> List[List[int]]:
+    """
+    Group consecutive small chapters into packs.
+
+    Args:
+        chapter_htmls: Chapter HTML in document order
+        token_budget: Estimated input tokens allowed per pack
+        max_chapter_tokens: Chapters above this size always go alone
+            (default: a quarter of the budget)
+        max_items: Chapters allowed per pack
+
+    Returns:
+        Packs as lists of indexes into ``chapter_htmls``; single-chapter
+        packs are sent as ordinary requests
+    """
+    limit = max_chapter_tokens if max_chapter_tokens is not None else token_budget // 4
+    packs: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for index, chapter_html in enumerate(chapter_htmls):
+        tokens = estimate_tokens(chapter_html)
+        if tokens > limit:
+            if current:
+                packs.append(current)
+                current, used = [], 0
+            packs.append([index])
+            continue
+        if current and (used + tokens > token_budget or len(current) >= max_items):
+            packs.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def format_pack(
+    client: Any, chapter_htmls: List[str], numbers: List[int] | None = None
+) -> List[Tuple[Tuple[Dict[str, Any], str], float]]:
+    """
+    Format a pack of chapters, falling back to one request per failed item.
+
+    ``numbers`` are the chapters' numbers in the document. Clients without
+    ``format_chapters`` (composite clients) format each chapter separately.
+
+    Returns:
+        ``((manifest, markdown), seconds)`` per chapter; the time of a shared
+        request is split evenly between its chapters
+    """
+    if len(chapter_htmls) == 1 or not hasattr(client, "format_chapters"):
+        return [_format_single(client, chapter_html) for chapter_html in chapter_htmls]
+
+    start = time.perf_counter()
+    try:
+        results = client.format_chapters(chapter_htmls, numbers)
+    except ValueError as exc:
+        logger.warning("Packed request failed, formatting chapters one by one: %s", exc)
+        results = [exc] * len(chapter_htmls)
+    shared = (time.perf_counter() - start) / len(chapter_htmls)
+
+    formatted = []
+    for chapter_html, result in zip(chapter_htmls, results):
+        if isinstance(result, Exception):
+            logger.info("Retrying packed chapter individually: %s", result)
+            manifest_markdown, seconds = _format_single(client, chapter_html)
+            formatted.append((manifest_markdown, shared + seconds))
+        else:
+            formatted.append((result, shared))
+    return formatted
+
+
+def _format_single(
+    client: Any, chapter_html: str
+) -> Tuple[Tuple[Dict[str, Any], str], float]:
+    start = time.perf_counter()
+    result = client.format_chapter(chapter_html)
+    return result, time.perf_counter() - start
+
+
+__all__ = ["DEFAULT_PACK_TOKENS", "format_pack", "pack_chapters"]
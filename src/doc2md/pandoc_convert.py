@@ -0,0 +1,330 @@
+"""Pandoc-based HTML to Markdown conversion of a single document."""
+
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from lxml import html
+from slugify import slugify
+
+from . import navigation, splitter
+from .config import settings
+from .fast_markdown import html_to_gfm
+from .image_optimize import ImageOptions, optimize_media
+from .media_store import MediaStore, dedupe_media
+from .postprocess import rewrite_image_links
+from .restore_numbers import restore_numbers
+from .tracing import run_subprocess, span
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_SUBDIR = "images"
+
+
+class _Deadline:
+    """Track the remaining time budget for the pandoc calls of one document."""
+
+    def __init__(self, timeout: float | None) -> None:
+        self.timeout = timeout
+        self.expires = None if timeout is None else time.monotonic() + timeout
+
+    def remaining(self, command: List[str]) -> float | None:
+        if self.expires is None:
+            return None
+        remaining = self.expires - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(command, float(self.timeout or 0))
+        return remaining
+
+
+def _run_pandoc(
+    command: List[str], deadline: _Deadline, input_text: str | None = None
+) -> str:
+    """Run pandoc with ``input_text`` on stdin and return its stdout."""
+    result = run_subprocess(
+        command,
+        check=True,
+        input=input_text,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        timeout=deadline.remaining(command),
+    )
+    return result.stdout
+
+
+def _rewrite_chapter_links(
+    chapter_md_paths: List[Path], media_map: Dict[str, str]
+) -> None:
+    if not media_map:
+        return
+    for md_path in chapter_md_paths:
+        markdown = md_path.read_text(encoding="utf-8")
+        md_path.write_text(rewrite_image_links(markdown, media_map), encoding="utf-8")
+
+
+def _dedupe_chapter_media(
+    output_path: Path,
+    media_dir: str,
+    chapter_md_paths: List[Path],
+    media_store: str,
+    media_link: str,
+) -> None:
+    """Move chapter media into the store and relink or rewrite references."""
+    mapping = dedupe_media(output_path / media_dir, MediaStore(media_store), media_link)
+    if media_link != "rewrite" or not mapping:
+        return
+
+    media_map = {
+        str(original): os.path.relpath(canonical, output_path)
+        for original, canonical in mapping.items()
+    }
+    _rewrite_chapter_links(chapter_md_paths, media_map)
+
+
+def convert_html_with_pandoc(
+    html_path: str,
+    output_dir: str,
+    *,
+    split_level: int = 1,
+    media_dir: str = "media",
+    keep_temp: bool = False,
+    timeout: float | None = None,
+    media_store: str | None = None,
+    media_link: str = "auto",
+    image_options: ImageOptions | None = None,
+    image_cache: str | None = None,
+    image_workers: int | None = None,
+    on_step: Callable[[str], None] | None = None,
+    on_chapter: Callable[[int, int], None] | None = None,
+    fast_path: bool = False,
+    fallback_numbering: bool = False,
+    remove_toc: bool = True,
+) -> int:
+    """
+    Convert an HTML document into numbered Markdown chapters with pandoc.
+
+    Args:
+        html_path: Path to the input HTML file
+        output_dir: Directory for Markdown files, media and SUMMARY.md
+        split_level: Heading level to split chapters on
+        media_dir: Name of the media directory inside ``output_dir``
+        keep_temp: Write the numbered document and chapter HTML to ``_chapters``
+            for debugging; otherwise pandoc works on pipes only
+        timeout: Time budget in seconds, checked before each pandoc call;
+            :func:`doc2md.batch.run_batch` bounds the whole document
+        media_store: Content-addressed store directory; enables deduplication
+        media_link: How chapters reference stored media, see ``LINK_MODES``
+        image_options: Enables the image optimization stage
+        image_cache: Cache directory for optimized images
+        image_workers: Size of the image optimization process pool
+        on_step: Called with a message before each pipeline step
+        on_chapter: Called with ``(index, total)`` after each chapter
+        fast_path: Convert simple chapters in-process, see :mod:`doc2md.fast_markdown`;
+            chapters with unsupported markup still go through pandoc
+        fallback_numbering: Number headings missing from the TOC by level counters
+        remove_toc: Remove the TOC lists and divs after reading the numbers
+
+    Returns:
+        Number of chapters written
+
+    Raises:
+        subprocess.CalledProcessError: If pandoc fails
+        subprocess.TimeoutExpired: If the time budget is exhausted
+    """
+    with span("pandoc_convert.document", input=html_path) as sp:
+        chapters = _convert(
+            html_path,
+            output_dir,
+            split_level=split_level,
+            media_dir=media_dir,
+            keep_temp=keep_temp,
+            timeout=timeout,
+            media_store=media_store,
+            media_link=media_link,
+            image_options=image_options,
+            image_cache=image_cache,
+            image_workers=image_workers,
+            on_step=on_step,
+            on_chapter=on_chapter,
+            fast_path=fast_path,
+            fallback_numbering=fallback_numbering,
+            remove_toc=remove_toc,
+        )
+        sp.set(chapters=chapters)
+    return chapters
+
+
+def _convert(
+    html_path: str,
+    output_dir: str,
+    *,
+    split_level: int,
+    media_dir: str,
+    keep_temp: bool,
+    timeout: float | None,
+    media_store: str | None,
+    media_link: str,
+    image_options: ImageOptions | None,
+    image_cache: str | None,
+    image_workers: int | None,
+    on_step: Callable[[str], None] | None,
+    on_chapter: Callable[[int, int], None] | None,
+    fast_path: bool,
+    fallback_numbering: bool,
+    remove_toc: bool,
+) -> int:
+    deadline = _Deadline(timeout)
+    step = on_step or (lambda message: logger.info(message))
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    # Step 1: Restore numbers in headings from the TOC links
+    step("Шаг 1: Восстановление номеров в заголовках")
+    chapters_dir = output_path / "_chapters"
+    try:
+        with span("pandoc_convert.restore_numbers") as sp:
+            with open(html_path, "r", encoding="utf-8") as f:
+                html_content = f.read()
+            root = html.document_fromstring(html_content)
+            restored = restore_numbers(
+                root, remove_toc=remove_toc, fallback_counters=fallback_numbering
+            )
+            sp.set(bytes_in=len(html_content), **restored._asdict())
+        del html_content
+
+        # Step 2: Split HTML into chapters
+        step("Шаг 2: Разделение на главы")
+        if keep_temp:
+            chapters_dir.mkdir(exist_ok=True)
+            (chapters_dir / "numbered.html").write_bytes(html.tostring(root))
+
+        with span("pandoc_convert.split", level=split_level) as sp:
+            chapters = splitter.split_tree_by_heading_level(root, split_level)
+            sp.set(chapters=len(chapters))
+        del root
+
+        # Step 3: Convert each chapter to markdown with pandoc
+        step(f"Шаг 3: Конвертация {len(chapters)} глав в Markdown")
+        chapter_md_paths: List[Path] = []
+        # Images in the chapters are relative to the input document
+        resource_path = Path(html_path).resolve().parent
+        fast_chapters = 0
+        fallbacks: List[Tuple[str, str]] = []
+        for idx, (title, chapter_html) in enumerate(chapters, start=1):
+            chapter_slug = slugify(title) if title else f"chapter_{idx:02d}"
+            chapter_filename = f"{idx:02d}.{chapter_slug}"
+            chapter_document = f"<html><body>{chapter_html}</body></html>"
+            if keep_temp:
+                (chapters_dir / f"{chapter_filename}.html").write_text(
+                    chapter_document, encoding="utf-8"
+                )
+
+            chapter_media_dir = output_path / media_dir / f"ch{idx:02d}"
+            # Start clean: files left by a previous run may be hard links into
+            # a media store, and pandoc would overwrite them in place
+            shutil.rmtree(chapter_media_dir, ignore_errors=True)
+            chapter_media_dir.mkdir(parents=True, exist_ok=True)
+
+            chapter_md_path = output_path / f"{chapter_filename}.md"
+            chapter_md_paths.append(chapter_md_path)
+            fast = html_to_gfm(chapter_html) if fast_path else None
+            if fast is not None and fast.markdown is not None:
+                with span(
+                    "pandoc_convert.chapter",
+                    chapter=idx,
+                    bytes_in=len(chapter_html),
+                    path="fast",
+                ) as sp:
+                    chapter_md_path.write_text(fast.markdown, encoding="utf-8")
+                    sp.set(bytes_out=len(fast.markdown.encode("utf-8")))
+                fast_chapters += 1
+                logger.info("%s: fast path", chapter_filename)
+            else:
+                with span(
+                    "pandoc_convert.chapter",
+                    chapter=idx,
+                    bytes_in=len(chapter_html),
+                    path="pandoc",
+                ) as sp:
+                    # HTML in through stdin, Markdown out through stdout;
+                    # only extracted media touch the disk
+                    markdown = _run_pandoc(
+                        [
+                            "pandoc",
+                            "--from=html",
+                            "--to=gfm",
+                            f"--resource-path={resource_path}",
+                            f"--extract-media={chapter_media_dir}",
+                            "--wrap=none",
+                        ],
+                        deadline,
+                        chapter_document,
+                    )
+                    chapter_md_path.write_text(markdown, encoding="utf-8")
+                    sp.set(bytes_out=len(markdown.encode("utf-8")))
+                    if fast is not None:
+                        sp.set(fallback=fast.reason)
+                if fast is not None:
+                    fallbacks.append((chapter_filename, fast.reason))
+                    logger.info("%s: pandoc (%s)", chapter_filename, fast.reason)
+            if on_chapter is not None:
+                on_chapter(idx, len(chapters))
+        if fast_path:
+            step(
+                f"Быстрый путь: {fast_chapters} глав, pandoc: {len(fallbacks)}"
+                + "".join(f"\n  {name}: {reason}" for name, reason in fallbacks)
+            )
+
+        if image_options is not None:
+            step("Оптимизация изображений")
+            with span("pandoc_convert.optimize_images") as sp:
+                report = optimize_media(
+                    output_path / media_dir,
+                    image_cache or Path(settings.cache_dir) / IMAGE_CACHE_SUBDIR,
+                    image_options,
+                    workers=image_workers,
+                )
+                sp.set(
+                    images=report.processed,
+                    cached=report.cached,
+                    bytes_in=report.bytes_in,
+                    bytes_out=report.bytes_out,
+                )
+            logger.info(
+                "Optimized %d images (%d cached): %d -> %d bytes",
+                report.processed,
+                report.cached,
+                report.bytes_in,
+                report.bytes_out,
+            )
+            _rewrite_chapter_links(
+                chapter_md_paths,
+                {str(old): str(new) for old, new in report.mapping.items()},
+            )
+
+        if media_store:
+            step("Дедупликация медиа файлов")
+            with span("pandoc_convert.dedupe_media"):
+                _dedupe_chapter_media(
+                    output_path, media_dir, chapter_md_paths, media_store, media_link
+                )
+
+        # Step 4: Generate navigation
+        step("Шаг 4: Создание навигации")
+        navigation.create_summary_from_chapters(str(output_path))
+    finally:
+        if not keep_temp:
+            shutil.rmtree(chapters_dir, ignore_errors=True)
+
+    return len(chapters)
+
+
+__all__ = ["convert_html_with_pandoc"]
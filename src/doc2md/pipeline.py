@@ -0,0 +1,109 @@
+"""In-memory preprocessing pipeline over a single parsed HTML tree."""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable, Dict, List, Tuple
+
+from lxml import etree, html
+
+from .heading_numbering import apply_numbering_to_tree
+from .preprocess import strip_table_of_contents
+from .splitter import split_tree_by_heading_level
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+TreePass = Callable[[html.HtmlElement], object]
+
+_EMPTY_PARAGRAPHS_XPATH = etree.XPath(
+    "//p[not(*) and not(normalize-space())]", smart_strings=False
+)
+
+
+def remove_empty_paragraphs(root: html.HtmlElement) -> int:
+    """Drop paragraphs that contain neither text nor child elements."""
+    paragraphs = _EMPTY_PARAGRAPHS_XPATH(root)
+    for p in paragraphs:
+        p.drop_tree()
+    return len(paragraphs)
+
+
+class PreprocessPipeline:
+    """Parse HTML once and run numbering, TOC removal, cleanup and splitting.
+
+    Every pass works on the same lxml tree; only the final chapter fragments
+    are serialized. Wall time of each step is recorded in :attr:`timings`.
+    """
+
+    def __init__(
+        self,
+        *,
+        heading_structure: List[Tuple[int, str, str]] | None = None,
+        remove_toc: bool = True,
+        split_level: int = 1,
+    ) -> None:
+        self.split_level = split_level
+        self.passes: List[Tuple[str, TreePass]] = []
+        self.timings: Dict[str, float] = {}
+
+        if heading_structure:
+            self.add_pass(
+                "numbering",
+                lambda root: apply_numbering_to_tree(root, heading_structure),
+            )
+        if remove_toc:
+            self.add_pass("remove_toc", strip_table_of_contents)
+        self.add_pass("cleanup", remove_empty_paragraphs)
+
+    @classmethod
+    def for_docx(cls, docx_path: str, **kwargs) -> "PreprocessPipeline":
+        """Create a pipeline numbering headings from the DOCX table of contents."""
+        from .heading_numbering import extract_heading_structure_from_toc
+
+        start = time.perf_counter()
+        structure = extract_heading_structure_from_toc(docx_path)
+        pipeline = cls(heading_structure=structure, **kwargs)
+        pipeline.timings["toc_structure"] = time.perf_counter() - start
+        return pipeline
+
+    def add_pass(self, name: str, func: TreePass) -> None:
+        """Append a pass that modifies the parsed tree in place."""
+        self.passes.append((name, func))
+
+    def _timed(self, name: str, func: Callable[[], object]) -> object:
+        with span(f"pipeline.{name}"):
+            start = time.perf_counter()
+            result = func()
+            self.timings[name] = time.perf_counter() - start
+        return result
+
+    def run(self, html_content: str) -> List[Tuple[str, str]]:
+        """Run all passes and return ``(heading_title, chapter_content)`` pairs."""
+        if not html_content.strip():
+            return []
+
+        root = self._timed("parse", lambda: html.document_fromstring(html_content))
+        for name, func in self.passes:
+            self._timed(name, lambda: func(root))
+        chapters = self._timed(
+            "split", lambda: split_tree_by_heading_level(root, self.split_level)
+        )
+
+        for name, seconds in self.timings.items():
+            logger.info("%s: %.3fs", name, seconds)
+        return chapters  # type: ignore[return-value]
+
+    def run_docx(self, docx_path: str, style_map_path: str) -> List[Tuple[str, str]]:
+        """Convert DOCX with Mammoth (cached) and run the passes on the result."""
+        from . import preprocess
+
+        html_content = self._timed(
+            "mammoth",
+            lambda: preprocess.convert_docx_to_raw_html(docx_path, style_map_path),
+        )
+        return self.run(html_content)  # type: ignore[arg-type]
+
+
+__all__ = ["PreprocessPipeline", "remove_empty_paragraphs"]
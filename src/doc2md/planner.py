@@ -0,0 +1,291 @@
+"""Token, time and cost estimates for an LLM conversion before running it.
+
+Every chapter prompt is built exactly as the ``run`` command would build it,
+its tokens are counted with ``tiktoken`` when installed (``cl100k_base``) or
+estimated from its length otherwise, and the expected response size and
+latency are derived from earlier calls recorded in the LLM ledger
+(:mod:`doc2md.ledger`) or, without them, from the checkpoint journal of an
+earlier run. Wall time is projected by simulating the given concurrency and
+request rate limit.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import re
+import statistics
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+from .routing import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Context windows of the default models; other models use DEFAULT_CONTEXT_TOKENS
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+    "mistral-large-latest": 128_000,
+    "mistral-medium-latest": 128_000,
+    "mistral-small-latest": 32_000,
+    "mock-echo": 32_768,
+}
+DEFAULT_CONTEXT_TOKENS = 32_000
+
+# Used when there is no history: Markdown is about half the size of its HTML,
+# responses take a few seconds plus generation at ~50 tokens/s
+DEFAULT_OUTPUT_RATIO = 0.5
+DEFAULT_BASE_SECONDS = 3.0
+DEFAULT_SECONDS_PER_TOKEN = 0.02
+# Faster journal entries were not LLM calls (rule-based or batch results)
+MIN_CALL_SECONDS = 0.5
+
+_H1_RE = re.compile(r"<h1[^>]*>(.*?)</h1>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+@lru_cache(maxsize=1)
+def _tiktoken_encoding() -> Any:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as exc:  # encoding files are downloaded on first use
+        logger.warning("tiktoken encoding unavailable, estimating tokens: %s", exc)
+        return None
+
+
+def tokenizer_name() -> str:
+    return "tiktoken cl100k_base" if _tiktoken_encoding() is not None else "chars/4"
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken if installed, else estimate from length."""
+    encoding = _tiktoken_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def context_limit(model: str) -> int:
+    """Context window of ``model``; provider prefixes (``openai/``) are ignored."""
+    return MODEL_CONTEXT_TOKENS.get(model.rsplit("/", 1)[-1], DEFAULT_CONTEXT_TOKENS)
+
+
+class LatencyModel(NamedTuple):
+    """Seconds per request as ``base_seconds + seconds_per_token * output``."""
+
+    base_seconds: float = DEFAULT_BASE_SECONDS
+    seconds_per_token: float = DEFAULT_SECONDS_PER_TOKEN
+    output_ratio: float = DEFAULT_OUTPUT_RATIO  # output tokens per chapter HTML token
+    source: str = "defaults"
+    samples: int = 0
+
+    def seconds(self, output_tokens: int) -> float:
+        return self.base_seconds + self.seconds_per_token * output_tokens
+
+    @classmethod
+    def fit(cls, samples: List[Tuple[int, int, float]], source: str) -> "LatencyModel":
+        """
+        Fit the model to ``(html_chars, markdown_chars, seconds)`` samples.
+
+        A least-squares line needs two distinct response sizes; with a
+        single size only the per-token rate is scaled to match.
+        """
+        samples = [s for s in samples if s[0] > 0 and s[2] > 0]
+        if not samples:
+            return cls()
+        ratio = statistics.median(m / h for h, m, _ in samples)
+        tokens = [m / CHARS_PER_TOKEN for _, m, _ in samples]
+        seconds = [s for _, _, s in samples]
+        if len(set(tokens)) >= 2:
+            slope, intercept = statistics.linear_regression(tokens, seconds)
+            if slope > 0 and intercept >= 0:
+                return cls(intercept, slope, ratio, source, len(samples))
+        mean_tokens = statistics.mean(tokens) or 1.0
+        per_token = (
+            max(statistics.mean(seconds) - DEFAULT_BASE_SECONDS, 0.0) / mean_tokens
+        )
+        return cls(DEFAULT_BASE_SECONDS, per_token, ratio, source, len(samples))
+
+
+def journal_samples(output_dir: str | Path) -> List[Tuple[int, int, float]]:
+    """``(html_chars, markdown_chars, seconds)`` of chapters in a run journal."""
+    from .checkpoint import CHECKPOINT_DIRNAME, JOURNAL_FILENAME
+
+    path = Path(output_dir) / CHECKPOINT_DIRNAME / JOURNAL_FILENAME
+    if not path.exists():
+        return []
+    try:
+        chapters = json.loads(path.read_text(encoding="utf-8")).get("chapters", {})
+    except ValueError:
+        return []
+    return [
+        (
+            entry.get("html_chars", 0),
+            entry.get("markdown_chars", 0),
+            entry.get("seconds", 0.0),
+        )
+        for entry in chapters.values()
+        if entry.get("seconds", 0.0) >= MIN_CALL_SECONDS
+    ]
+
+
+def ledger_samples(
+    path: str | Path, provider: str = "", model: str = ""
+) -> List[Tuple[int, int, float]]:
+    """``(html_chars, response_chars, seconds)`` of chapter calls in an LLM ledger.
+
+    Unlike journal entries these are single HTTP attempts, so retries and
+    backoff waits do not inflate the latency.
+    """
+    from .ledger import Ledger
+
+    if not path or not Path(path).exists():
+        return []
+    ledger = Ledger(path)
+    try:
+        return ledger.latency_samples(provider, model)
+    finally:
+        ledger.close()
+
+
+def project_wall_time(
+    durations: List[float], concurrency: int = 1, rate_limit: float = 0.0
+) -> float:
+    """
+    Simulate sending requests in order with limited concurrency and rate.
+
+    Args:
+        durations: Seconds of each request
+        concurrency: Requests in flight at once
+        rate_limit: Requests started per minute (0 = unlimited)
+
+    Returns:
+        Seconds until the last request finishes
+    """
+    interval = 60.0 / rate_limit if rate_limit > 0 else 0.0
+    workers = [0.0] * max(concurrency, 1)
+    next_start = 0.0
+    finish = 0.0
+    for duration in durations:
+        start = max(heapq.heappop(workers), next_start)
+        next_start = start + interval
+        end = start + duration
+        heapq.heappush(workers, end)
+        finish = max(finish, end)
+    return finish
+
+
+class ChapterPlan(NamedTuple):
+    index: int
+    title: str
+    input_tokens: int  # whole prompt: rules, examples and chapter HTML
+    output_tokens: int  # expected response
+    seconds: float
+    over_limit: bool  # prompt plus response exceed the model context
+
+
+class Plan(NamedTuple):
+    chapters: List[ChapterPlan]
+    input_tokens: int
+    output_tokens: int
+    wall_seconds: float
+    cost: float
+    context_tokens: int
+    tokenizer: str
+    latency: LatencyModel
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "chapters": [c._asdict() for c in self.chapters],
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "wall_seconds": round(self.wall_seconds, 1),
+            "cost": round(self.cost, 4),
+            "context_tokens": self.context_tokens,
+            "tokenizer": self.tokenizer,
+            "latency": self.latency._asdict(),
+        }
+
+
+def _title(chapter_html: str, index: int) -> str:
+    match = _H1_RE.search(chapter_html)
+    title = " ".join(_TAG_RE.sub("", match.group(1)).split()) if match else ""
+    return title or f"Глава {index}"
+
+
+def plan_chapters(
+    chapter_htmls: List[str],
+    build_prompt: Callable[[str], List[Dict[str, str]]],
+    *,
+    model: str,
+    latency: LatencyModel | None = None,
+    concurrency: int = 1,
+    rate_limit: float = 0.0,
+    context_tokens: int = 0,
+    input_price: float = 0.0,
+    output_price: float = 0.0,
+) -> Plan:
+    """
+    Estimate tokens, time and cost of formatting ``chapter_htmls``.
+
+    Args:
+        chapter_htmls: Chapters in document order
+        build_prompt: ``PromptBuilder.build_for_chapter`` or equivalent
+        model: Model whose context window is checked
+        latency: Response size and latency model (default: built-in values)
+        concurrency: Chapters formatted at once
+        rate_limit: Requests per minute allowed by the provider (0 = none)
+        context_tokens: Context window override (0: known value for ``model``)
+        input_price: Price per million prompt tokens
+        output_price: Price per million response tokens
+    """
+    latency = latency or LatencyModel()
+    limit = context_tokens or context_limit(model)
+    chapters = []
+    for index, chapter_html in enumerate(chapter_htmls, start=1):
+        messages = build_prompt(chapter_html)
+        input_tokens = sum(count_tokens(m["content"]) for m in messages)
+        output_tokens = int(count_tokens(chapter_html) * latency.output_ratio) + 1
+        chapters.append(
+            ChapterPlan(
+                index,
+                _title(chapter_html, index),
+                input_tokens,
+                output_tokens,
+                latency.seconds(output_tokens),
+                input_tokens + output_tokens > limit,
+            )
+        )
+    total_in = sum(c.input_tokens for c in chapters)
+    total_out = sum(c.output_tokens for c in chapters)
+    return Plan(
+        chapters,
+        total_in,
+        total_out,
+        project_wall_time([c.seconds for c in chapters], concurrency, rate_limit),
+        (total_in * input_price + total_out * output_price) / 1_000_000,
+        limit,
+        tokenizer_name(),
+        latency,
+    )
+
+
+__all__ = [
+    "ChapterPlan",
+    "LatencyModel",
+    "MODEL_CONTEXT_TOKENS",
+    "Plan",
+    "context_limit",
+    "count_tokens",
+    "journal_samples",
+    "ledger_samples",
+    "plan_chapters",
+    "project_wall_time",
+]
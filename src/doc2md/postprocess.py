@@ -3,17 +3,38 @@
 from __future__ import annotations
 
 import re
+from typing import Dict, Mapping
+
+IMAGE_LINK_RE = re.compile(r"!\[(.*?)\]\((.*?)\)")
+
+
+def rewrite_image_links(markdown: str, media_map: Mapping[str, str]) -> str:
+    """Point Markdown image links found in ``media_map`` at their new targets."""
+    if not media_map:
+        return markdown
+
+    def replace(match: re.Match[str]) -> str:
+        target = media_map.get(match.group(2), match.group(2))
+        return f"![{match.group(1)}]({target})"
+
+    return IMAGE_LINK_RE.sub(replace, markdown)
 
 
 class PostProcessor:
     """Apply final formatting fixes to generated Markdown."""
 
     def __init__(
-        self, markdown_content: str, chapter_number: int, doc_slug: str
+        self,
+        markdown_content: str,
+        chapter_number: int,
+        doc_slug: str,
+        media_map: Dict[str, str] | None = None,
     ) -> None:
         self.md = markdown_content
         self.chapter_num = chapter_number
         self.slug = doc_slug
+        # Original image path -> canonical path (e.g. inside a MediaStore)
+        self.media_map = media_map or {}
         self.h2_counter = 0
         self.h3_counter = 0
         self.h4_counter = 0
@@ -54,12 +75,12 @@ class PostProcessor:
             lines.append(line)
 
         self.md = "\n".join(lines)
-        self.md = re.sub(
-            r"!\[(.*?)\]\((.*?)\)",
+        self.md = rewrite_image_links(self.md, self.media_map)
+        self.md = IMAGE_LINK_RE.sub(
             rf"![\1](/images/developer/administrator/{self.slug}/\2)",
             self.md,
         )
         return self.md
 
 
-__all__ = ["PostProcessor"]
+__all__ = ["PostProcessor", "rewrite_image_links"]
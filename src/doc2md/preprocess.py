@@ -2,43 +2,158 @@
 
 from __future__ import annotations
 
+import logging
 import os
 import re
-import subprocess
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Dict
 
-import mammoth
-from bs4 import BeautifulSoup
+from lxml import etree, html
 
 from .heading_numbering import add_numbering_to_html
+from .mammoth_cache import convert_with_cache, default_cache
+from .media_store import MediaStore, dedupe_media
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+DOCX_MEDIA_PREFIX = "word/media/"
 
 
 def convert_docx_to_html(docx_path: str, style_map_path: str) -> str:
-    """Convert DOCX to HTML using a Mammoth style map and add heading numbering."""
-    with open(docx_path, "rb") as docx_file, open(
-        style_map_path, "r", encoding="utf-8"
-    ) as style_map_file:
-        style_map = style_map_file.read()
-        result = mammoth.convert_to_html(docx_file, style_map=style_map)
-    
+    """Convert DOCX to HTML using a Mammoth style map and add heading numbering.
+
+    Mammoth results are cached by DOCX and style map content (see
+    :mod:`doc2md.mammoth_cache`) when ``DOC2MD_MAMMOTH_CACHE=1`` is set.
+    """
+    raw_html = convert_docx_to_raw_html(docx_path, style_map_path)
+
     # Add heading numbering based on TOC information
-    html_with_numbering = add_numbering_to_html(result.value, docx_path)
+    html_with_numbering = add_numbering_to_html(raw_html, docx_path)
     return html_with_numbering
 
 
-def extract_images(docx_path: str, output_dir: str) -> None:
-    """Extract images from DOCX using Pandoc."""
+def convert_docx_to_raw_html(docx_path: str, style_map_path: str) -> str:
+    """Convert DOCX to HTML with Mammoth only, without heading numbering."""
+    with open(docx_path, "rb") as docx_file:
+        docx_bytes = docx_file.read()
+    with open(style_map_path, "r", encoding="utf-8") as style_map_file:
+        style_map = style_map_file.read()
+
+    with span("preprocess.mammoth", bytes_in=len(docx_bytes)) as sp:
+        conversion, cache_hit = convert_with_cache(
+            docx_bytes, style_map, default_cache()
+        )
+        sp.set(
+            bytes_out=len(conversion.html),
+            messages=len(conversion.messages),
+            cache_hit=cache_hit,
+        )
+    for message in conversion.messages:
+        logger.debug("Mammoth %s: %s", message["type"], message["message"])
+    return conversion.html
+
+
+def extract_images(
+    docx_path: str,
+    output_dir: str,
+    store: MediaStore | None = None,
+    link_mode: str = "auto",
+) -> Dict[Path, Path]:
+    """Extract images from a DOCX into ``output_dir/media``.
+
+    The files are copied straight from ``word/media/`` in the DOCX archive,
+    the same layout ``pandoc --extract-media`` produces, without rendering
+    the document. With a ``store`` the extracted files are moved into the
+    content-addressed store and linked back as ``link_mode`` says (see
+    :func:`doc2md.media_store.dedupe_media`), so images repeated across
+    documents are kept once.
+
+    Returns:
+        Mapping of extracted file path to canonical store path; empty
+        without a ``store``
+    """
     os.makedirs(output_dir, exist_ok=True)
-    command = [
-        "pandoc",
-        docx_path,
-        "--extract-media",
-        output_dir,
-        "-t",
-        "markdown",
-        "-o",
-        os.devnull,
-    ]
-    subprocess.run(command, check=True)
+    media_dir = os.path.join(output_dir, "media")
+    with span("preprocess.extract_images", input=docx_path) as sp:
+        count = size = 0
+        with zipfile.ZipFile(docx_path) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                if not name.startswith(DOCX_MEDIA_PREFIX) or info.is_dir():
+                    continue
+                target = os.path.join(media_dir, os.path.basename(name))
+                os.makedirs(media_dir, exist_ok=True)
+                with archive.open(info) as source, open(target, "wb") as out:
+                    shutil.copyfileobj(source, out)
+                count += 1
+                size += info.file_size
+        sp.set(images=count, bytes_out=size)
+    if store is None:
+        return {}
+    return dedupe_media(output_dir, store, link_mode)
+
+
+TOC_HEADING_TEXT = "СОДЕРЖАНИЕ"
+TOC_LINK_PREFIX = "#__RefHeading"
+
+# Paragraphs holding at least one TOC link, found in a single XPath pass.
+_TOC_PARAGRAPHS_XPATH = etree.XPath(
+    "//p[.//a[starts-with(@href, $prefix)]]", smart_strings=False
+)
+_TOC_LINKS_XPATH = etree.XPath(
+    ".//a[starts-with(@href, $prefix)]", smart_strings=False
+)
+_TOC_START_XPATH = etree.XPath(
+    "(//p[contains(., $heading)])[1]", smart_strings=False
+)
+_TOC_ENTRY_RE = re.compile(r"^\d+(\.\d+)*\s+.*\s+\d+$")
+
+
+def strip_table_of_contents(root: html.HtmlElement) -> int:
+    """
+    Remove the table of contents from a parsed lxml HTML tree in place.
+
+    Same rules as :func:`remove_table_of_contents`, but the TOC paragraphs are
+    located with one XPath query for ``a[href^="#__RefHeading"]`` instead of
+    walking every paragraph, so the pass can run on a tree shared with other
+    preprocessing stages.
+
+    Returns:
+        Number of paragraphs removed
+    """
+    candidates = _TOC_PARAGRAPHS_XPATH(root, prefix=TOC_LINK_PREFIX)
+    if not candidates:
+        return 0
+
+    toc_paragraphs = set(candidates)
+    removed = 0
+
+    # Strategy 1: drop the run of TOC paragraphs starting at "СОДЕРЖАНИЕ"
+    start = _TOC_START_XPATH(root, heading=TOC_HEADING_TEXT)
+    current = start[0] if start else None
+    while current is not None:
+        next_sibling = current.getnext()
+        if current.tag == "p":
+            if current not in toc_paragraphs:
+                break
+            current.drop_tree()
+            removed += 1
+        current = next_sibling
+
+    # Strategy 2: drop remaining standalone TOC link paragraphs
+    for p in candidates:
+        if p.getparent() is None:
+            continue
+        links = _TOC_LINKS_XPATH(p, prefix=TOC_LINK_PREFIX)
+        text_content = p.text_content().strip()
+        if _TOC_ENTRY_RE.match(text_content) or len(links) >= 2:
+            p.drop_tree()
+            removed += 1
+
+    return removed
 
 
 def remove_table_of_contents(html_content: str) -> str:
@@ -49,40 +164,12 @@ def remove_table_of_contents(html_content: str) -> str:
     "СОДЕРЖАНИЕ" and contains multiple links to document sections. Both the 
     "СОДЕРЖАНИЕ" heading and all TOC links are removed.
     """
-    soup = BeautifulSoup(html_content, "lxml")
-    
-    # Strategy 1: Find text "СОДЕРЖАНИЕ" and remove all subsequent links until first __RefHeading anchor
-    for p in soup.find_all("p"):
-        text = p.get_text()
-        if "СОДЕРЖАНИЕ" in text:
-            # Found TOC start, now remove all subsequent TOC links
-            current = p
-            while current:
-                next_sibling = current.next_sibling
-                
-                # If this paragraph contains TOC links, remove them
-                if current.name == "p":
-                    # Remove all href links that point to __RefHeading in this paragraph
-                    toc_links = current.find_all("a", href=re.compile(r"#__RefHeading"))
-                    if toc_links:
-                        # Remove the entire paragraph including "СОДЕРЖАНИЕ"
-                        current.extract()
-                    else:
-                        # No more TOC links, stop removing
-                        break
-                
-                current = next_sibling
-            break
-    
-    # Strategy 2: Remove any remaining standalone TOC link paragraphs
-    for p in soup.find_all("p"):
-        # If paragraph contains only TOC links and tabs/numbers, remove it
-        links = p.find_all("a", href=re.compile(r"#__RefHeading"))
-        if links:
-            # Check if paragraph is mostly TOC content (contains mainly links and numbers)
-            text_content = p.get_text().strip()
-            # Remove paragraph if it's primarily TOC links (contains numbers and section titles)
-            if re.match(r'^\d+(\.\d+)*\s+.*\s+\d+$', text_content) or len(links) >= 2:
-                p.extract()
-    
-    return str(soup)
+    if not html_content.strip():
+        return html_content
+
+    with span("preprocess.remove_table_of_contents", bytes_in=len(html_content)) as sp:
+        root = html.document_fromstring(html_content)
+        removed = strip_table_of_contents(root)
+        result = html.tostring(root, encoding="unicode")
+        sp.set(bytes_out=len(result), removed=removed)
+    return result
@@ -8,13 +8,31 @@ from typing import Dict, List
 
 
 class PromptBuilder:
-    """Builds system and user prompts for chapter conversion."""
+    """Builds system and user prompts for chapter conversion.
+
+    By default ``num_examples`` whole sample files are chosen at random once.
+    With ``example_tokens`` set, sample sections relevant to each chapter are
+    chosen from a cached TF-IDF index (:mod:`doc2md.example_index`) within
+    that many estimated tokens.
+    """
 
     def __init__(
-        self, rules_path: str | Path, samples_dir: str | Path, num_examples: int = 2
+        self,
+        rules_path: str | Path,
+        samples_dir: str | Path,
+        num_examples: int = 2,
+        example_tokens: int = 0,
     ) -> None:
         self.rules = Path(rules_path).read_text(encoding="utf-8")
-        self.examples = self._load_examples(samples_dir, num_examples)
+        self.example_tokens = example_tokens
+        self.index = None
+        if example_tokens:
+            from .example_index import load_index
+
+            self.index = load_index(samples_dir)
+            self.examples = ""
+        else:
+            self.examples = self._load_examples(samples_dir, num_examples)
 
     def _load_examples(self, samples_dir: str | Path, num_examples: int) -> str:
         sample_paths = sorted(Path(samples_dir).rglob("*.md"))
@@ -27,8 +45,18 @@ class PromptBuilder:
             contents.append(path.read_text(encoding="utf-8").strip())
         return "\n\n".join(contents)
 
-    def build_for_chapter(self, chapter_html: str) -> List[Dict[str, str]]:
-        system_prompt = (
+    def examples_for(self, chapter_html: str) -> str:
+        """Examples to show for ``chapter_html``."""
+        if self.index is None:
+            return self.examples
+        sections = self.index.select(chapter_html, self.example_tokens)
+        return "\n\n".join(
+            f"<!-- {section.path} -->\n{section.text}" for section in sections
+        )
+
+    def _system_prompt(self, examples: str | None = None) -> str:
+        examples = self.examples if examples is None else examples
+        return (
             "You are an expert DOCX to Markdown converter. Follow all rules precisely.\n\n"
             "IMPORTANT: The HTML contains semantic markup with CSS classes that indicate formatting intent:\n"
             "- <pre><code class=\"language-X\"> → ```X code blocks\n"
@@ -37,8 +65,10 @@ class PromptBuilder:
             "- <ul class=\"component-list\"> → Component lists with special punctuation\n"
             "- filename-X classes → Add filename to code blocks\n\n"
             f"FORMATTING RULES:\n{self.rules}\n\n"
-            f"EXAMPLES:\n{self.examples}"
+            f"EXAMPLES:\n{examples}"
         )
+
+    def build_for_chapter(self, chapter_html: str) -> List[Dict[str, str]]:
         user_prompt = (
             "Convert this chapter HTML to Markdown.\n\n"
             "Return ONLY a valid JSON object with exactly these fields:\n"
@@ -55,7 +85,73 @@ class PromptBuilder:
             "}\n\n"
             f"CHAPTER HTML:\n```html\n{chapter_html}\n```"
         )
+        examples = self.examples_for(chapter_html)
+        return [
+            {"role": "system", "content": self._system_prompt(examples)},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def build_for_chapters(
+        self, chapter_htmls: List[str], numbers: List[int] | None = None
+    ) -> List[Dict[str, str]]:
+        """Build one request for several chapters, answered with a JSON array.
+
+        The system prompt with rules and examples is sent once for all chapters.
+        ``numbers`` are the chapter numbers in the document (default 1..n).
+        """
+        numbers = numbers or list(range(1, len(chapter_htmls) + 1))
+        parts = [
+            f"=== CHAPTER {number} ===\n```html\n{chapter_html}\n```"
+            for number, chapter_html in zip(numbers, chapter_htmls)
+        ]
+        user_prompt = (
+            f"Convert each of these {len(chapter_htmls)} chapters from HTML to Markdown"
+            " independently.\n\n"
+            "Return ONLY a valid JSON object with a \"chapters\" array holding one"
+            " object per chapter, in the same order. Use the number after CHAPTER"
+            " as chapter_number:\n"
+            "{\n"
+            '  "chapters": [\n'
+            "    {\n"
+            '      "manifest": {"chapter_number": 1, "title": "Chapter Title",'
+            ' "filename": "chapter.md", "slug": "chapter"},\n'
+            '      "markdown": "Full markdown content with frontmatter..."\n'
+            "    }\n"
+            "  ]\n"
+            "}\n\n"
+            + "\n\n".join(parts)
+        )
+        examples = self.examples_for("\n".join(chapter_htmls))
+        return [
+            {"role": "system", "content": self._system_prompt(examples)},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def build_for_fragment(
+        self,
+        changed_html: str,
+        previous_markdown: str,
+        before_html: str = "",
+        after_html: str = "",
+    ) -> List[Dict[str, str]]:
+        """Build a request re-formatting the changed part of a chapter.
+
+        ``previous_markdown`` is the output of the previous run for the same
+        region; the surrounding blocks are passed as read-only context.
+        """
+        user_prompt = (
+            "Part of a chapter was edited. Convert the CHANGED HTML to Markdown so"
+            " that it replaces the PREVIOUS MARKDOWN of the same region. Keep the"
+            " style of the previous markdown and do not repeat the context blocks.\n\n"
+            "Return ONLY a valid JSON object:\n"
+            '{"markdown": "Markdown for the changed HTML only"}\n\n'
+            f"CONTEXT BEFORE (do not convert):\n```html\n{before_html}\n```\n\n"
+            f"PREVIOUS MARKDOWN:\n```markdown\n{previous_markdown}\n```\n\n"
+            f"CONTEXT AFTER (do not convert):\n```html\n{after_html}\n```\n\n"
+            f"CHANGED HTML:\n```html\n{changed_html}\n```"
+        )
+        examples = self.examples_for(before_html + changed_html + after_html)
         return [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": self._system_prompt(examples)},
             {"role": "user", "content": user_prompt},
         ]
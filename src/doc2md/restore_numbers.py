@@ -0,0 +1,129 @@
+"""Restore heading numbers from the table of contents on a parsed HTML tree.
+
+In-process port of ``restore_numbers.lua``: TOC links (``href="#anchor"``)
+whose text starts with a number give the number of the heading carrying that
+anchor, either as its ``id`` or on an element inside it. Numbered headings
+get ``"<number> <title>"`` as their text and TOC blocks are removed. With
+``fallback_counters`` headings missing from the TOC are numbered by level
+counters that continue from the last TOC number.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, NamedTuple
+
+from lxml import etree, html
+
+_TOC_LINKS_XPATH = etree.XPath('//a[starts-with(@href, "#")]', smart_strings=False)
+_HEADINGS_XPATH = etree.XPath(
+    "//*[self::h1 or self::h2 or self::h3 or self::h4 or self::h5 or self::h6]",
+    smart_strings=False,
+)
+_LISTS_XPATH = etree.XPath("//ul | //ol", smart_strings=False)
+_DIVS_XPATH = etree.XPath("//div", smart_strings=False)
+
+_NUMBER_RE = re.compile(r"^\s*(\d+[.\d]*)\s+")
+_TOC_ID_RE = re.compile(r"toc|contents", re.IGNORECASE)
+
+
+class RestoreReport(NamedTuple):
+    """What :func:`restore_numbers` changed."""
+
+    toc_entries: int  # anchors with a number in the TOC
+    numbered: int  # headings numbered from the TOC
+    counted: int  # headings numbered by the fallback counters
+    removed_blocks: int  # TOC lists and divs removed
+
+
+def collect_toc_numbers(root: html.HtmlElement) -> Dict[str, str]:
+    """Map anchor ids to the numbers their TOC links start with."""
+    toc: Dict[str, str] = {}
+    for link in _TOC_LINKS_XPATH(root):
+        match = _NUMBER_RE.match(link.text_content())
+        if match:
+            toc[link.get("href")[1:]] = match.group(1)
+    return toc
+
+
+def _heading_number(heading: html.HtmlElement, toc: Dict[str, str]) -> str | None:
+    heading_id = heading.get("id")
+    if heading_id in toc:
+        return toc[heading_id]
+    for element in heading.iterdescendants():
+        if element.get("id") in toc:
+            return toc[element.get("id")]
+    return None
+
+
+def _set_heading_text(heading: html.HtmlElement, number: str) -> None:
+    clean = _NUMBER_RE.sub("", heading.text_content().strip(), count=1)
+    for child in list(heading):
+        heading.remove(child)
+    heading.text = f"{number} {clean}"
+
+
+def _internal_links(element: html.HtmlElement) -> int:
+    return sum(1 for a in element.iter("a") if (a.get("href") or "").startswith("#"))
+
+
+def _is_toc_block(element: html.HtmlElement) -> bool:
+    if element.tag == "div":
+        if _TOC_ID_RE.search(element.get("id") or ""):
+            return True
+        links = sum(1 for a in element.iter("a") if a.get("href") is not None)
+        return links > 3 and _internal_links(element) / links > 0.8
+    items = [li for li in element if li.tag == "li"]
+    return (
+        len(items) > 2 and sum(_internal_links(li) for li in items) / len(items) > 0.7
+    )
+
+
+def restore_numbers(
+    root: html.HtmlElement,
+    *,
+    remove_toc: bool = True,
+    fallback_counters: bool = False,
+) -> RestoreReport:
+    """
+    Number headings from the TOC links of ``root`` in place.
+
+    Args:
+        root: Parsed HTML document
+        remove_toc: Remove TOC lists and divs after reading them
+        fallback_counters: Number headings that have no TOC entry by level
+
+    Returns:
+        Counts of the changes made
+    """
+    toc = collect_toc_numbers(root)
+
+    numbered = counted = 0
+    counters: List[int] = []
+    for heading in _HEADINGS_XPATH(root):
+        level = int(heading.tag[1])
+        number = _heading_number(heading, toc)
+        if number is not None:
+            counters = [int(part) for part in number.split(".") if part]
+            _set_heading_text(heading, number)
+            numbered += 1
+        elif fallback_counters and heading.text_content().strip():
+            counters = (counters + [0] * level)[:level]
+            counters[-1] += 1
+            _set_heading_text(heading, ".".join(map(str, counters)))
+            counted += 1
+
+    removed = 0
+    if remove_toc:
+        document = root.getroottree().getroot()
+        for element in _DIVS_XPATH(root) + _LISTS_XPATH(root):
+            # Skip blocks already removed together with an enclosing one
+            attached = any(a is document for a in element.iterancestors())
+            if attached and _is_toc_block(element):
+                element.drop_tree()
+                removed += 1
+
+    return RestoreReport(len(toc), numbered, counted, removed)
+
+
+__all__ = ["RestoreReport", "collect_toc_numbers", "restore_numbers"]
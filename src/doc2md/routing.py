@@ -0,0 +1,223 @@
+"""Per-chapter choice of provider and model.
+
+A :class:`RoutingPolicy` holds routes ordered from the cheapest to the
+strongest. Each route accepts chapters up to a size, token and density limit;
+a chapter goes to the first route that accepts it. Routes whose recent
+failure rate is too high are skipped, so their chapters escalate to the next
+route. :class:`RoutedClient` applies a policy and limits the concurrent
+requests of each route with a semaphore.
+
+Routes can be loaded from JSON::
+
+    {"routes": [
+        {"name": "small", "provider": "openrouter", "model": "...",
+         "max_bytes": 20000, "max_table_density": 0.2, "concurrency": 8},
+        {"name": "large", "provider": "mistral", "model": "...", "concurrency": 2}
+    ]}
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, NamedTuple, Tuple
+
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+_TABLE_RE = re.compile(r"<table\b", re.IGNORECASE)
+_TABLE_BLOCK_RE = re.compile(r"<table\b.*?</table>", re.IGNORECASE | re.DOTALL)
+_CODE_BLOCK_RE = re.compile(r"<pre\b.*?</pre>", re.IGNORECASE | re.DOTALL)
+
+# Rough size of a token for mixed Russian/English HTML
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ChapterFeatures(NamedTuple):
+    """Properties of a chapter used for routing."""
+
+    bytes: int
+    tokens: int
+    tables: int
+    table_density: float  # share of the HTML inside <table>
+    code_density: float  # share of the HTML inside <pre>
+
+
+def chapter_features(chapter_html: str) -> ChapterFeatures:
+    size = len(chapter_html) or 1
+    table_chars = sum(len(m) for m in _TABLE_BLOCK_RE.findall(chapter_html))
+    code_chars = sum(len(m) for m in _CODE_BLOCK_RE.findall(chapter_html))
+    return ChapterFeatures(
+        bytes=len(chapter_html.encode("utf-8")),
+        tokens=estimate_tokens(chapter_html),
+        tables=len(_TABLE_RE.findall(chapter_html)),
+        table_density=table_chars / size,
+        code_density=code_chars / size,
+    )
+
+
+class Route(NamedTuple):
+    """Provider and model for chapters within the given limits (0 = no limit)."""
+
+    name: str
+    provider: str
+    model: str = ""
+    max_bytes: int = 0
+    max_tokens: int = 0
+    max_tables: int = -1  # -1: no limit
+    max_table_density: float = 1.0
+    max_code_density: float = 1.0
+    concurrency: int = 4
+
+    def accepts(self, features: ChapterFeatures) -> bool:
+        return (
+            (not self.max_bytes or features.bytes <= self.max_bytes)
+            and (not self.max_tokens or features.tokens <= self.max_tokens)
+            and (self.max_tables < 0 or features.tables <= self.max_tables)
+            and features.table_density <= self.max_table_density
+            and features.code_density <= self.max_code_density
+        )
+
+
+class RoutingPolicy:
+    """Routes ordered from cheapest to strongest, with failure tracking.
+
+    Args:
+        routes: Candidate routes; the last one takes anything no other accepts
+        failure_threshold: Recent failure rate above which a route is skipped
+        window: Number of recent results per route used for the failure rate
+        min_results: Results needed before a route can be skipped
+    """
+
+    def __init__(
+        self,
+        routes: List[Route],
+        *,
+        failure_threshold: float = 0.5,
+        window: int = 20,
+        min_results: int = 4,
+    ) -> None:
+        if not routes:
+            raise ValueError("Routing policy needs at least one route")
+        self.routes = list(routes)
+        self.failure_threshold = failure_threshold
+        self.min_results = min_results
+        self._results: Dict[str, Deque[bool]] = {
+            route.name: deque(maxlen=window) for route in routes
+        }
+        self._lock = threading.Lock()
+
+    def failure_rate(self, name: str) -> float:
+        with self._lock:
+            results = list(self._results[name])
+        if len(results) < self.min_results:
+            return 0.0
+        return results.count(False) / len(results)
+
+    def record(self, name: str, ok: bool) -> None:
+        with self._lock:
+            self._results[name].append(ok)
+
+    def choose(self, features: ChapterFeatures) -> Route:
+        """Return the first accepting route that is not failing too often."""
+        candidates = [r for r in self.routes[:-1] if r.accepts(features)]
+        for route in candidates + [self.routes[-1]]:
+            if self.failure_rate(route.name) <= self.failure_threshold:
+                return route
+            logger.info("Route %s skipped: failure rate too high", route.name)
+        return self.routes[-1]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RoutingPolicy":
+        routes = [Route(**item) for item in data["routes"]]
+        options = {k: v for k, v in data.items() if k != "routes"}
+        return cls(routes, **options)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "RoutingPolicy":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+class RoutedClient:
+    """Client that sends each chapter to the route chosen by a policy.
+
+    Clients are created per route on first use through ``ClientFactory``.
+    """
+
+    def __init__(
+        self, policy: RoutingPolicy, prompt_builder: Any, **client_options: Any
+    ) -> None:
+        self.policy = policy
+        self.prompt_builder = prompt_builder
+        self.client_options = client_options
+        self.model = policy.routes[0].model
+        self.chapters: Dict[str, int] = {route.name: 0 for route in policy.routes}
+        self._clients: Dict[str, Any] = {}
+        self._semaphores = {
+            route.name: threading.BoundedSemaphore(route.concurrency)
+            for route in policy.routes
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def retry_count(self) -> int:
+        return sum(client.retry_count for client in self._clients.values())
+
+    def client_for(self, route: Route) -> Any:
+        with self._lock:
+            if route.name not in self._clients:
+                from .llm_client import ClientFactory
+
+                self._clients[route.name] = ClientFactory.create_client(
+                    route.provider,
+                    self.prompt_builder,
+                    model=route.model or None,
+                    **self.client_options,
+                )
+            return self._clients[route.name]
+
+    def format_chapter(self, chapter_html: str) -> Tuple[Dict[str, Any], str]:
+        features = chapter_features(chapter_html)
+        route = self.policy.choose(features)
+        client = self.client_for(route)
+        with span(
+            "routing.format_chapter",
+            route=route.name,
+            tokens=features.tokens,
+            tables=features.tables,
+        ):
+            with self._semaphores[route.name]:
+                try:
+                    result = client.format_chapter(chapter_html)
+                except Exception:
+                    self.policy.record(route.name, False)
+                    raise
+        self.policy.record(route.name, True)
+        with self._lock:
+            self.chapters[route.name] += 1
+        return result
+
+
+def default_policy(provider: str, model: str) -> RoutingPolicy:
+    """Single route sending every chapter to ``provider``/``model``."""
+    return RoutingPolicy([Route("default", provider, model)])
+
+
+__all__ = [
+    "ChapterFeatures",
+    "Route",
+    "RoutedClient",
+    "RoutingPolicy",
+    "chapter_features",
+    "default_policy",
+    "estimate_tokens",
+]
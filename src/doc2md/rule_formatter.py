@@ -0,0 +1,163 @@
+"""Deterministic chapter formatting for the mechanical rules.
+
+Many rules of ``formatting_rules.md`` follow directly from the semantic
+classes of the Mammoth style map: ``app-annotation`` divs become
+``::AppAnnotation`` blocks, ``language-X``/``filename-X`` code classes become
+fence labels, ``Таблица N – ...`` paragraphs become blockquote captions after
+their table, and bullet lists get ``;``/``.`` punctuation (component names in
+backticks). :func:`format_chapter` applies them in a subclass of the
+in-process :class:`~doc2md.fast_markdown.MarkdownWriter` and then runs the
+validators; a chapter that converts cleanly and passes them does not need
+the LLM.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from lxml import html
+from slugify import slugify
+
+from .fast_markdown import MarkdownWriter, Unsupported
+from .tracing import span
+from .validators import run_all_validators
+
+_TABLE_CAPTION_RE = re.compile(r"^Таблица\s+(\d+)\s*[–—-]\s*(.+)$")
+_NOTE_RE = re.compile(r"^_?Примечани[ея]_?\s*[–—:-]\s*(.+)$", re.DOTALL)
+_HEADING_NUMBER_RE = re.compile(r"^\d+(?:\.\d+)*\.?\s+")
+_COMPONENT_RE = re.compile(r"^(?!`)(.+?)\s+[—–-]\s+(.+)$", re.DOTALL)
+_TRAILING_PUNCTUATION = ".,;:"
+
+# Language classes rendered with a different fence label
+_LANGUAGE_LABELS = {"terminal": "bash Terminal"}
+
+
+class RuleResult(NamedTuple):
+    """Outcome of :func:`format_chapter`."""
+
+    result: Tuple[Dict[str, Any], str] | None  # None when the LLM is needed
+    reason: str = ""
+
+
+class _RuleWriter(MarkdownWriter):
+    def blocks(self, container: html.HtmlElement) -> List[str]:
+        out = super().blocks(container)
+        # Captions written above their table move below it
+        for i in range(len(out) - 1):
+            if out[i].startswith("> Таблица") and out[i + 1].startswith("|"):
+                out[i], out[i + 1] = out[i + 1], out[i]
+        return out
+
+    def block(self, element: html.HtmlElement) -> List[str]:
+        tag = element.tag
+        classes = (element.get("class") or "").split() if isinstance(tag, str) else []
+        if tag in {"h1", "h2", "h3", "h4", "h5", "h6"}:
+            # PostProcessor numbers sections itself
+            text = _strip_number(self.text(element, breaks=False))
+            return [f"{'#' * int(tag[1])} {text}"] if text else []
+        if tag == "div" and "app-annotation" in classes:
+            inner = [b for b in MarkdownWriter.blocks(self, element) if b]
+            return ["::AppAnnotation\n" + "\n\n".join(inner) + "\n::"] if inner else []
+        if tag == "p":
+            text = self.text(element)
+            caption = _TABLE_CAPTION_RE.match(text)
+            if caption:
+                return [f"> Таблица {caption.group(1)} – {caption.group(2)}"]
+            note = _NOTE_RE.match(text)
+            if note:
+                return [f"> _Примечание_ – {note.group(1)}"]
+        if tag == "ul":
+            return [self.list(element, component="component-list" in classes)]
+        return super().block(element)
+
+    def list(self, element: html.HtmlElement, component: bool = False) -> str:
+        if element.tag != "ul":
+            return super().list(element)
+        items = [li for li in element if isinstance(li.tag, str)]
+        rendered: List[str] = []
+        for i, li in enumerate(items):
+            if li.tag != "li":
+                raise Unsupported(f"<{li.tag}> inside list")
+            first, _, rest = self.list_item(li).partition("\n")
+            first = first.rstrip().rstrip(_TRAILING_PUNCTUATION)
+            match = _COMPONENT_RE.match(first) if component else None
+            if match:
+                first = f"`{match.group(1)}` — {match.group(2)}"
+            first += "." if i == len(items) - 1 else ";"
+            lines = [f"- {first}"] + [
+                f"  {line}" if line else "" for line in rest.split("\n") if rest
+            ]
+            rendered.append("\n".join(lines))
+        return "\n".join(rendered)
+
+    def code_block(self, pre: html.HtmlElement) -> str:
+        rendered = super().code_block(pre)
+        code = pre.find("code")
+        classes = (code.get("class") or "").split() if code is not None else []
+        language = next((c[9:] for c in classes if c.startswith("language-")), "")
+        filename = next((c[9:] for c in classes if c.startswith("filename-")), "")
+        label = _LANGUAGE_LABELS.get(language, language)
+        if filename:
+            label += " " + (filename if "." in filename else f"{filename}.{language}")
+        fence, _, body = rendered.partition("\n")
+        return f"{fence.split(' ')[0]}{label}\n{body}"
+
+
+def _strip_number(title: str) -> str:
+    return _HEADING_NUMBER_RE.sub("", title)
+
+
+def render_markdown(chapter_html: str) -> str:
+    """Convert chapter HTML with the mechanical rules.
+
+    Raises:
+        Unsupported: For markup that needs the LLM (images, merged cells, ...)
+    """
+    root = html.fragment_fromstring(chapter_html, create_parent="div")
+    return "\n\n".join(b for b in _RuleWriter().blocks(root) if b) + "\n"
+
+
+def format_chapter(chapter_html: str, chapter_number: int) -> RuleResult:
+    """
+    Format a chapter without the LLM if the rules cover all of it.
+
+    Args:
+        chapter_html: Chapter HTML starting with its ``<h1>``
+        chapter_number: Number of the chapter in the document
+
+    Returns:
+        ``(manifest, markdown)`` shaped like an LLM response, or ``None`` and
+        the reason (unsupported markup or validator warnings)
+    """
+    with span("rule_formatter.format_chapter", bytes_in=len(chapter_html)) as sp:
+        root = html.fragment_fromstring(chapter_html or "<p></p>", create_parent="div")
+        heading = root.find("h1")
+        if heading is None:
+            sp.set(ok=False)
+            return RuleResult(None, "no <h1>")
+        title = _strip_number(" ".join(heading.text_content().split()))
+        try:
+            body = render_markdown(chapter_html)
+        except Unsupported as exc:
+            sp.set(ok=False, reason=str(exc))
+            return RuleResult(None, str(exc))
+        warnings = run_all_validators(body)
+        if warnings:
+            sp.set(ok=False, reason=warnings[0])
+            return RuleResult(None, warnings[0])
+
+        slug = slugify(title) or f"chapter-{chapter_number}"
+        manifest = {
+            "chapter_number": chapter_number,
+            "title": title,
+            "filename": f"{chapter_number}.{slug}.md",
+            "slug": slug,
+        }
+        title_yaml = title.replace('"', '\\"')
+        markdown = f'---\ntitle: "{title_yaml}"\n---\n\n{body}'
+        sp.set(ok=True, bytes_out=len(markdown))
+    return RuleResult((manifest, markdown))
+
+
+__all__ = ["RuleResult", "format_chapter", "render_markdown"]
@@ -6,6 +6,9 @@ from typing import List, Tuple
 import re
 
 from bs4 import BeautifulSoup, NavigableString
+from lxml import html
+
+from .tracing import span
 
 
 def split_html_by_h1(html_content: str) -> List[str]:
@@ -23,6 +26,15 @@ def split_html_by_heading_level(html_content: str, level: int) -> List[Tuple[str
     Returns:
         List of tuples (heading_title, chapter_content)
     """
+    with span(
+        "splitter.split_html_by_heading_level", bytes_in=len(html_content), level=level
+    ) as sp:
+        chapters = _split_soup(html_content, level)
+        sp.set(chapters=len(chapters))
+    return chapters
+
+
+def _split_soup(html_content: str, level: int) -> List[Tuple[str, str]]:
     soup = BeautifulSoup(html_content, "lxml")
     
     # Find the body content, or use the whole document if no body
@@ -67,6 +79,46 @@ def split_html_by_heading_level(html_content: str, level: int) -> List[Tuple[str
     return chapters
 
 
+def split_tree_by_heading_level(
+    root: html.HtmlElement, level: int
+) -> List[Tuple[str, str]]:
+    """Split a parsed lxml tree into chapters by specified heading level.
+
+    Tree counterpart of :func:`split_html_by_heading_level`; only the chapter
+    fragments are serialized.
+
+    Args:
+        root: Parsed HTML document
+        level: Heading level to split on (1 for h1, 2 for h2, etc.)
+
+    Returns:
+        List of tuples (heading_title, chapter_content)
+    """
+    body = root.find("body")
+    if body is None:
+        body = root
+
+    heading_tag = f"h{level}"
+    headings = list(body.iter(heading_tag))
+
+    if not headings:
+        return [("", html.tostring(body, encoding="unicode"))]
+
+    chapters: List[Tuple[str, str]] = []
+    for heading in headings:
+        title = heading.text_content().strip()
+
+        parts = [html.tostring(heading, encoding="unicode")]
+        current = heading.getnext()
+        while current is not None and current.tag != heading_tag:
+            parts.append(html.tostring(current, encoding="unicode"))
+            current = current.getnext()
+
+        chapters.append((title, "".join(parts)))
+
+    return chapters
+
+
 def extract_heading_title(heading_element) -> str:
     """Extract clean title from heading element, handling numbered headings."""
     if not heading_element:
@@ -0,0 +1,193 @@
+"""Lightweight span timing with Chrome trace export.
+
+Stages wrap their work in :func:`span`; while tracing is disabled (the
+default) spans cost a couple of attribute lookups. When enabled, each span
+records wall and CPU time plus free-form arguments such as byte counts,
+chapter ids and retries, and :meth:`Tracer.write` saves them in the Chrome
+trace event format (open with ``chrome://tracing`` or https://ui.perfetto.dev).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Protocol
+
+_ORIGIN = time.perf_counter()
+
+
+class Span:
+    """A timed region; ``set`` attaches arguments shown in the trace viewer."""
+
+    __slots__ = ("name", "category", "args", "start", "cpu_start")
+
+    def __init__(self, name: str, category: str, args: Dict[str, Any]) -> None:
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class SpanListener(Protocol):
+    """Observer notified when spans open and close, e.g. a memory profiler."""
+
+    def span_started(self, span: Span) -> None: ...
+
+    def span_finished(self, span: Span) -> None: ...
+
+
+class Tracer:
+    """Collect spans from any thread of the current process."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.events: List[Dict[str, Any]] = []
+        self.listeners: List[SpanListener] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: SpanListener) -> None:
+        """Notify ``listener`` about every span, even while export is disabled."""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: SpanListener) -> None:
+        self.listeners.remove(listener)
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self.events.append(event)
+
+    def add_complete(
+        self,
+        name: str,
+        start: float,
+        duration: float,
+        category: str = "stage",
+        **args: Any,
+    ) -> None:
+        """Record a span measured elsewhere (``start`` from ``perf_counter``)."""
+        if not self.enabled:
+            return
+        self._emit(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - _ORIGIN) * 1e6,
+                "dur": duration * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args: Any) -> Iterator[Any]:
+        if not self.enabled and not self.listeners:
+            yield _NULL_SPAN
+            return
+
+        current = Span(name, category, args)
+        for listener in self.listeners:
+            listener.span_started(current)
+        try:
+            yield current
+        except BaseException as exc:
+            current.args["error"] = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            end = time.perf_counter()
+            cpu = time.thread_time() - current.cpu_start
+            current.args["cpu_ms"] = round(cpu * 1000, 3)
+            for listener in reversed(self.listeners):
+                listener.span_finished(current)
+            self.add_complete(
+                name, current.start, end - current.start, category, **current.args
+            )
+
+    def run_subprocess(
+        self, command: List[str], **kwargs: Any
+    ) -> subprocess.CompletedProcess:
+        """Run ``subprocess.run`` inside a span that also records child CPU time."""
+        import resource
+
+        def children_cpu() -> float:
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            return usage.ru_utime + usage.ru_stime
+
+        with self.span(
+            command[0], category="subprocess", command=" ".join(command)
+        ) as sp:
+            before = children_cpu()
+            result = subprocess.run(command, **kwargs)
+            sp.set(
+                returncode=result.returncode,
+                child_cpu_ms=round((children_cpu() - before) * 1000, 3),
+            )
+            return result
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str | Path) -> None:
+        """Save recorded spans as a Chrome trace JSON file."""
+        Path(path).write_text(
+            json.dumps(self.to_chrome_trace(), ensure_ascii=False), encoding="utf-8"
+        )
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer."""
+    return _tracer
+
+
+def enable() -> Tracer:
+    """Start recording spans in the process-wide tracer."""
+    _tracer.enabled = True
+    return _tracer
+
+
+def span(name: str, category: str = "stage", **args: Any):
+    """Time a block with the process-wide tracer."""
+    return _tracer.span(name, category, **args)
+
+
+def run_subprocess(command: List[str], **kwargs: Any) -> subprocess.CompletedProcess:
+    """Run a command with the process-wide tracer."""
+    if not _tracer.enabled and not _tracer.listeners:
+        return subprocess.run(command, **kwargs)
+    return _tracer.run_subprocess(command, **kwargs)
+
+
+__all__ = [
+    "Span",
+    "SpanListener",
+    "Tracer",
+    "enable",
+    "get_tracer",
+    "run_subprocess",
+    "span",
+]
@@ -0,0 +1,12 @@
+import pytest
+
+from doc2md.config import settings
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache_dir(tmp_path_factory, monkeypatch):
+    """Keep caches, ledgers and indexes written by tests out of the real home."""
+    monkeypatch.setenv("DOC2MD_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+    settings.reload()
+    yield
+    settings.reload()
@@ -0,0 +1,69 @@
+import json
+import subprocess
+import time
+from pathlib import Path
+
+from doc2md.batch import discover_inputs, plan_jobs, run_batch
+
+
+def fake_convert(job, options, timeout):
+    if "slow" in job.input_path:
+        raise subprocess.TimeoutExpired(["pandoc"], timeout)
+    return 3, 0.01
+
+
+def test_discover_inputs_from_manifest_and_directory(tmp_path: Path) -> None:
+    docs = tmp_path / "docs"
+    (docs / "user").mkdir(parents=True)
+    (docs / "admin.html").write_text("<h1>A</h1>", encoding="utf-8")
+    (docs / "user" / "guide.html").write_text("<h1>U</h1>", encoding="utf-8")
+    (docs / "notes.md").write_text("skip", encoding="utf-8")
+    manifest = tmp_path / "inputs.txt"
+    manifest.write_text("# portfolio\ndocs/admin.html\n\n", encoding="utf-8")
+
+    assert discover_inputs(str(docs)) == [
+        docs / "admin.html",
+        docs / "user" / "guide.html",
+    ]
+    assert discover_inputs(str(manifest)) == [tmp_path / "docs/admin.html"]
+
+
+def test_run_batch_records_progress_and_resumes(tmp_path: Path) -> None:
+    inputs = [Path("a/guide.html"), Path("b/guide.html"), Path("slow.html")]
+    jobs = plan_jobs(inputs, str(tmp_path / "out"))
+    assert [Path(j.output_dir).name for j in jobs] == ["guide", "guide-2", "slow"]
+
+    progress_path = tmp_path / "progress.json"
+    summary = run_batch(
+        jobs, workers=2, timeout=1, progress_path=progress_path, convert=fake_convert
+    )
+
+    assert summary.converted == 2
+    assert summary.failed == 1
+    assert summary.chapters == 6
+    journal = json.loads(progress_path.read_text(encoding="utf-8"))
+    assert journal["slow.html"]["status"] == "timeout"
+
+    summary = run_batch(
+        jobs, workers=2, progress_path=progress_path, convert=fake_convert
+    )
+    assert summary.skipped == 2
+    assert summary.failed == 1
+
+
+def stuck_convert(job, options, timeout):
+    if "stuck" in job.input_path:
+        while True:  # a Python stage that never checks the deadline
+            pass
+    return 1, 0.01
+
+
+def test_run_batch_kills_worker_stuck_outside_pandoc(tmp_path: Path) -> None:
+    jobs = plan_jobs([Path("stuck.html"), Path("ok.html")], str(tmp_path / "out"))
+
+    start = time.perf_counter()
+    summary = run_batch(jobs, workers=2, timeout=0.2, convert=stuck_convert)
+
+    assert time.perf_counter() - start < 10
+    statuses = {r.job.input_path: r.status for r in summary.results}
+    assert statuses == {"stuck.html": "timeout", "ok.html": "done"}
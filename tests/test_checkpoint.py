@@ -0,0 +1,31 @@
+import json
+
+from doc2md.checkpoint import JOURNAL_FILENAME, RunJournal
+
+
+def test_run_journal_resumes_only_matching_chapters(tmp_path) -> None:
+    run_info = {"document_hash": "abc", "provider": "mock", "model": "m"}
+    manifest = {
+        "chapter_number": 1,
+        "title": "One",
+        "filename": "1.one.md",
+        "slug": "one",
+    }
+
+    journal = RunJournal(tmp_path, run_info)
+    journal.record(1, "<h1>One</h1>", (manifest, "# One"), 1.5)
+    data = json.loads((tmp_path / JOURNAL_FILENAME).read_text(encoding="utf-8"))
+    assert data["status"] == "running"
+    assert data["chapters"]["1"]["seconds"] == 1.5
+
+    resumed = RunJournal(tmp_path, run_info, resume=True)
+    assert resumed.resumed
+    checkpoint = resumed.get(1, "<h1>One</h1>")
+    assert checkpoint is not None
+    assert checkpoint.manifest == manifest and checkpoint.markdown == "# One"
+    # Changed chapter HTML or settings invalidate the checkpoint
+    assert resumed.get(1, "<h1>One (edited)</h1>") is None
+    assert resumed.get(2, "<h1>Two</h1>") is None
+    other_model = RunJournal(tmp_path, {**run_info, "model": "other"}, resume=True)
+    assert not other_model.resumed
+    assert other_model.get(1, "<h1>One</h1>") is None
@@ -5,19 +5,18 @@ from doc2md.cli import app
 runner = CliRunner()
 
 
-def _patch_preprocess(monkeypatch) -> None:
+def _patch_preprocess(monkeypatch, html: str = "<h1>Chap</h1><p>Body</p>") -> None:
     def fake_convert(docx_path: str, style_map_path: str) -> str:
-        return "<h1>Chap</h1><p>Body</p>"
+        return html
 
-    def fake_extract(docx_path: str, output_dir: str) -> None:
-        pass
+    def fake_extract(docx_path: str, output_dir: str, *args) -> dict:
+        return {}
 
-    def fake_split(html: str):
-        return ["<h1>Chap</h1><p>Body</p>"]
-
-    monkeypatch.setattr("doc2md.preprocess.convert_docx_to_html", fake_convert)
+    monkeypatch.setattr("doc2md.preprocess.convert_docx_to_raw_html", fake_convert)
+    monkeypatch.setattr(
+        "doc2md.heading_numbering.extract_heading_structure_from_toc", lambda _: []
+    )
     monkeypatch.setattr("doc2md.preprocess.extract_images", fake_extract)
-    monkeypatch.setattr("doc2md.splitter.split_html_by_h1", fake_split)
 
 
 def test_run_dry_run_skips_llm(monkeypatch, tmp_path) -> None:
@@ -48,7 +47,7 @@ def test_run_passes_model_option(monkeypatch, tmp_path) -> None:
             return []
 
     class DummyPost:
-        def __init__(self, md: str, idx: int, slug: str) -> None:
+        def __init__(self, md: str, idx: int, slug: str, **kwargs) -> None:
             self.md = md
 
         def run(self) -> str:
@@ -91,16 +90,10 @@ def test_run_passes_model_option(monkeypatch, tmp_path) -> None:
 
 def test_run_dry_run_with_empty_chapters_list(monkeypatch, tmp_path) -> None:
     """Test that dry-run handles empty chapters list gracefully."""
-
-    def fake_convert(docx_path: str, style_map_path: str) -> str:
-        # Return HTML without H1 tags
-        return "<p>Some content without h1 tags</p><h2>Subheading</h2>"
-
-    def fake_extract(docx_path: str, output_dir: str) -> None:
-        pass
-
-    monkeypatch.setattr("doc2md.preprocess.convert_docx_to_html", fake_convert)
-    monkeypatch.setattr("doc2md.preprocess.extract_images", fake_extract)
+    # HTML without H1 tags
+    _patch_preprocess(
+        monkeypatch, "<p>Some content without h1 tags</p><h2>Subheading</h2>"
+    )
 
     result = runner.invoke(
         app, ["run", "input.docx", "--out", str(tmp_path), "--dry-run"]
@@ -120,3 +113,183 @@ def test_run_dry_run_with_empty_chapters_list(monkeypatch, tmp_path) -> None:
     content = full_doc.read_text(encoding="utf-8")
     assert "<p>Some content without h1 tags</p>" in content
     assert "<h2>Subheading</h2>" in content
+
+
+def test_run_resume_skips_checkpointed_chapters(monkeypatch, tmp_path) -> None:
+    chapters = ["<h1>One</h1><p>A</p>", "<h1>Two</h1><p>B</p>"]
+    _patch_preprocess(monkeypatch, "".join(chapters))
+    monkeypatch.setattr("doc2md.prompt_builder.PromptBuilder", lambda *a, **k: object())
+
+    calls = []
+
+    class FlakyClient:
+        def __init__(self, builder, api_key=None, *, model, **kw):
+            pass
+
+        def format_chapter(self, chapter_html: str):
+            calls.append(chapter_html)
+            if len(calls) == 2:
+                raise RuntimeError("network down")
+            idx = chapters.index(chapter_html) + 1
+            return (
+                {
+                    "chapter_number": idx,
+                    "title": f"T{idx}",
+                    "filename": f"{idx}.t.md",
+                    "slug": "t",
+                },
+                f"---\ntitle: T{idx}\n---\n\n# T{idx}\n",
+            )
+
+    monkeypatch.setattr("doc2md.llm_client.OpenRouterClient", FlakyClient)
+
+    args = ["run", "input.docx", "--out", str(tmp_path), "--provider", "openrouter"]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 1
+    assert (tmp_path / "1.t.md").exists()
+
+    result = runner.invoke(app, args + ["--resume"])
+    assert result.exit_code == 0
+    # Chapter 1 came from the checkpoint, only chapter 2 was sent again
+    assert calls == [chapters[0], chapters[1], chapters[1]]
+    assert (tmp_path / "2.t.md").exists()
+    assert (tmp_path / "toc.json").exists()
+
+
+def test_run_dedupe_media_rewrites_image_links_to_the_store(
+    monkeypatch, tmp_path
+) -> None:
+    import zipfile
+
+    docx_path = tmp_path / "guide.docx"
+    with zipfile.ZipFile(docx_path, "w") as archive:
+        archive.writestr("word/media/image1.png", b"png bytes")
+    out = tmp_path / "out"
+    monkeypatch.setattr(
+        "doc2md.preprocess.convert_docx_to_raw_html",
+        lambda *a: "<h1>Chap</h1><p>Body</p>",
+    )
+    monkeypatch.setattr(
+        "doc2md.heading_numbering.extract_heading_structure_from_toc", lambda _: []
+    )
+    monkeypatch.setattr("doc2md.prompt_builder.PromptBuilder", lambda *a, **k: object())
+    monkeypatch.setattr(
+        "doc2md.navigation.inject_navigation_and_create_toc", lambda *a, **k: None
+    )
+
+    class DummyClient:
+        def __init__(self, builder, api_key=None, *, model, **kw):
+            pass
+
+        def format_chapter(self, chapter_html: str):
+            manifest = {"chapter_number": 1, "title": "Chap", "slug": "chap"}
+            return manifest, "# Chap\n\n![Logo](media/media/image1.png)\n"
+
+    monkeypatch.setattr("doc2md.llm_client.OpenRouterClient", DummyClient)
+
+    result = runner.invoke(
+        app,
+        [
+            "run",
+            str(docx_path),
+            "--out",
+            str(out),
+            "--provider",
+            "openrouter",
+            "--dedupe-media",
+            "--media-link",
+            "rewrite",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    stored = list((out / "media" / "_store").rglob("*.png"))
+    assert len(stored) == 1
+    assert not (out / "media" / "media" / "image1.png").exists()
+    link = stored[0].relative_to(out).as_posix()
+    markdown = (out / "01.chap.md").read_text(encoding="utf-8")
+    assert f"![Logo](/images/developer/administrator/guide/{link})" in markdown
+
+
+def test_run_resume_after_edit_reformats_only_the_changed_chapter(
+    monkeypatch, tmp_path
+) -> None:
+    chapters = ["<h1>One</h1><p>A</p>", "<h1>Two</h1><p>B</p>", "<h1>Three</h1>"]
+    _patch_preprocess(monkeypatch, "".join(chapters))
+    monkeypatch.setattr("doc2md.prompt_builder.PromptBuilder", lambda *a, **k: object())
+    calls = []
+
+    class Client:
+        def __init__(self, builder, api_key=None, *, model, **kw):
+            pass
+
+        def format_chapter(self, chapter_html: str):
+            calls.append(chapter_html)
+            title = chapter_html[4 : chapter_html.index("</h1>")]
+            manifest = {"chapter_number": 1, "title": title, "slug": title.lower()}
+            return manifest, f"# {title}\n"
+
+    monkeypatch.setattr("doc2md.llm_client.OpenRouterClient", Client)
+    args = ["run", "input.docx", "--out", str(tmp_path), "--provider", "openrouter"]
+    assert runner.invoke(app, args).exit_code == 0
+
+    chapters[1] = "<h1>Two</h1><p>B, fixed</p>"
+    _patch_preprocess(monkeypatch, "".join(chapters))
+    calls.clear()
+    result = runner.invoke(app, args + ["--resume"])
+
+    assert result.exit_code == 0
+    assert calls == [chapters[1]]
+
+
+def test_from_html_pandoc_keep_toc_leaves_the_toc_in_place(tmp_path) -> None:
+    html_path = tmp_path / "guide.html"
+    html_path.write_text(
+        '<div id="toc"><ul><li><a href="#intro">1 Введение</a></li></ul></div>'
+        '<h1 id="intro">Введение</h1><p>Текст</p>',
+        encoding="utf-8",
+    )
+
+    def numbered(flag: str) -> str:
+        out = tmp_path / flag
+        args = ["from-html-pandoc", str(html_path), "--out", str(out), flag]
+        result = runner.invoke(app, args + ["--fast-path", "--keep-temp"])
+        assert result.exit_code == 0, result.output
+        assert "# 1 Введение" in (out / "01.1-vvedenie.md").read_text(encoding="utf-8")
+        return (out / "_chapters" / "numbered.html").read_text(encoding="utf-8")
+
+    assert 'id="toc"' in numbered("--keep-toc")
+    assert 'id="toc"' not in numbered("--remove-toc")
+
+
+def test_importing_cli_does_not_load_heavy_dependencies() -> None:
+    import subprocess
+    import sys
+
+    heavy = ["bs4", "docx", "dotenv", "httpx", "jsonschema", "lxml", "mammoth", "rich"]
+    code = (
+        "import sys, doc2md.cli; " f"print([m for m in {heavy!r} if m in sys.modules])"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_run_batch_rejects_provider_without_batch_api(tmp_path) -> None:
+    result = runner.invoke(
+        app,
+        [
+            "run",
+            "input.docx",
+            "--out",
+            str(tmp_path),
+            "--provider",
+            "openrouter",
+            "--batch",
+        ],
+    )
+
+    assert result.exit_code == 2
+    assert "batch API" in result.output
+    assert not (tmp_path / "html").exists()
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from doc2md.config import settings
+from doc2md.example_index import load_index, samples_fingerprint
+from doc2md.prompt_builder import PromptBuilder
+
+MONITORING = (
+    "<h1>Мониторинг</h1><p>Система мониторинга собирает метрики Prometheus.</p>"
+)
+
+
+def test_index_is_cached_and_selects_relevant_sections_within_budget(tmp_path) -> None:
+    index = load_index("samples", tmp_path)
+    cached = tmp_path / f"{samples_fingerprint('samples')}.json"
+    assert cached.exists()
+    assert load_index("samples", tmp_path).sections == index.sections
+
+    chosen = index.select(MONITORING, 600)
+    assert chosen and sum(section.tokens for section in chosen) <= 600
+    assert "мониторинг" in chosen[0].text.lower()
+    # Sections, not whole files
+    assert all(not section.text.startswith("---") for section in chosen)
+
+    tables = index.select(
+        "<h1>Требования</h1><table><tr><td>ОС</td></tr></table>", 2000
+    )
+    assert any("\n|" in section.text for section in tables[:2])
+
+
+def test_prompt_builder_uses_budgeted_examples(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("DOC2MD_CACHE_DIR", str(tmp_path))
+    settings.reload()
+    try:
+        builder = PromptBuilder("formatting_rules.md", "samples", example_tokens=500)
+        system = builder.build_for_chapter(MONITORING)[0]["content"]
+    finally:
+        monkeypatch.delenv("DOC2MD_CACHE_DIR")
+        settings.reload()
+
+    examples = system.split("EXAMPLES:\n", 1)[1]
+    assert examples.startswith("<!-- admin/")
+    assert len(examples) // 4 <= 500 + 50
+    assert (tmp_path / "examples").is_dir()
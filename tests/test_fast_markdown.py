@@ -0,0 +1,63 @@
+import pytest
+
+from doc2md.fast_markdown import html_to_gfm
+
+
+def test_html_to_gfm_converts_common_subset() -> None:
+    chapter = """
+    <h1 id="ustanovka">1 Установка</h1>
+    <p>Запустите <code>make *</code> и откройте <a href="http://host/a b">панель</a>.</p>
+    <ul><li>Один</li><li>Два<ul><li><strong>вложенный</strong></li></ul></li></ul>
+    <ol start="3"><li>Шаг</li></ol>
+    <pre><code class="language-bash">echo 1
+echo *</code></pre>
+    <table><thead><tr><th>Ключ</th><th>Значение</th></tr></thead>
+    <tbody><tr><td><p>a|b</p></td><td>строка<br/>вторая</td></tr></tbody></table>
+    <p>- не список<br/>2_x</p>
+    """
+    result = html_to_gfm(chapter)
+
+    assert result.markdown == (
+        "# 1 Установка\n\n"
+        "Запустите `make *` и откройте [панель](http://host/a%20b).\n\n"
+        "- Один\n- Два\n  - **вложенный**\n\n"
+        "3. Шаг\n\n"
+        "``` bash\necho 1\necho *\n```\n\n"
+        "| Ключ | Значение |\n|------|----------|\n| a\\|b | строка<br>вторая |\n\n"
+        "\\- не список\\\n2\\_x\n"
+    )
+
+
+@pytest.mark.parametrize(
+    ("chapter", "markdown"),
+    [
+        ("<p>1. item</p>", "1\\. item\n"),
+        ("<p>1) item</p>", "1\\) item\n"),
+        ("<p>- x</p>", "\\- x\n"),
+        ("<p>+ x</p>", "\\+ x\n"),
+        ("<p># x</p>", "\\# x\n"),
+        ("<p>a<br/>12. b</p>", "a\\\n12\\. b\n"),
+        ("<h2>x<br/>y</h2>", "## x y\n"),
+        ('<ol start="a"><li>q</li></ol>', "1. q\n"),
+        ('<ol start=""><li>q</li></ol>', "1. q\n"),
+    ],
+)
+def test_html_to_gfm_edge_cases(chapter: str, markdown: str) -> None:
+    assert html_to_gfm(chapter).markdown == markdown
+
+
+@pytest.mark.parametrize(
+    ("chapter", "reason"),
+    [
+        ('<table><tr><td colspan="2">x</td></tr></table>', "merged table cells"),
+        (
+            "<table><tr><td><ul><li>x</li></ul></td></tr></table>",
+            "nested block in table cell",
+        ),
+        ("<p><math><mi>x</mi></math></p>", "math"),
+        ('<div class="app-annotation"><p>x</p></div>', "<div class='app-annotation'>"),
+        ('<p><img src="a.png"/></p>', "<img>"),
+    ],
+)
+def test_html_to_gfm_reports_unsupported_markup(chapter: str, reason: str) -> None:
+    assert html_to_gfm(chapter) == (None, reason)
@@ -11,3 +11,21 @@ def test_add_numbering_anchor_followed_by_text(monkeypatch):
 
     result = hn.add_numbering_to_html(html, "dummy.docx")
     assert result.startswith("<h2>1.2 Функции</h2>Комплекс")
+
+
+def test_apply_numbering_to_tree_retags_heading_paragraph():
+    from lxml import html
+
+    root = html.document_fromstring(
+        '<p><a id="__RefHeading___1"></a>Общие сведения</p><p>Text</p>'
+        '<a id="__RefHeading___3"></a>ФункцииКомплекс реализует функции'
+    )
+    structure = [(1, "1", "Общие сведения"), (2, "1.2", "Функции")]
+
+    created = hn.apply_numbering_to_tree(root, structure)
+
+    result = html.tostring(root, encoding="unicode")
+    assert created == 2
+    assert "<h1>1 Общие сведения</h1><p>Text</p>" in result
+    assert "<h2>1.2 Функции</h2>Комплекс" in result
+    assert "__RefHeading" not in result
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from doc2md.hedging import HedgedClient
+from doc2md.llm_client import RequestCancelled
+
+
+class FakeClient:
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False) -> None:
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.model = name
+        self.retry_count = 0
+        self.calls = 0
+        self.cancelled = 0
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+    def format_chapter(self, chapter_html: str, cancel: threading.Event | None = None):
+        self.calls += 1
+        if cancel is not None and cancel.wait(self.delay):
+            self.cancelled += 1
+            raise RequestCancelled()
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        return {"slug": self.name}, f"# {self.name}"
+
+
+def test_slow_primary_is_hedged_and_loser_cancelled() -> None:
+    primary = FakeClient("primary", delay=5.0)
+    secondary = FakeClient("secondary")
+    client = HedgedClient(primary, secondary, initial_delay=0.05)
+
+    start = time.perf_counter()
+    manifest, markdown = client.format_chapter("<h1>One</h1>")
+
+    assert manifest == {"slug": "secondary"}
+    assert time.perf_counter() - start < 1.0
+    client.close()
+    deadline = time.time() + 2
+    while not primary.cancelled and time.time() < deadline:
+        time.sleep(0.01)
+    assert primary.cancelled == 1
+    assert client.stats.as_dict() == {
+        "requests": 1,
+        "hedged": 1,
+        "hedge_wins": 1,
+        "failovers": 0,
+        "hedge_rate": 1.0,
+        "win_rate": 1.0,
+    }
+
+
+def test_open_circuit_fails_over_to_secondary() -> None:
+    primary = FakeClient("primary", fail=True)
+    secondary = FakeClient("secondary")
+    client = HedgedClient(primary, secondary, failure_threshold=2, reset_timeout=60)
+
+    for _ in range(4):
+        assert client.format_chapter("<h1>One</h1>")[1] == "# secondary"
+
+    # Two primary failures open the breaker; later chapters skip the primary
+    assert primary.calls == 2
+    assert client.breakers["primary"].state == "open"
+    assert client.stats.failovers == 4
+    assert client.stats.hedged == 0
+    client.close()
+    assert primary.closed and secondary.closed
+
+    both_down = HedgedClient(
+        FakeClient("a", fail=True), FakeClient("b", fail=True), failure_threshold=1
+    )
+    with pytest.raises(RuntimeError, match="b failed"):
+        both_down.format_chapter("<h1>One</h1>")
+    with pytest.raises(RuntimeError, match="circuit breakers are open"):
+        both_down.format_chapter("<h1>One</h1>")
+    both_down.close()
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import pytest
+
+from doc2md.image_optimize import ImageOptions, optimize_media
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def test_optimize_media_downscales_and_caches(tmp_path: Path) -> None:
+    media = tmp_path / "media" / "ch01"
+    media.mkdir(parents=True)
+    Image.new("RGB", (400, 200), "white").save(media / "shot.png")
+    options = ImageOptions(max_width=100)
+
+    report = optimize_media(tmp_path / "media", tmp_path / "cache", options, workers=1)
+
+    assert report.processed == 1
+    assert report.cached == 0
+    assert report.mapping == {}
+    with Image.open(media / "shot.png") as image:
+        assert image.size == (100, 50)
+
+    Image.new("RGB", (400, 200), "white").save(media / "shot.png")
+    report = optimize_media(tmp_path / "media", tmp_path / "cache", options, workers=1)
+    assert report.cached == 1
+
+
+def test_vector_result_is_redone_once_a_converter_is_installed(
+    tmp_path: Path, monkeypatch
+) -> None:
+    from doc2md import image_optimize
+
+    emf = tmp_path / "media" / "scheme.emf"
+    emf.parent.mkdir()
+    emf.write_bytes(b"emf data")
+    cache = str(tmp_path / "cache")
+
+    monkeypatch.setattr(image_optimize, "_vector_converter", lambda: "")
+    assert image_optimize._optimize_one(str(emf), cache, ImageOptions())[1] is None
+
+    def convert(src: Path, out_dir: Path) -> Path:
+        Image.new("RGB", (10, 10)).save(out_dir / "scheme.png")
+        return out_dir / "scheme.png"
+
+    monkeypatch.setattr(image_optimize, "_vector_converter", lambda: "inkscape")
+    monkeypatch.setattr(image_optimize, "_convert_vector", convert)
+    _, target, cache_hit, _, _ = image_optimize._optimize_one(
+        str(emf), cache, ImageOptions()
+    )
+    assert not cache_hit
+    assert target == str(emf.with_suffix(".png")) and not emf.exists()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from doc2md.checkpoint import ChapterCheckpoint
+from doc2md.incremental import plan_update, reformat_chapter
+
+PARAGRAPHS = "".join(f"<p>Абзац номер {i} с текстом.</p>" for i in range(10))
+OLD_HTML = (
+    "<h1>Установка</h1>"
+    + PARAGRAPHS
+    + "<table><tr><td>Параметр</td><td>Значение</td></tr>"
+    + "<tr><td>port</td><td>80</td></tr></table>"
+    + "<p>Последний абзац.</p>"
+)
+OLD_MARKDOWN = (
+    "---\ntitle: Установка\n---\n\n# Установка\n\n"
+    + "".join(f"Абзац номер {i} с текстом.\n\n" for i in range(10))
+    + "| Параметр | Значение |\n|---|---|\n| port | 80 |\n\nПоследний абзац.\n"
+)
+PREVIOUS = ChapterCheckpoint(1, {"title": "Установка"}, OLD_MARKDOWN, 0.0, OLD_HTML)
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.fragments = []
+        self.full = 0
+
+    def format_fragment(self, changed_html, previous_markdown, before_html, after_html):
+        self.fragments.append((changed_html, previous_markdown, before_html))
+        return previous_markdown.replace("80", "8080")
+
+    def format_chapter(self, chapter_html):
+        self.full += 1
+        return {"title": "new"}, "# new"
+
+
+def test_table_edit_becomes_single_patch() -> None:
+    new_html = OLD_HTML.replace("<td>80</td>", "<td>8080</td>")
+    plan = plan_update(OLD_HTML, new_html, OLD_MARKDOWN, context=1)
+
+    assert plan.reason == ""
+    [patch] = plan.patches
+    assert "8080" in patch.changed_html and "<p>" not in patch.changed_html
+    assert (
+        patch.previous_markdown == "| Параметр | Значение |\n|---|---|\n| port | 80 |"
+    )
+    assert patch.before_html == "<p>Абзац номер 9 с текстом.</p>"
+    assert patch.after_html == "<p>Последний абзац.</p>"
+
+
+def test_reformat_splices_fragment_and_falls_back_on_large_changes() -> None:
+    client = FakeClient()
+    new_html = OLD_HTML.replace("<td>80</td>", "<td>8080</td>")
+    outcome = reformat_chapter(client, new_html, PREVIOUS)
+
+    assert outcome.patches == 1 and client.full == 0
+    manifest, markdown = outcome.result
+    assert manifest == {"title": "Установка"}
+    assert "| port | 8080 |" in markdown
+    assert markdown.count("Абзац номер") == 10 and markdown.endswith(
+        "Последний абзац.\n"
+    )
+
+    renamed = reformat_chapter(
+        client, new_html.replace("Установка", "Настройка"), PREVIOUS
+    )
+    assert renamed.patches == 0 and renamed.reason == "chapter heading changed"
+    rewritten = reformat_chapter(
+        client, "<h1>Установка</h1><p>Новый текст.</p>", PREVIOUS
+    )
+    assert rewritten.patches == 0 and "changed" in rewritten.reason
+    assert client.full == 2
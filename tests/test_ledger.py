@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+
+import httpx
+import pytest
+
+from doc2md.ledger import CallRecord, Ledger, set_ledger
+from doc2md.llm_client import MistralClient
+from doc2md.planner import ledger_samples
+
+COMMAND = "sudo dnf install doc2md-server"
+CHAPTER = f"<h1>Установка</h1><pre><code>{COMMAND}</code></pre>"
+
+
+def _response(markdown: str) -> httpx.Response:
+    manifest = {
+        "chapter_number": 1,
+        "title": "Установка",
+        "filename": "1.ustanovka.md",
+        "slug": "ustanovka",
+    }
+    content = json.dumps(
+        {"manifest": manifest, "markdown": markdown}, ensure_ascii=False
+    )
+    usage = {"prompt_tokens": 120, "completion_tokens": 80, "total_tokens": 200}
+    return httpx.Response(
+        200, json={"choices": [{"message": {"content": content}}], "usage": usage}
+    )
+
+
+class DummyBuilder:
+    def build_for_chapter(self, chapter_html: str):
+        return [
+            {"role": "system", "content": "rules"},
+            {"role": "user", "content": chapter_html},
+        ]
+
+
+def test_every_attempt_is_recorded_with_reason_and_usage(tmp_path, monkeypatch) -> None:
+    responses = [
+        httpx.Response(503, json={"error": "busy"}),
+        _response("# Установка"),  # incomplete: the code block is missing
+        _response(f"# Установка\n\n```bash\n{COMMAND}\n```"),
+    ]
+    monkeypatch.setattr("doc2md.llm_client.time.sleep", lambda s: None)
+    client = MistralClient(
+        DummyBuilder(),
+        api_key="k",
+        model="mistral-small-latest",
+        client=httpx.Client(transport=httpx.MockTransport(lambda r: responses.pop(0))),
+    )
+    ledger = Ledger(tmp_path / "ledger.sqlite", run_id="run1")
+    previous = set_ledger(ledger)
+    try:
+        client.format_chapter(CHAPTER)
+    finally:
+        set_ledger(previous)
+
+    calls = ledger.calls()
+    assert [(c["attempt"], c["status"], c["reason"]) for c in calls] == [
+        (1, "retry", "http_503"),
+        (2, "retry", "incomplete"),
+        (3, "ok", ""),
+    ]
+    assert {(c["provider"], c["model"], c["kind"], c["run_id"]) for c in calls} == {
+        ("mistral", "mistral-small-latest", "chapter", "run1")
+    }
+    assert calls[0]["http_status"] == 503 and calls[0]["prompt_tokens"] is None
+    assert calls[2]["prompt_tokens"] == 120 and calls[2]["total_tokens"] == 200
+    assert calls[2]["html_chars"] == len(CHAPTER)
+    assert calls[2]["prompt_chars"] == len("rules") + len(CHAPTER)
+    assert ledger_samples(ledger.path, "mistral") == [
+        (len(CHAPTER), calls[2]["response_chars"], calls[2]["latency"])
+    ]
+    assert ledger_samples(ledger.path, "openrouter") == []
+
+
+def test_report_percentiles_per_provider_model_and_kind(tmp_path) -> None:
+    ledger = Ledger(tmp_path / "ledger.sqlite")
+    for seconds in range(1, 101):
+        ledger.record(
+            CallRecord(
+                "mock",
+                "mock-echo",
+                "chapter",
+                1,
+                "ok",
+                latency=float(seconds),
+                prompt_tokens=10,
+            )
+        )
+    ledger.record(
+        CallRecord("mock", "mock-echo", "chapter", 1, "retry", "http_429", 429)
+    )
+    ledger.record(
+        CallRecord("mock", "mock-echo", "chapter", 2, "failed", "http_429", 429)
+    )
+    ledger.record(CallRecord("mock", "mock-echo", "fragment", 1, "ok", latency=2.0))
+
+    chapter, fragment = ledger.report()
+    assert (chapter.kind, fragment.kind) == ("chapter", "fragment")
+    assert (chapter.calls, chapter.attempts, chapter.failed) == (101, 102, 1)
+    assert chapter.reasons == {"http_429": 2}
+    assert chapter.latency[50] == pytest.approx(50.5)
+    assert chapter.latency[99] == pytest.approx(99.01)
+    assert chapter.error_rate == pytest.approx(2 / 102)
+    assert chapter.prompt_tokens == 1000
+    assert fragment.latency == {50: 2.0, 90: 2.0, 95: 2.0, 99: 2.0}
+    assert ledger.report(run_id="other") == []
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from doc2md.llm_batch import parse_batch_output, run_batch
+from doc2md.llm_client import MockClient, OpenRouterClient
+from doc2md.mock_llm import MockLLMServer, MockOptions
+from doc2md.prompt_builder import PromptBuilder
+
+CHAPTERS = [f"<h1>Глава {n}</h1><p>Текст главы {n}.</p>" for n in range(1, 5)]
+
+
+def _builder(tmp_path) -> PromptBuilder:
+    (tmp_path / "rules.md").write_text("rules", encoding="utf-8")
+    return PromptBuilder(tmp_path / "rules.md", tmp_path / "samples")
+
+
+def test_batch_job_round_trip_through_mock_server(tmp_path) -> None:
+    statuses = []
+    with MockLLMServer(MockOptions(latency_ms=0)) as server:
+        client = MockClient(_builder(tmp_path), api_url=server.url)
+        results = run_batch(
+            client,
+            CHAPTERS,
+            tmp_path / "_batch",
+            poll_interval=0.01,
+            on_status=lambda job: statuses.append(job["status"]),
+        )
+
+    assert statuses == ["RUNNING", "SUCCESS"]
+    assert [manifest["title"] for manifest, _ in results] == [
+        f"Глава {n}" for n in range(1, 5)
+    ]
+    assert "Текст главы 3." in results[2][1]
+    lines = (
+        (tmp_path / "_batch" / "requests.jsonl")
+        .read_text(encoding="utf-8")
+        .splitlines()
+    )
+    assert [json.loads(line)["custom_id"] for line in lines] == ["0", "1", "2", "3"]
+    assert len((tmp_path / "_batch" / "results.jsonl").read_text().splitlines()) == 4
+
+
+def test_truncated_output_line_fails_only_its_chapter(tmp_path) -> None:
+    with MockLLMServer(MockOptions(latency_ms=0)) as server:
+        client = MockClient(_builder(tmp_path), api_url=server.url)
+        run_batch(client, CHAPTERS[:3], tmp_path, poll_interval=0.01)
+    lines = (tmp_path / "results.jsonl").read_text(encoding="utf-8").splitlines()
+    truncated = next(line for line in lines if '"custom_id": "1"' in line)
+    lines[lines.index(truncated)] = truncated[: len(truncated) // 2]
+
+    results = parse_batch_output(client, CHAPTERS[:3], "\n".join(lines))
+
+    assert isinstance(results[1], ValueError)
+    assert "Unreadable" in str(results[1])
+    assert [results[i][0]["title"] for i in (0, 2)] == ["Глава 1", "Глава 3"]
+
+
+def test_failed_lines_are_returned_as_errors(tmp_path) -> None:
+    with MockLLMServer(MockOptions(latency_ms=0, server_error=1.0)) as server:
+        client = MockClient(_builder(tmp_path), api_url=server.url)
+        results = run_batch(client, CHAPTERS[:2], tmp_path, poll_interval=0.01)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+    openrouter = OpenRouterClient(_builder(tmp_path), api_key="key")
+    with pytest.raises(RuntimeError, match="no batch API"):
+        run_batch(openrouter, CHAPTERS, tmp_path)
+
+
+class FailingJobAPI:
+    def upload(self, path):
+        return "file-1"
+
+    def create_job(self, file_id, model, metadata):
+        return "job-1"
+
+    def wait(self, job_id, **kwargs):
+        return {"id": job_id, "status": "TIMEOUT_EXCEEDED", "output_file": None}
+
+
+def test_job_without_output_fails_every_chapter(tmp_path) -> None:
+    client = MockClient(_builder(tmp_path))
+    results = run_batch(client, CHAPTERS[:3], tmp_path, api=FailingJobAPI())
+
+    assert len(results) == 3
+    assert all(
+        isinstance(r, RuntimeError) and "TIMEOUT_EXCEEDED" in str(r) for r in results
+    )
@@ -112,3 +112,19 @@ def test_mistral_client_uses_random_seed() -> None:
     client.format_chapter("<h1>One</h1>")
     assert "random_seed" in captured_payload
     assert "seed" not in captured_payload
+
+
+def test_format_chapter_honours_retry_after(monkeypatch) -> None:
+    responses = [
+        httpx.Response(503, headers={"Retry-After": "0.25"}, json={}),
+        httpx.Response(200, json=_make_success_response()),
+    ]
+    transport = httpx.MockTransport(lambda request: responses.pop(0))
+    sleep_calls: list[float] = []
+    monkeypatch.setattr("doc2md.llm_client.time.sleep", lambda s: sleep_calls.append(s))
+    client = OpenRouterClient(
+        DummyBuilder(), api_key="k", client=httpx.Client(transport=transport)
+    )
+    client.format_chapter("<h1>One</h1>")
+    assert sleep_calls == [0.25]
+    assert client.retry_count == 1
@@ -0,0 +1,52 @@
+import os
+import time
+
+from docx import Document
+
+from doc2md.mammoth_cache import MammothCache, convert_with_cache
+
+
+def test_convert_with_cache_reuses_result_until_inputs_change(tmp_path) -> None:
+    docx_path = tmp_path / "doc.docx"
+    doc = Document()
+    doc.add_paragraph("Установка", style="Heading 1")
+    doc.add_paragraph("Текст")
+    doc.save(docx_path)
+    docx_bytes = docx_path.read_bytes()
+    cache = MammothCache(tmp_path / "cache")
+
+    first, hit = convert_with_cache(
+        docx_bytes, "p[style-name='Heading 1'] => h1:fresh", cache
+    )
+    assert not hit
+    assert "<h1>Установка</h1>" in first.html
+
+    second, hit = convert_with_cache(
+        docx_bytes, "p[style-name='Heading 1'] => h1:fresh", cache
+    )
+    assert hit
+    assert second == first
+
+    # A different style map is a different entry
+    third, hit = convert_with_cache(
+        docx_bytes, "p[style-name='Heading 1'] => h2:fresh", cache
+    )
+    assert not hit
+    assert "<h2>Установка</h2>" in third.html
+
+
+def test_evict_drops_expired_then_least_recently_used(tmp_path) -> None:
+    cache = MammothCache(tmp_path, max_bytes=0, max_age=3600)
+    for name in ("old", "a", "b"):
+        cache.put(MammothCache.key(name.encode(), ""), "x" * 1000, [])
+    old_key = MammothCache.key(b"old", "")
+    stale = time.time() - 7200
+    os.utime(cache._path(old_key), (stale, stale))
+    a_key = MammothCache.key(b"a", "")
+    os.utime(cache._path(a_key), (stale + 3700, stale + 3700))
+
+    cache.max_bytes = 1500
+    assert cache.evict() == 2
+    assert cache.get(old_key) is None
+    assert cache.get(a_key) is None
+    assert cache.get(MammothCache.key(b"b", "")) is not None
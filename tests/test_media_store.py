@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from doc2md.media_store import MediaStore, dedupe_media
+
+
+def _write(path: Path, data: bytes) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_dedupe_media_links_duplicates_to_one_file(tmp_path: Path) -> None:
+    media = tmp_path / "media"
+    logo1 = _write(media / "ch01" / "logo.png", b"logo")
+    logo2 = _write(media / "ch02" / "logo.png", b"logo")
+    _write(media / "ch02" / "shot.png", b"screenshot")
+    store = MediaStore(media / "_store")
+
+    mapping = dedupe_media(media, store, mode="hardlink")
+
+    assert mapping[logo1] == mapping[logo2]
+    assert len(set(mapping.values())) == 2
+    assert logo1.read_bytes() == b"logo"
+    assert logo1.stat().st_ino == mapping[logo1].stat().st_ino
+
+
+def test_dedupe_media_rewrite_mode_removes_copies(tmp_path: Path) -> None:
+    media = tmp_path / "media"
+    logo = _write(media / "ch01" / "logo.PNG", b"logo")
+    store = MediaStore(tmp_path / "store")
+
+    mapping = dedupe_media(media, store, mode="rewrite")
+
+    assert not logo.exists()
+    assert mapping[logo].suffix == ".png"
+    assert mapping[logo].read_bytes() == b"logo"
@@ -0,0 +1,30 @@
+from doc2md.memory_profile import MemoryProfiler
+from doc2md.tracing import Tracer
+
+
+def test_memory_profiler_reports_peak_and_sites_per_stage():
+    tracer = Tracer()
+    profiler = MemoryProfiler(top=3)
+    profiler.start(tracer)
+    try:
+        with tracer.span("outer"):
+            with tracer.span("allocate") as sp:
+                transient = [bytearray(1024) for _ in range(2000)]
+                del transient
+                kept = [bytearray(512) for _ in range(1000)]
+                sp.set(items=len(kept))
+            with tracer.span("allocate"):
+                pass
+    finally:
+        profiler.stop()
+
+    stages = {stage.name: stage for stage in profiler.report()}
+    allocate = stages["allocate"]
+    assert allocate.calls == 2
+    # The freed list still counts towards the peak, only the kept one is retained
+    assert allocate.peak >= 2000 * 1024
+    assert 400 * 1024 <= allocate.retained < 2000 * 1024
+    assert stages["outer"].peak >= allocate.peak
+    assert any(__file__ in site.location for site in allocate.top_sites)
+    assert "allocate" in profiler.format_report()
+    assert tracer.listeners == []
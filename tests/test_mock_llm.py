@@ -0,0 +1,40 @@
+from doc2md.llm_client import ClientFactory
+from doc2md.loadtest import run_load_test, synthetic_chapters
+from doc2md.mock_llm import MockLLMServer, MockOptions
+from doc2md.prompt_builder import PromptBuilder
+
+
+def test_load_test_against_mock_server_with_injected_failures(tmp_path) -> None:
+    rules = tmp_path / "rules.md"
+    rules.write_text("rules", encoding="utf-8")
+    builder = PromptBuilder(rules, tmp_path)
+    options = MockOptions(
+        latency_ms=5, rate_limit=0.3, server_error=0.1, retry_after=0.01, seed=7
+    )
+
+    with MockLLMServer(options) as server:
+        client = ClientFactory.create_client(
+            "mock", builder, api_url=server.url, max_retries=10
+        )
+        manifest, markdown = client.format_chapter(
+            '<h1>1 Установка</h1><pre><code class="language-bash">'
+            "sudo dnf install portal-server</code></pre>"
+        )
+        assert manifest["title"] == "1 Установка"
+        assert "# 1 Установка" in markdown
+        assert "```bash\nsudo dnf install portal-server\n```" in markdown
+
+        report = run_load_test(
+            synthetic_chapters(12),
+            lambda: ClientFactory.create_client(
+                "mock", builder, api_url=server.url, max_retries=10
+            ),
+            concurrency=4,
+        )
+
+    assert report.chapters == 12 and report.failed == 0
+    assert (
+        report.retries == server.stats["429"] + server.stats["5xx"] - client.retry_count
+    )
+    assert report.retries > 0
+    assert 0 < report.p50 <= report.p95
@@ -0,0 +1,57 @@
+import operator
+import threading
+
+import pytest
+from docx import Document
+
+from doc2md import preprocess
+from doc2md.config import settings
+from doc2md.orchestrator import TaskGraph, preprocess_docx
+
+
+def test_task_graph_runs_independent_tasks_concurrently() -> None:
+    both_started = threading.Barrier(2, timeout=5)
+
+    def wait_for_peer(value: int) -> int:
+        # Deadlocks (and times out) unless the two tasks overlap
+        both_started.wait()
+        return value
+
+    graph = TaskGraph()
+    graph.add("a", wait_for_peer, 2)
+    graph.add("b", wait_for_peer, 3)
+    graph.add("sum", operator.add, deps=("a", "b"), executor="process")
+    graph.add("double", operator.mul, 2, deps=("sum",), executor="inline")
+
+    results = graph.run(max_workers=2)
+    assert results == {"a": 2, "b": 3, "sum": 5, "double": 10}
+    assert set(graph.timings) == set(results)
+
+
+def test_task_graph_rejects_cycles_and_unknown_deps() -> None:
+    graph = TaskGraph()
+    graph.add("a", operator.neg, deps=("b",))
+    graph.add("b", operator.neg, deps=("a",))
+    with pytest.raises(ValueError, match="cycle"):
+        graph.run()
+
+    graph = TaskGraph()
+    graph.add("a", operator.neg, deps=("missing",))
+    with pytest.raises(ValueError, match="unknown task missing"):
+        graph.run()
+
+
+def test_preprocess_docx_matches_sequential_conversion(tmp_path, monkeypatch) -> None:
+    # Workers read the setting from the environment when they are spawned
+    monkeypatch.setenv("DOC2MD_MAMMOTH_CACHE", "0")
+    monkeypatch.setattr(settings, "mammoth_cache", False, raising=False)
+    docx_path = tmp_path / "doc.docx"
+    doc = Document()
+    doc.add_paragraph("Общие сведения", style="Heading 1")
+    doc.add_paragraph("Текст раздела")
+    doc.save(docx_path)
+    style_map = tmp_path / "style.map"
+    style_map.write_text("p[style-name='Heading 1'] => h1:fresh", encoding="utf-8")
+
+    expected = preprocess.convert_docx_to_html(str(docx_path), str(style_map))
+    assert preprocess_docx(str(docx_path), str(style_map)) == expected
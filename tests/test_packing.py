@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import json
+
+import httpx
+
+from doc2md.llm_client import OpenRouterClient
+from doc2md.packing import format_pack, pack_chapters
+from doc2md.prompt_builder import PromptBuilder
+
+
+def _item(number: int, title: str) -> dict:
+    return {
+        "manifest": {
+            "chapter_number": number,
+            "title": title,
+            "filename": f"{number}.{title.lower()}.md",
+            "slug": title.lower(),
+        },
+        "markdown": f"# {title}",
+    }
+
+
+def test_pack_chapters_groups_small_neighbours_within_budget() -> None:
+    small = "<p>x</p>" * 10  # ~20 tokens
+    large = "<p>x</p>" * 200  # ~400 tokens
+    chapters = [small, small, small, large, small, small]
+
+    assert pack_chapters(chapters, 50, max_chapter_tokens=100) == [
+        [0, 1],
+        [2],
+        [3],
+        [4, 5],
+    ]
+    assert pack_chapters(chapters, 1000) == [[0, 1, 2], [3], [4, 5]]
+    assert pack_chapters(chapters, 1000, max_items=2) == [[0, 1], [2], [3], [4, 5]]
+
+
+def test_format_pack_retries_only_invalid_items(tmp_path) -> None:
+    (tmp_path / "rules.md").write_text("rules", encoding="utf-8")
+    requests: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        requests.append(prompt)
+        if "=== CHAPTER" in prompt:
+            # The second item has an invalid manifest
+            body = {
+                "chapters": [
+                    _item(3, "One"),
+                    {"manifest": {"title": "Two"}, "markdown": "x"},
+                ]
+            }
+        else:
+            body = _item(4, "Two")
+        content = json.dumps(body)
+        return httpx.Response(
+            200, json={"choices": [{"message": {"content": content}}]}
+        )
+
+    client = OpenRouterClient(
+        PromptBuilder(tmp_path / "rules.md", tmp_path),
+        api_key="k",
+        client=httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+    results = format_pack(client, ["<h1>One</h1>", "<h1>Two</h1>"], [3, 4])
+
+    assert [markdown for (_, markdown), _ in results] == ["# One", "# Two"]
+    assert [manifest["chapter_number"] for (manifest, _), _ in results] == [3, 4]
+    assert len(requests) == 2
+    assert "=== CHAPTER 3 ===" in requests[0] and "=== CHAPTER 4 ===" in requests[0]
+    assert "=== CHAPTER" not in requests[1]
@@ -0,0 +1,58 @@
+from doc2md.pipeline import PreprocessPipeline
+
+
+def test_pipeline_runs_all_passes_on_one_tree() -> None:
+    html = (
+        '<p>СОДЕРЖАНИЕ<a href="#__RefHeading___1">1 Intro 3</a></p>'
+        '<p><a href="#__RefHeading___2">2 Setup 5</a></p>'
+        '<p><a id="__RefHeading___1"></a>Intro</p><p>A</p><p> </p>'
+        '<p><a id="__RefHeading___2"></a>Setup</p><p>B</p>'
+    )
+    pipeline = PreprocessPipeline(
+        heading_structure=[(1, "1", "Intro"), (1, "2", "Setup")]
+    )
+
+    chapters = pipeline.run(html)
+
+    assert chapters == [
+        ("1 Intro", "<h1>1 Intro</h1><p>A</p>"),
+        ("2 Setup", "<h1>2 Setup</h1><p>B</p>"),
+    ]
+    assert list(pipeline.timings) == [
+        "parse",
+        "numbering",
+        "remove_toc",
+        "cleanup",
+        "split",
+    ]
+
+
+def test_string_and_tree_paths_agree_on_the_same_document() -> None:
+    from doc2md.heading_numbering import add_numbering_to_html
+    from doc2md.preprocess import remove_table_of_contents
+    from doc2md.splitter import split_html_by_heading_level
+
+    structure = [
+        (1, "1", "Раздел 1"),
+        (2, "1.1", "Раздел 10"),
+        (1, "2", "Установка"),
+    ]
+    html = (
+        "<p>СОДЕРЖАНИЕ</p>"
+        '<p><a href="#__RefHeading___1">1 Раздел 1\t3</a></p>'
+        '<p><a href="#__RefHeading___2">1.1 Раздел 10\t4</a></p>'
+        '<p><a href="#__RefHeading___3">2 Установка\t5</a></p>'
+        '<h1><a id="__RefHeading___1"></a>Раздел 1</h1><p>A</p>'
+        '<h2><a id="__RefHeading___2"></a>Раздел 10</h2><p>B</p>'
+        '<p><a id="__RefHeading___3"></a><strong>Установка</strong></p><p>C</p>'
+    )
+
+    numbered = add_numbering_to_html(html, "doc.docx", heading_structure=structure)
+    string_path = split_html_by_heading_level(remove_table_of_contents(numbered), 1)
+    tree_path = PreprocessPipeline(heading_structure=structure).run(html)
+
+    assert tree_path == string_path
+    assert tree_path == [
+        ("1 Раздел 1", "<h1>1 Раздел 1</h1><p>A</p><h2>1.1 Раздел 10</h2><p>B</p>"),
+        ("2 Установка", "<h1>2 Установка</h1><p>C</p>"),
+    ]
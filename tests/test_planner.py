@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import pytest
+
+from doc2md.planner import LatencyModel, plan_chapters, project_wall_time
+
+
+def test_wall_time_respects_concurrency_and_rate_limit() -> None:
+    assert project_wall_time([10.0] * 4, concurrency=1) == 40.0
+    assert project_wall_time([10.0] * 4, concurrency=2) == 20.0
+    # 6 requests per minute: one start every 10 seconds
+    assert project_wall_time([1.0] * 4, concurrency=4, rate_limit=6) == 31.0
+
+
+def test_latency_fit_and_context_flags() -> None:
+    # 4000 markdown chars = 1000 tokens; seconds = 2 + 0.01 * tokens
+    samples = [(8000, 4000, 12.0), (16000, 8000, 22.0), (4000, 2000, 7.0)]
+    model = LatencyModel.fit(samples, "journal")
+    assert model.base_seconds == pytest.approx(2.0)
+    assert model.seconds_per_token == pytest.approx(0.01)
+    assert model.output_ratio == pytest.approx(0.5)
+
+    chapters = ["<h1>Малая</h1>" + "x" * 400, "<h1>Большая</h1>" + "x" * 40000]
+    plan = plan_chapters(
+        chapters,
+        lambda html: [
+            {"role": "system", "content": "rules"},
+            {"role": "user", "content": html},
+        ],
+        model="mistral-small-latest",
+        latency=model,
+        context_tokens=5000,
+        input_price=1.0,
+    )
+    assert [c.title for c in plan.chapters] == ["Малая", "Большая"]
+    assert [c.over_limit for c in plan.chapters] == [False, True]
+    assert plan.chapters[1].output_tokens > plan.chapters[0].output_tokens
+    assert plan.wall_seconds == pytest.approx(sum(c.seconds for c in plan.chapters))
+    assert plan.cost == pytest.approx(plan.input_tokens / 1_000_000)
@@ -17,3 +17,14 @@ def test_postprocessor_rewrites_image_paths() -> None:
     processor = PostProcessor(md, chapter_number=2, doc_slug="guide")
     result = processor.run()
     assert "![Alt](/images/developer/administrator/guide/image.png)" in result
+
+
+def test_postprocessor_uses_canonical_media_paths() -> None:
+    md = "![Logo](media/ch01/logo.png)\n![Shot](shot.png)\n"
+    media_map = {"media/ch01/logo.png": "ab/abc.png"}
+    processor = PostProcessor(
+        md, chapter_number=1, doc_slug="guide", media_map=media_map
+    )
+    result = processor.run()
+    assert "![Logo](/images/developer/administrator/guide/ab/abc.png)" in result
+    assert "![Shot](/images/developer/administrator/guide/shot.png)" in result
@@ -45,3 +45,48 @@ def test_remove_table_of_contents_preserves_other_links():
     assert 'href="#__RefHeading___1"' not in result
     assert 'href="https://example.com"' in result
     assert 'href="#other_anchor"' in result
+
+
+def test_strip_table_of_contents_in_place():
+    """Test that the tree-based pass edits a shared lxml tree in place."""
+    from lxml import html
+
+    from doc2md.preprocess import strip_table_of_contents
+
+    root = html.document_fromstring(
+        """<p>СОДЕРЖАНИЕ<a href="#__RefHeading___1">1 Section One 5</a></p>
+        <p><a href="#__RefHeading___2">2 Section Two 10</a></p>
+        <h1>Section One</h1><p>Body text</p>"""
+    )
+
+    removed = strip_table_of_contents(root)
+
+    assert removed == 2
+    assert not root.xpath('//a[starts-with(@href, "#__RefHeading")]')
+    assert root.xpath("string(//h1)") == "Section One"
+    assert "Body text" in root.text_content()
+
+
+def test_extract_images_copies_media_from_docx_archive(tmp_path):
+    """Images come straight from word/media without running pandoc."""
+    import base64
+
+    from docx import Document
+
+    from doc2md.preprocess import extract_images
+
+    png = tmp_path / "pixel.png"
+    png.write_bytes(
+        base64.b64decode(
+            "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        )
+    )
+    doc = Document()
+    doc.add_picture(str(png))
+    docx_path = tmp_path / "doc.docx"
+    doc.save(docx_path)
+
+    extract_images(str(docx_path), str(tmp_path / "out"))
+
+    extracted = list((tmp_path / "out" / "media").iterdir())
+    assert [p.read_bytes() for p in extracted] == [png.read_bytes()]
@@ -0,0 +1,41 @@
+from lxml import html
+
+from doc2md.restore_numbers import restore_numbers
+from doc2md.splitter import split_tree_by_heading_level
+
+DOCUMENT = """<html><body>
+<div id="toc"><ul>
+  <li><a href="#intro">1 Введение</a></li>
+  <li><a href="#setup">1.1 Установка</a></li>
+  <li><a href="#usage">2 Использование</a></li>
+</ul></div>
+<h1 id="intro"><strong>Введение</strong></h1><p>Текст</p>
+<h2><a id="setup"></a>Установка</h2>
+<h2>Проверка</h2>
+<h1 id="usage">Использование</h1><p>Ещё</p>
+</body></html>"""
+
+
+def test_restore_numbers_from_toc_links_and_remove_toc() -> None:
+    root = html.document_fromstring(DOCUMENT)
+
+    report = restore_numbers(root)
+
+    assert report == (3, 3, 0, 1)
+    assert root.find(".//div") is None
+    headings = [h.text_content() for h in root.iter("h1", "h2")]
+    assert headings == ["1 Введение", "1.1 Установка", "Проверка", "2 Использование"]
+    chapters = split_tree_by_heading_level(root, 1)
+    assert [title for title, _ in chapters] == ["1 Введение", "2 Использование"]
+
+
+def test_fallback_counters_continue_from_toc_numbers() -> None:
+    root = html.document_fromstring(DOCUMENT)
+
+    report = restore_numbers(root, fallback_counters=True)
+
+    assert report.counted == 1
+    assert [h.text_content() for h in root.iter("h2")] == [
+        "1.1 Установка",
+        "1.2 Проверка",
+    ]
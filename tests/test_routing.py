@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from doc2md.routing import Route, RoutedClient, RoutingPolicy, chapter_features
+
+SMALL = "<h1>Стаб</h1><p>Коротко.</p>"
+TABLES = "<h1>Справочник</h1><table><tr><td>a</td><td>b</td></tr></table>" * 3
+LARGE = "<h1>Большая</h1>" + "<p>Текст главы.</p>" * 2000
+
+
+def _policy(**options) -> RoutingPolicy:
+    return RoutingPolicy(
+        [
+            Route(
+                "small", "mock", "fast", max_tokens=1000, max_tables=0, concurrency=2
+            ),
+            Route("large", "mock", "strong", concurrency=1),
+        ],
+        **options,
+    )
+
+
+def test_policy_routes_by_size_and_tables_and_escalates_on_failures() -> None:
+    policy = _policy(min_results=2, failure_threshold=0.5)
+
+    assert chapter_features(TABLES).tables == 3
+    assert policy.choose(chapter_features(SMALL)).name == "small"
+    assert policy.choose(chapter_features(TABLES)).name == "large"
+    assert policy.choose(chapter_features(LARGE)).name == "large"
+
+    policy.record("small", False)
+    policy.record("small", False)
+    assert policy.choose(chapter_features(SMALL)).name == "large"
+
+
+def test_routed_client_limits_concurrency_per_route(monkeypatch) -> None:
+    active = {"fast": 0, "strong": 0}
+    peak = {"fast": 0, "strong": 0}
+    lock = threading.Lock()
+
+    class FakeClient:
+        retry_count = 0
+
+        def __init__(self, model: str) -> None:
+            self.model = model
+
+        def format_chapter(self, chapter_html: str):
+            with lock:
+                active[self.model] += 1
+                peak[self.model] = max(peak[self.model], active[self.model])
+            time.sleep(0.02)
+            with lock:
+                active[self.model] -= 1
+            return {"slug": self.model}, chapter_html
+
+    monkeypatch.setattr(
+        "doc2md.llm_client.ClientFactory.create_client",
+        lambda provider, builder, model=None, **kw: FakeClient(model),
+    )
+    client = RoutedClient(_policy(), prompt_builder=None)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(client.format_chapter, [SMALL] * 6 + [LARGE] * 3))
+
+    assert [manifest["slug"] for manifest, _ in results] == ["fast"] * 6 + [
+        "strong"
+    ] * 3
+    assert client.chapters == {"small": 6, "large": 3}
+    assert peak == {"fast": 2, "strong": 1}
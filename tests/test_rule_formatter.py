@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from doc2md.rule_formatter import format_chapter
+from doc2md.validators import run_all_validators
+
+CHAPTER = """<h1>2 Установка</h1>
+<div class="app-annotation"><p>Важно знать.</p></div>
+<h2>2.1 Компоненты</h2>
+<ul class="component-list"><li>Nginx — веб-сервер.</li><li>PostgreSQL — база данных</li></ul>
+<p>Таблица 1 – Порты</p>
+<table><tr><th>Порт</th><th>Сервис</th></tr><tr><td>80</td><td>http</td></tr></table>
+<pre><code class="language-yaml filename-docker-compose">version: "3"</code></pre>
+<pre><code class="language-terminal">sudo dnf install docker</code></pre>
+"""
+
+
+def test_mechanical_rules_are_applied_without_llm() -> None:
+    outcome = format_chapter(CHAPTER, 2)
+
+    assert outcome.reason == ""
+    manifest, markdown = outcome.result
+    assert manifest == {
+        "chapter_number": 2,
+        "title": "Установка",
+        "filename": "2.ustanovka.md",
+        "slug": "ustanovka",
+    }
+    assert markdown.startswith('---\ntitle: "Установка"\n---\n\n# Установка\n')
+    assert "::AppAnnotation\nВажно знать.\n::" in markdown
+    assert "## Компоненты" in markdown
+    assert "- `Nginx` — веб-сервер;\n- `PostgreSQL` — база данных." in markdown
+    assert "| 80 | http |\n\n> Таблица 1 – Порты" in markdown
+    assert '```yaml docker-compose.yaml\nversion: "3"\n```' in markdown
+    assert "```bash Terminal\nsudo dnf install docker\n```" in markdown
+    assert run_all_validators(markdown) == []
+
+
+def test_chapters_needing_judgement_go_to_llm() -> None:
+    assert format_chapter(CHAPTER + '<p><img src="a.png"></p>', 2).reason == "<img>"
+    assert format_chapter("<p>Без заголовка</p>", 2).reason == "no <h1>"
+    bad_caption = format_chapter(
+        CHAPTER + "<blockquote>Таблица без номера</blockquote>", 2
+    )
+    assert bad_caption.result is None and "Invalid table caption" in bad_caption.reason
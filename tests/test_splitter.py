@@ -20,3 +20,16 @@ def test_split_html_by_h1_empty_html_returns_empty_list() -> None:
     """Test that empty HTML returns empty list."""
     chapters = split_html_by_h1("")
     assert len(chapters) == 0
+
+
+def test_split_tree_by_heading_level_keeps_tail_text() -> None:
+    from lxml import html
+
+    from doc2md.splitter import split_tree_by_heading_level
+
+    root = html.document_fromstring("<h2>One</h2>tail<p>A</p><h2>Two</h2><p>B</p>")
+    chapters = split_tree_by_heading_level(root, 2)
+    assert chapters == [
+        ("One", "<h2>One</h2>tail<p>A</p>"),
+        ("Two", "<h2>Two</h2><p>B</p>"),
+    ]
@@ -0,0 +1,36 @@
+import json
+import sys
+
+import pytest
+
+from doc2md.tracing import Tracer
+
+
+def test_tracer_records_spans_and_writes_chrome_trace(tmp_path):
+    tracer = Tracer()
+    with tracer.span("disabled") as sp:
+        sp.set(ignored=True)
+    assert tracer.events == []
+
+    tracer.enabled = True
+    with tracer.span("outer", chapter=3) as sp:
+        sp.set(bytes_in=10)
+    with pytest.raises(ValueError):
+        with tracer.span("failing"):
+            raise ValueError("boom")
+    tracer.run_subprocess([sys.executable, "-c", "pass"], check=True)
+
+    path = tmp_path / "trace.json"
+    tracer.write(path)
+    events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+
+    names = [event["name"] for event in events]
+    assert names[:2] == ["outer", "failing"]
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    assert events[0]["args"]["chapter"] == 3
+    assert events[0]["args"]["bytes_in"] == 10
+    assert "cpu_ms" in events[0]["args"]
+    assert events[1]["args"]["error"] == "ValueError: boom"
+    assert events[2]["cat"] == "subprocess"
+    assert events[2]["args"]["returncode"] == 0
+    assert "child_cpu_ms" in events[2]["args"]